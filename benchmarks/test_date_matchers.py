@@ -0,0 +1,197 @@
+""" Microbenchmarks of the date matchers, run with pytest-benchmark::
+
+    pip install -r benchmarks/requirements.txt
+    py.test benchmarks --benchmark-autosave
+
+Results are saved under ``.benchmarks/`` and can be compared across commits::
+
+    git checkout <other commit>
+    py.test benchmarks --benchmark-compare --benchmark-compare-fail=mean:10%
+
+``uncached`` benchmarks disable the parse cache, so every call pays for parsing.
+The ``period`` groups compare the tuples the periods were compared by before
+with the integer keys of a compiled matcher.
+
+"""
+import datetime
+
+import pytest
+
+from scrapy_mosquitera.matchers import date, date_matches, date_in_period_matches, date_matches_many
+
+RELATIVE_BASE = datetime.datetime(2016, 6, 1, 12)
+MIN_DATE = datetime.datetime(2016, 4, 10)
+MAX_DATE = datetime.datetime(2016, 6, 20, 23, 59, 59)
+TARGET_DATE = datetime.datetime(2016, 5, 2, 10, 20)
+
+INPUTS = {
+    'iso_date': '2016-04-15',
+    'iso_datetime': '2016-04-15T10:20:00+02:00',
+    'timestamp': '1460715600',
+    'rfc2822': 'Fri, 15 Apr 2016 10:20:00 +0000',
+    'english': 'April 15, 2016',
+    'spanish': '15 de abril de 2016',
+    'french': '15 avril 2016',
+    'relative': '5 days ago',
+    'yesterday': 'Yesterday',
+    'date': datetime.date(2016, 4, 15),
+    'datetime': datetime.datetime(2016, 4, 15, 10, 20),
+}
+
+# Aware dates can only be compared with a timezone
+AWARE = {'iso_datetime', 'rfc2822'}
+
+# What a listing page usually looks like: mostly one format, some relative dates
+LISTING = (
+    ['2016-05-{:02d}T10:20:00'.format(day) for day in range(1, 21)] +
+    ['{} hours ago'.format(hours) for hours in range(1, 6)] +
+    ['Yesterday', '2 days ago', '', None, datetime.datetime(2016, 4, 1)]
+)
+
+PERIODS = ['hour', 'day', 'week', 'month', 'quarter', 'year']
+
+BOUNDS = {
+    'none': {},
+    'datetime': {'min_date': MIN_DATE, 'max_date': MAX_DATE},
+    'iso': {'after': '2016-04-10', 'before': '2016-06-20'},
+    'on': {'on': '2016-04-15'},
+    'relative': {'after': '5 days ago', 'before': 'Yesterday'},
+}
+
+
+@pytest.fixture
+def uncached():
+    date.configure_parse_cache(maxsize=0)
+    yield
+    date.configure_parse_cache()
+
+
+@pytest.fixture(autouse=True)
+def fresh_caches():
+    date.configure_parse_cache()
+    date.clear_date_matcher_cache()
+
+
+@pytest.mark.parametrize('kind', sorted(INPUTS))
+def test_to_datetime(benchmark, kind):
+    benchmark(date._to_datetime, INPUTS[kind], RELATIVE_BASE)
+
+
+@pytest.mark.parametrize('kind', sorted(INPUTS))
+def test_to_datetime_uncached(benchmark, uncached, kind):
+    benchmark(date._to_datetime, INPUTS[kind], RELATIVE_BASE)
+
+
+@pytest.mark.parametrize('bounds', sorted(BOUNDS))
+def test_get_min_date(benchmark, uncached, bounds):
+    benchmark(date._get_min_date, BOUNDS[bounds], RELATIVE_BASE)
+
+
+@pytest.mark.parametrize('bounds', sorted(BOUNDS))
+def test_get_max_date(benchmark, uncached, bounds):
+    benchmark(date._get_max_date, BOUNDS[bounds], RELATIVE_BASE)
+
+
+def _tuple_week(target_date, min_date, max_date, check_maximum):
+    week_under_question = target_date.year, target_date.isocalendar()[1]
+    min_week = min_date.year, min_date.isocalendar()[1]
+    result = min_week <= week_under_question
+
+    if result and check_maximum:
+        max_week = max_date.year, max_date.isocalendar()[1]
+        result &= week_under_question <= max_week
+
+    return result
+
+
+def _tuple_month(target_date, min_date, max_date, check_maximum):
+    month_under_question = target_date.year, target_date.month
+    min_month = min_date.year, min_date.month
+    result = min_month <= month_under_question
+
+    if result and check_maximum:
+        max_month = max_date.year, max_date.month
+        result &= month_under_question <= max_month
+
+    return result
+
+
+def _tuple_year(target_date, min_date, max_date, check_maximum):
+    result = min_date.year <= target_date.year
+
+    if result and check_maximum:
+        result &= target_date.year <= max_date.year
+
+    return result
+
+
+# The periods as they were compared before the integer keys, recomputing both bounds
+TUPLE_PERIODS = {
+    'day': date._date_in_period_day,
+    'week': _tuple_week,
+    'month': _tuple_month,
+    'year': _tuple_year,
+}
+
+
+@pytest.mark.parametrize('period', sorted(TUPLE_PERIODS))
+def test_period_tuples(benchmark, period):
+    benchmark.group = 'period ' + period
+    benchmark(TUPLE_PERIODS[period], TARGET_DATE, MIN_DATE, MAX_DATE, True)
+
+
+@pytest.mark.parametrize('period', PERIODS)
+def test_period_keys(benchmark, period):
+    benchmark.group = 'period ' + period
+    matcher = date.DateMatcher(period=period, min_date=MIN_DATE, max_date=MAX_DATE)
+    benchmark(matcher._match, TARGET_DATE)
+
+
+@pytest.mark.parametrize('kind', sorted(INPUTS))
+def test_date_matches(benchmark, kind):
+    timezone = 'UTC' if kind in AWARE else None
+    benchmark(date_matches, INPUTS[kind], after='2016-04-10', before='2016-06-20', timezone=timezone)
+
+
+@pytest.mark.parametrize('period', PERIODS)
+def test_date_in_period_matches(benchmark, period):
+    benchmark(date_in_period_matches, TARGET_DATE, period=period,
+              min_date=MIN_DATE, max_date=MAX_DATE)
+
+
+@pytest.mark.parametrize('period', PERIODS)
+def test_compiled_period_matcher(benchmark, period):
+    matcher = date.DateMatcher(period=period, min_date=MIN_DATE, max_date=MAX_DATE)
+    benchmark(matcher.matches, TARGET_DATE)
+
+
+def test_listing_loop(benchmark):
+    def loop():
+        return [date_matches(value, after='2016-04-10') for value in LISTING]
+
+    benchmark(loop)
+
+
+def test_listing_batch(benchmark):
+    benchmark(date_matches_many, LISTING, after='2016-04-10')
+
+
+def _windows(n_windows):
+    start = datetime.datetime(2010, 1, 1)
+    return [
+        (start + datetime.timedelta(days=i * 2), start + datetime.timedelta(days=i * 2, hours=12))
+        for i in range(n_windows)
+    ]
+
+
+@pytest.mark.parametrize('n_windows', [1, 100, 10000])
+def test_windows(benchmark, n_windows):
+    matcher = date.DateMatcher(windows=_windows(n_windows))
+    benchmark(matcher.matches, TARGET_DATE)
+
+
+@pytest.mark.parametrize('n_windows', [1, 100, 10000])
+def test_windows_batch(benchmark, n_windows):
+    matcher = date.DateMatcher(windows=_windows(n_windows))
+    values = [TARGET_DATE + datetime.timedelta(hours=i) for i in range(1000)]
+    benchmark(matcher.matches_many, values)
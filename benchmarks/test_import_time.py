@@ -0,0 +1,27 @@
+""" Cold start cost of scrapy-mosquitera, run with the rest of the suite.
+
+Every round runs the statement in a new interpreter, so nothing is cached between them.
+``interpreter`` is the cost of starting Python alone, to subtract from the rest.
+
+"""
+import sys
+import subprocess
+
+import pytest
+
+STATEMENTS = {
+    'interpreter': 'pass',
+    'package': 'import scrapy_mosquitera',
+    'matchers': 'import scrapy_mosquitera.matchers',
+    'fixed_format_match': 'from scrapy_mosquitera.matchers import date_matches; '
+                          'date_matches("2016-04-15", after="2016-04-01")',
+    'fuzzy_match': 'from scrapy_mosquitera.matchers import date_matches; '
+                   'date_matches("Yesterday", after="2016-04-01")',
+    'mixin': 'from scrapy_mosquitera import PaginationMixin',
+}
+
+
+@pytest.mark.parametrize('name', sorted(STATEMENTS))
+def test_import_time(benchmark, name):
+    benchmark.group = 'import'
+    benchmark.pedantic(subprocess.check_call, args=([sys.executable, '-c', STATEMENTS[name]],), rounds=5)
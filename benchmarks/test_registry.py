@@ -0,0 +1,89 @@
+""" Memory and time used to register listings, run with the rest of the suite.
+
+The legacy registry keys a ``defaultdict(dict)`` by ``uuid4`` strings, while
+:class:`ListingRegistry` keys ``__slots__`` records by increasing integers.
+The bytes allocated by each one are saved in the ``extra_info`` of the results.
+The cost of an idle event, completing one listing among many pending ones,
+is compared between a full scan of the records and the ready queue.
+
+"""
+import gc
+import uuid
+import tracemalloc
+
+from collections import defaultdict
+
+import pytest
+
+from scrapy_mosquitera.registry import ListingRegistry
+
+ITEMS_PER_LISTING = 3
+N_LISTINGS = [10000, 100000]
+
+
+def legacy(n_listings):
+    registry = defaultdict(dict)
+    for _ in range(n_listings):
+        response_id = str(uuid.uuid4())
+        for _ in range(ITEMS_PER_LISTING):
+            spot = registry[response_id]
+            spot['counter'] = spot.get('counter', 0) + 1
+        registry[response_id]['nprs'] = []
+    return registry
+
+
+def compact(n_listings):
+    registry = ListingRegistry()
+    for _ in range(n_listings):
+        listing_id = registry.new_id()
+        for _ in range(ITEMS_PER_LISTING):
+            registry.increment(listing_id)
+    return registry
+
+
+def scan_completed_nprs(registry):
+    """ Scan every record for completed listings, like the registry used to. """
+    nprs = []
+    completed = [i for i, record in registry._records.items() if record.counter == 0]
+    for listing_id in completed:
+        nprs += registry._records.pop(listing_id).nprs
+    return nprs
+
+
+REGISTRIES = {'legacy': legacy, 'compact': compact}
+IDLE = {'scan': scan_completed_nprs, 'ready': ListingRegistry.pop_completed_nprs}
+
+
+def _allocated_bytes(fn, n_listings):
+    gc.collect()
+    tracemalloc.start()
+    registry = fn(n_listings)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del registry
+    return size
+
+
+@pytest.mark.parametrize('n_listings', N_LISTINGS)
+@pytest.mark.parametrize('kind', sorted(REGISTRIES))
+def test_register_listings(benchmark, kind, n_listings):
+    benchmark.group = 'register {}'.format(n_listings)
+    benchmark.extra_info['bytes'] = _allocated_bytes(REGISTRIES[kind], n_listings)
+    benchmark.pedantic(REGISTRIES[kind], args=(n_listings,), rounds=3)
+
+
+@pytest.mark.parametrize('n_listings', N_LISTINGS)
+@pytest.mark.parametrize('kind', sorted(IDLE))
+def test_idle(benchmark, kind, n_listings):
+    registry = compact(n_listings)
+    registry.pop_completed_nprs()
+    listing_ids = iter(range(1, n_listings + 1))
+
+    def complete_one_listing():
+        listing_id = next(listing_ids)
+        for _ in range(ITEMS_PER_LISTING):
+            registry.decrement(listing_id)
+        return (registry,), {}
+
+    benchmark.group = 'idle {}'.format(n_listings)
+    benchmark.pedantic(IDLE[kind], setup=complete_one_listing, rounds=100)
@@ -1,3 +1,31 @@
-from .mixin import PaginationMixin
+import sys
+import importlib
 
 __version__ = '0.1.2'
+
+# Public names and the modules defining them. They're imported on first access,
+# so importing the package doesn't pull in scrapy.
+_LAZY_NAMES = {
+    'PaginationMixin': 'scrapy_mosquitera.mixin',
+    'PageSearchMixin': 'scrapy_mosquitera.search',
+}
+
+
+def __getattr__(name):
+    module_name = _LAZY_NAMES.get(name)
+    if module_name is None:
+        raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+
+    value = getattr(importlib.import_module(module_name), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_LAZY_NAMES))
+
+
+# Module level __getattr__ is only supported since Python 3.7
+if sys.version_info < (3, 7):
+    from .mixin import PaginationMixin  # noqa
+    from .search import PageSearchMixin  # noqa
@@ -0,0 +1,102 @@
+import time
+
+from collections import OrderedDict
+
+
+_MISSING = object()
+
+
+def freeze(value):
+    """ Return a hashable version of ``value``, made of dicts, lists and scalars. """
+    if isinstance(value, dict):
+        return tuple(sorted((k, freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple, set)):
+        return tuple(freeze(v) for v in value)
+    return value
+
+
+class LRUCache(object):
+    """ Bounded mapping evicting the least recently used entries.
+
+    Entries may also expire after ``ttl`` seconds. Lookups are counted
+    as hits or misses, see :meth:`info`.
+
+    :param maxsize: maximum number of entries, ``None`` means unbounded
+    :type maxsize: int
+    :param ttl: seconds before an entry expires, ``None`` means never
+    :type ttl: float
+    :param timer: function returning the current time in seconds
+    :type timer: callable
+
+    """
+    def __init__(self, maxsize=1024, ttl=None, timer=time.time):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._timer = timer
+        # Each entry has (value, expiration time or None)
+        self._data = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING, count=False) is not _MISSING
+
+    def get(self, key, default=None, count=True):
+        """ Return the value for ``key`` or ``default`` if it's missing or expired. """
+        try:
+            value, expires = self._data.pop(key)
+        except KeyError:
+            if count:
+                self.misses += 1
+            return default
+
+        if expires is not None and expires <= self._timer():
+            if count:
+                self.misses += 1
+            return default
+
+        # Re-insert to mark it as the most recently used
+        self._data[key] = value, expires
+        if count:
+            self.hits += 1
+        return value
+
+    def set(self, key, value, ttl=_MISSING):
+        """ Store ``value`` for ``key``, evicting the least recently used entry if full.
+
+        ``ttl`` overrides the cache default for this entry.
+
+        """
+        ttl = self.ttl if ttl is _MISSING else ttl
+        expires = None if ttl is None else self._timer() + ttl
+
+        self._data.pop(key, None)
+        self._data[key] = value, expires
+
+        if self.maxsize is not None:
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        """ Remove ``key`` and return its value or ``default``. """
+        try:
+            return self._data.pop(key)[0]
+        except KeyError:
+            return default
+
+    def clear(self):
+        """ Remove every entry and reset the counters. """
+        self._data.clear()
+        self.hits = self.misses = 0
+
+    def info(self):
+        """ Return a dict with hits, misses, current size and maximum size. """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+        }
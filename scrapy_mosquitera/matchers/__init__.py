@@ -1,2 +1,27 @@
-from .date import date_matches, date_in_period_matches
-__all__ = [date_matches, date_in_period_matches]
+from .compose import (
+    Matcher, Predicate, Match, And, Or, Not, Evaluator,
+    compile_matcher, register_matcher, get_matcher
+)
+from .date import (
+    date_matches, date_in_period_matches, date_matches_many, date_in_period_matches_many,
+    DateMatcher, FormatLearner, compile_date_matcher
+)
+from .intervals import IntervalIndex
+from .numeric import (
+    number_matches, version_matches, NumberMatcher, VersionMatcher,
+    compile_number_matcher, compile_version_matcher
+)
+
+register_matcher('date', date_matches, cost=DateMatcher.cost)
+register_matcher('date_in_period', date_in_period_matches, cost=DateMatcher.cost)
+register_matcher('number', number_matches, cost=NumberMatcher.cost)
+register_matcher('version', version_matches, cost=VersionMatcher.cost)
+
+__all__ = [
+    date_matches, date_in_period_matches, date_matches_many, date_in_period_matches_many,
+    DateMatcher, FormatLearner, compile_date_matcher,
+    number_matches, version_matches, NumberMatcher, VersionMatcher,
+    compile_number_matcher, compile_version_matcher, IntervalIndex,
+    Matcher, Predicate, Match, And, Or, Not, Evaluator,
+    compile_matcher, register_matcher, get_matcher
+]
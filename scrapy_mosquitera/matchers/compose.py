@@ -0,0 +1,332 @@
+import timeit
+
+from scrapy_mosquitera import stats as matcher_stats
+
+
+# Registered matcher functions: name -> (function, cost)
+_registry = {}
+
+# Estimated cost in microseconds of a matcher without measurements
+DEFAULT_COST = 1.0
+
+
+def register_matcher(name, fn=None, cost=DEFAULT_COST):
+    """ Register the matcher function ``fn`` under ``name`` to be used with :class:`Match`.
+
+    A matcher function takes the data to evaluate and keyword parameters,
+    like :func:`date_matches <scrapy_mosquitera.matchers.date_matches>`.
+    ``cost`` is its estimated cost in microseconds, used until it's measured.
+    It can be used as a decorator::
+
+        @register_matcher('category', cost=0.5)
+        def category_matches(data, allowed=()):
+            return data in allowed
+
+    """
+    def decorator(fn):
+        _registry[name] = fn, cost
+        return fn
+
+    if fn is None:
+        return decorator
+    return decorator(fn)
+
+
+def get_matcher(name):
+    """ Return the matcher function registered under ``name``. """
+    try:
+        return _registry[name][0]
+    except KeyError:
+        raise ValueError('Unknown matcher: {name}'.format(name=name))
+
+
+def _get_field(data, field):
+    if field is None:
+        return data
+    if callable(field):
+        return field(data)
+
+    try:
+        return data[field]
+    except (KeyError, TypeError):
+        return getattr(data, field, None)
+
+
+class Matcher(object):
+    """ Base class of composable matchers.
+
+    Matchers are combined with ``&``, ``|`` and ``~`` (or :class:`And`, :class:`Or`
+    and :class:`Not`) and compiled with :meth:`compile`.
+
+    """
+    cost = DEFAULT_COST
+
+    def matches(self, data):
+        raise NotImplementedError
+
+    def __call__(self, data):
+        return self.matches(data)
+
+    def __and__(self, other):
+        return And(self, other)
+
+    def __or__(self, other):
+        return Or(self, other)
+
+    def __invert__(self):
+        return Not(self)
+
+    def compile(self, **kwargs):
+        """ Return an :class:`Evaluator` of this matcher, see :func:`compile_matcher`. """
+        return compile_matcher(self, **kwargs)
+
+
+def _as_matcher(obj):
+    return obj if isinstance(obj, Matcher) else Predicate(obj)
+
+
+class Predicate(Matcher):
+    """ Matcher calling ``fn`` with the ``field`` of the data.
+
+    :param fn: function returning the validity of a value
+    :type fn: callable
+    :param field: key or attribute to extract from the data, or function extracting it
+    :type field: string or callable
+    :param cost: estimated cost in microseconds
+    :type cost: float
+
+    """
+    def __init__(self, fn, field=None, cost=None):
+        self.fn = fn
+        self.field = field
+        self.cost = cost if cost is not None else getattr(fn, 'cost', DEFAULT_COST)
+
+    def matches(self, data):
+        return bool(self.fn(_get_field(data, self.field)))
+
+    def __repr__(self):
+        return 'Predicate({!r}, field={!r})'.format(self.fn, self.field)
+
+
+class Match(Predicate):
+    """ Predicate using the matcher function registered under ``name`` with ``params``::
+
+        Match('date', field='published', after='5 days ago')
+
+    """
+    def __init__(self, name, field=None, cost=None, **params):
+        fn = get_matcher(name)
+        if cost is None:
+            cost = _registry[name][1]
+
+        super(Match, self).__init__(lambda value: fn(value, **params), field=field, cost=cost)
+        self.name = name
+        self.params = params
+
+    def __repr__(self):
+        return 'Match({!r}, field={!r})'.format(self.name, self.field)
+
+
+class And(Matcher):
+    """ Matcher valid if all ``matchers`` are valid. """
+    def __init__(self, *matchers):
+        self.matchers = [_as_matcher(m) for m in matchers]
+
+    @property
+    def cost(self):
+        return sum(m.cost for m in self.matchers)
+
+    def matches(self, data):
+        return all(m.matches(data) for m in self.matchers)
+
+
+class Or(Matcher):
+    """ Matcher valid if any of ``matchers`` is valid. """
+    def __init__(self, *matchers):
+        self.matchers = [_as_matcher(m) for m in matchers]
+
+    @property
+    def cost(self):
+        return sum(m.cost for m in self.matchers)
+
+    def matches(self, data):
+        return any(m.matches(data) for m in self.matchers)
+
+
+class Not(Matcher):
+    """ Matcher valid if ``matcher`` isn't valid. """
+    def __init__(self, matcher):
+        self.matcher = _as_matcher(matcher)
+
+    @property
+    def cost(self):
+        return self.matcher.cost
+
+    def matches(self, data):
+        return not self.matcher.matches(data)
+
+
+class _Node(object):
+    """ Compiled matcher keeping the statistics used to order its siblings. """
+    def __init__(self, matcher, evaluator):
+        self.matcher = matcher
+        self.evaluator = evaluator
+        self.calls = 0
+        self.accepted = 0
+        self.timed = 0
+        self.elapsed = 0.0
+
+    def evaluate(self, data):
+        self.calls += 1
+        if self.calls % self.evaluator.sample_every:
+            result = self._evaluate(data)
+        else:
+            start = timeit.default_timer()
+            result = self._evaluate(data)
+            self.elapsed += timeit.default_timer() - start
+            self.timed += 1
+
+        if result:
+            self.accepted += 1
+        return result
+
+    def _evaluate(self, data):
+        return bool(self.matcher.matches(data))
+
+    def mean_cost(self):
+        """ Return the measured cost in seconds or the estimated one. """
+        if self.timed:
+            return self.elapsed / self.timed
+        return self.matcher.cost * 1e-6
+
+    def short_circuit_rank(self, on_result):
+        """ Return cost per short-circuit, the lower the earlier it should be evaluated.
+
+        ``on_result`` is the result which stops the evaluation of the siblings.
+
+        """
+        # Laplace smoothing, so unseen matchers aren't certain to short-circuit or not
+        hits = self.accepted if on_result else self.calls - self.accepted
+        probability = (hits + 1.0) / (self.calls + 2.0)
+        return self.mean_cost() / probability
+
+
+class _CompositeNode(_Node):
+    short_circuit_on = None
+
+    def __init__(self, matcher, evaluator):
+        super(_CompositeNode, self).__init__(matcher, evaluator)
+        self.children = [evaluator._build(m) for m in matcher.matchers]
+        # Cheapest estimated children first until there are measurements
+        self.children.sort(key=lambda child: child.short_circuit_rank(self.short_circuit_on))
+
+    def _evaluate(self, data):
+        if self.calls % self.evaluator.reorder_every == 0:
+            self.children.sort(key=lambda child: child.short_circuit_rank(self.short_circuit_on))
+
+        stop = self.short_circuit_on
+        for child in self.children:
+            if child.evaluate(data) is stop:
+                return stop
+        return not stop
+
+
+class _AndNode(_CompositeNode):
+    short_circuit_on = False
+
+
+class _OrNode(_CompositeNode):
+    short_circuit_on = True
+
+
+class _NotNode(_Node):
+    def __init__(self, matcher, evaluator):
+        super(_NotNode, self).__init__(matcher, evaluator)
+        self.child = evaluator._build(matcher.matcher)
+
+    def _evaluate(self, data):
+        return not self.child.evaluate(data)
+
+    def mean_cost(self):
+        return self.child.mean_cost()
+
+
+class Evaluator(object):
+    """ Compiled matcher evaluating cheap and selective matchers first.
+
+    Every ``reorder_every`` evaluations, the children of each :class:`And` and :class:`Or`
+    are sorted by their cost per short-circuit: measured cost divided by the rate
+    at which they reject (``And``) or accept (``Or``) the data.
+    Costs are measured once every ``sample_every`` evaluations to keep the timer
+    off the hot path.
+
+    Results are recorded under ``name`` by the ``stats`` recorder, kept in ``recorder``,
+    or by the one installed by the :class:`MatcherStats <scrapy_mosquitera.stats.MatcherStats>` extension.
+
+    """
+    def __init__(self, matcher, reorder_every=128, sample_every=8, name='compiled', stats=None):
+        self.reorder_every = reorder_every
+        self.sample_every = sample_every
+        self.name = name
+        # Not ``stats``, which returns the stats of the leaf matchers
+        self.recorder = stats
+        self.root = self._build(_as_matcher(matcher))
+
+    def _build(self, matcher):
+        if isinstance(matcher, And):
+            return _AndNode(matcher, self)
+        if isinstance(matcher, Or):
+            return _OrNode(matcher, self)
+        if isinstance(matcher, Not):
+            return _NotNode(matcher, self)
+        return _Node(matcher, self)
+
+    def matches(self, data):
+        """ Return ``True`` if ``data`` is valid according to the compiled matcher. """
+        result = self.root.evaluate(data)
+
+        recorder = self.recorder or matcher_stats.recorder
+        if recorder is not None:
+            recorder.record_result(self.name, result)
+        return result
+
+    __call__ = matches
+
+    def stats(self):
+        """ Return the calls, accepted results and mean cost in seconds of every leaf matcher. """
+        result = []
+        nodes = [self.root]
+        while nodes:
+            node = nodes.pop()
+            if isinstance(node, _CompositeNode):
+                nodes.extend(node.children)
+            elif isinstance(node, _NotNode):
+                nodes.append(node.child)
+            else:
+                result.append({
+                    'matcher': node.matcher,
+                    'calls': node.calls,
+                    'accepted': node.accepted,
+                    'cost': node.mean_cost(),
+                })
+        return result
+
+
+def compile_matcher(matcher, reorder_every=128, sample_every=8, name='compiled', stats=None):
+    """ Compile ``matcher``, a :class:`Matcher` or function, into an :class:`Evaluator`.
+
+    :param matcher: the matcher to compile
+    :type matcher: :class:`Matcher` or callable
+    :param reorder_every: evaluations between each reordering
+    :type reorder_every: int
+    :param sample_every: evaluations between each cost measurement
+    :type sample_every: int
+    :param name: name of the published stats
+    :type name: string
+    :param stats: recorder of the evaluations, kept in :attr:`Evaluator.recorder`
+    :type stats: :class:`MatcherStats <scrapy_mosquitera.stats.MatcherStats>`
+    :rtype: :class:`Evaluator`
+
+    """
+    return Evaluator(matcher, reorder_every=reorder_every, sample_every=sample_every,
+                     name=name, stats=stats)
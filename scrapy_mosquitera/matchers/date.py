@@ -1,20 +1,82 @@
+import re
+import weakref
 import datetime
+import functools
 
-import dateparser
 import six
 
+from scrapy_mosquitera import stats as matcher_stats
+from scrapy_mosquitera.cache import LRUCache, freeze
+from scrapy_mosquitera.matchers.compose import Matcher
+from scrapy_mosquitera.matchers.intervals import IntervalIndex
+
+# dateparser, pytz and numpy are slow to import, so they're loaded on first use.
+dateparser = None
+_numpy = None
+_NUMPY_MISSING = object()
+
+
+def _get_dateparser():
+    """ Import dateparser on the first fuzzy parse. """
+    global dateparser
+    if dateparser is None:
+        import dateparser as module
+        dateparser = module
+    return dateparser
+
+
+def _get_numpy():
+    """ Return the numpy module or ``None`` if it isn't installed. """
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy as module
+        except ImportError:
+            module = _NUMPY_MISSING
+        _numpy = module
+    return None if _numpy is _NUMPY_MISSING else _numpy
+
+
+# Unpinned relative expressions ("2 hours ago") drift, so their entries expire.
+PARSE_CACHE_SIZE = 4096
+PARSE_CACHE_TTL = 60
+
+_parse_cache = LRUCache(maxsize=PARSE_CACHE_SIZE, ttl=PARSE_CACHE_TTL)
+_MISSING = object()
+
+_TIMESTAMP_RE = re.compile(r'^(\d{10})(\d{3})?(\d{3})?$')
+_ISO8601_RE = re.compile(
+    r'^(\d{4})-(\d{2})-(\d{2})'
+    r'(?:[T ](\d{2}):(\d{2})(?::(\d{2})(?:\.(\d{1,6}))?)?'
+    r'(Z|[+-]\d{2}:?\d{2})?)?$'
+)
+_RFC2822_RE = re.compile(
+    r'^(?:(?:Mon|Tue|Wed|Thu|Fri|Sat|Sun),\s*)?'
+    r'(\d{1,2}) (Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec) (\d{4}) '
+    r'(\d{2}):(\d{2})(?::(\d{2}))? ([+-]\d{4}|GMT|UTC|UT)$'
+)
+_MONTHS = dict((name, i) for i, name in enumerate(
+    ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'], 1
+))
+
 
 def get_week_number_from_date(date_obj):
     return date_obj.isocalendar()[1]
 
 
-def _to_datetime(v):
-    """ Return datetime object or raise TypeError after parsing ``v``. """
+def _to_datetime(v, relative_base=None, learner=None, parser=None):
+    """ Return datetime object or raise TypeError after parsing ``v``.
+
+    Relative expressions are resolved against ``relative_base`` if given.
+    Strings are parsed with the formats known by ``learner``, a :class:`FormatLearner`,
+    before falling back to dateparser, configured by ``parser`` if given.
+
+    """
     if isinstance(v, datetime.datetime):
         return v
 
     if isinstance(v, six.string_types):
-        dd = dateparser.parse(v)
+        dd = _parse_date_string(v, relative_base, learner, parser)
         if dd:
             return dd
 
@@ -24,12 +86,285 @@ def _to_datetime(v):
     raise TypeError('Invalid argument for date type.')
 
 
+def _parse_date_string(v, relative_base=None, learner=None, parser=None):
+    """ Return the datetime parsed from string ``v`` or ``None``, using the parse cache. """
+    key = v, relative_base, parser and parser.key
+    dd = _parse_cache.get(key, _MISSING)
+    if dd is not _MISSING:
+        return dd
+
+    dd = _parse_with_tiers(v, relative_base, learner, parser)
+
+    # Results pinned to a relative base never go stale
+    if relative_base:
+        _parse_cache.set(key, dd, ttl=None)
+    else:
+        _parse_cache.set(key, dd)
+
+    return dd
+
+
+def configure_parse_cache(maxsize=PARSE_CACHE_SIZE, ttl=PARSE_CACHE_TTL):
+    """ Replace the parse cache with a new one of ``maxsize`` entries
+    expiring after ``ttl`` seconds (``None`` for no limit).
+
+    """
+    global _parse_cache
+    _parse_cache = LRUCache(maxsize=maxsize, ttl=ttl)
+
+
+def parse_cache_info():
+    """ Return a dict with the hits, misses and size of the parse cache. """
+    return _parse_cache.info()
+
+
+def _tzinfo_from_offset(offset):
+    """ Return a tzinfo for an offset like ``Z``, ``+0200`` or ``-05:30``. """
+    import pytz
+
+    if offset in ('Z', 'GMT', 'UTC', 'UT'):
+        return pytz.utc
+
+    offset = offset.replace(':', '')
+    minutes = int(offset[1:3]) * 60 + int(offset[3:5])
+    return pytz.FixedOffset(-minutes if offset[0] == '-' else minutes)
+
+
+def _parse_timestamp(v):
+    """ Parse Unix timestamps in seconds, milliseconds or microseconds. """
+    m = _TIMESTAMP_RE.match(v)
+    if not m:
+        return None
+
+    seconds, millis, micros = m.groups()
+    microsecond = int(millis or 0) * 1000 + int(micros or 0)
+    return datetime.datetime.fromtimestamp(int(seconds)).replace(microsecond=microsecond)
+
+
+def _parse_iso8601(v):
+    """ Parse ISO-8601 dates and datetimes like ``2016-04-15T10:20:30.5+02:00``. """
+    m = _ISO8601_RE.match(v)
+    if not m:
+        return None
+
+    year, month, day, hour, minute, second, fraction, offset = m.groups()
+    dd = datetime.datetime(
+        int(year), int(month), int(day), int(hour or 0), int(minute or 0),
+        int(second or 0), int((fraction or '0').ljust(6, '0'))
+    )
+
+    if offset:
+        dd = dd.replace(tzinfo=_tzinfo_from_offset(offset))
+
+    return dd
+
+
+def _parse_rfc2822(v):
+    """ Parse RFC 2822 datetimes like ``Fri, 15 Apr 2016 10:20:30 +0200``. """
+    m = _RFC2822_RE.match(v)
+    if not m:
+        return None
+
+    day, month, year, hour, minute, second, offset = m.groups()
+    return datetime.datetime(
+        int(year), _MONTHS[month], int(day), int(hour), int(minute), int(second or 0),
+        tzinfo=_tzinfo_from_offset(offset)
+    )
+
+
+# Fast parsers tried in order before falling back to dateparser.
+# Each one returns the same as ``dateparser.parse`` for the strings it accepts.
+_FAST_PARSERS = (
+    ('timestamp', _parse_timestamp),
+    ('iso8601', _parse_iso8601),
+    ('rfc2822', _parse_rfc2822),
+)
+
+_parse_tier_hits = dict.fromkeys(
+    [name for name, _ in _FAST_PARSERS] + ['learned', 'dateparser'], 0
+)
+
+
+def _parse_with_tiers(v, relative_base=None, learner=None, parser=None):
+    """ Return the datetime parsed from string ``v`` or ``None``.
+
+    Well-known fixed formats are parsed directly, then the formats
+    learned by ``learner`` are tried and everything else goes to dateparser.
+
+    """
+    stripped = v.strip()
+    fast_parsers = _FAST_PARSERS if parser is None or parser.allows_fast_parsers else ()
+    for name, parse in fast_parsers:
+        try:
+            dd = parse(stripped)
+        except (ValueError, OverflowError):
+            # Well formed but invalid, like 2016-02-30
+            dd = None
+
+        if dd is not None:
+            _parse_tier_hits[name] += 1
+            return dd
+
+    if learner is not None:
+        dd = learner.parse(stripped)
+        if dd is not None:
+            _parse_tier_hits['learned'] += 1
+            return dd
+
+    _parse_tier_hits['dateparser'] += 1
+    if parser is not None:
+        dd = parser.parse(v)
+    else:
+        settings = {'RELATIVE_BASE': relative_base} if relative_base else None
+        dd = _get_dateparser().parse(v, settings=settings)
+
+    if learner is not None and dd is not None:
+        learner.learn(stripped, dd)
+
+    return dd
+
+
+def parse_tier_info():
+    """ Return a dict with the number of strings parsed by each parser tier. """
+    return dict(_parse_tier_hits)
+
+
+# dateparser settings which don't change how the fixed formats are parsed
+_FAST_PARSER_SAFE_SETTINGS = frozenset([
+    'RELATIVE_BASE', 'PREFER_DATES_FROM', 'PREFER_DAY_OF_MONTH', 'PREFER_LOCALE_DATE_ORDER',
+    'STRICT_PARSING', 'REQUIRE_PARTS', 'SKIP_TOKENS', 'NORMALIZE',
+])
+
+
+class _ConfiguredParser(object):
+    """ dateparser configured once with ``languages``, ``locales`` and ``settings``.
+
+    The ``DateDataParser`` is built on the first parse and reused afterwards,
+    instead of letting ``dateparser.parse`` build one per call.
+
+    """
+    def __init__(self, languages=None, locales=None, settings=None):
+        self.languages = list(languages) if languages else None
+        self.locales = list(locales) if locales else None
+        self.settings = dict(settings or {})
+        self.allows_fast_parsers = set(self.settings) <= _FAST_PARSER_SAFE_SETTINGS
+        self.key = freeze((self.languages, self.locales, self.settings))
+        self._parser = None
+
+    def parse(self, v):
+        if self._parser is None:
+            from dateparser.date import DateDataParser
+            self._parser = DateDataParser(
+                languages=self.languages, locales=self.locales, settings=self.settings
+            )
+
+        return self._parser.get_date_data(v)['date_obj']
+
+
+def _get_learnable_formats():
+    dates = [
+        '%Y-%m-%d', '%Y/%m/%d', '%d/%m/%Y', '%m/%d/%Y', '%d-%m-%Y', '%m-%d-%Y', '%d.%m.%Y',
+        '%B %d, %Y', '%b %d, %Y', '%B %d %Y', '%b %d %Y', '%d %B %Y', '%d %b %Y',
+        '%A, %B %d, %Y', '%a, %b %d, %Y', '%A, %d %B %Y', '%a, %d %b %Y',
+    ]
+    times = ['', ' %H:%M', ' %H:%M:%S', ' %I:%M %p', ', %H:%M', ', %I:%M %p', ' at %H:%M']
+    return tuple(d + t for d in dates for t in times)
+
+
+LEARNABLE_FORMATS = _get_learnable_formats()
+
+
+class FormatLearner(object):
+    """ Learn the explicit formats used by a site from the strings parsed by dateparser.
+
+    Once ``samples`` strings parsed by dateparser in a row are matched by the same format,
+    that format is used to parse the next strings directly with ``strptime``.
+    Strings the learned formats can't parse still go to dateparser and, if they're
+    written in another format, they're used to learn it. Only the ``max_formats``
+    most recently learned formats are kept, so formats that stop matching are dropped.
+
+    Relative or fuzzy strings like *Yesterday* don't match any format, so they're
+    ignored while learning.
+
+    Use one learner per domain or per spider, since each site has its own formats::
+
+        learner = FormatLearner()
+        date_matches(date, after='5 days ago', learner=learner)
+
+    :param samples: consistent parses needed to learn a format
+    :type samples: int
+    :param max_formats: number of learned formats to keep
+    :type max_formats: int
+    :param formats: candidate ``strptime`` formats
+    :type formats: sequence of strings
+
+    """
+    def __init__(self, samples=5, max_formats=2, formats=LEARNABLE_FORMATS):
+        self.samples = samples
+        self.max_formats = max_formats
+        self.formats = []
+        self._candidate_formats = formats
+        self._candidates = None
+        self._seen = 0
+        self.hits = 0
+        self.misses = 0
+
+    def parse(self, v):
+        """ Return the datetime parsed from ``v`` with a learned format or ``None``. """
+        for fmt in self.formats:
+            try:
+                dd = datetime.datetime.strptime(v, fmt)
+            except ValueError:
+                continue
+
+            self.hits += 1
+            return dd
+
+        self.misses += 1
+        return None
+
+    def learn(self, v, dd):
+        """ Learn from string ``v`` parsed by dateparser as ``dd``. """
+        # Aware and relative results can't be reproduced with strptime
+        if dd.tzinfo is not None:
+            return
+
+        candidates = set(fmt for fmt in self._candidate_formats if _strptime_equals(v, fmt, dd))
+        if not candidates:
+            return
+
+        if self._candidates is not None and self._candidates & candidates:
+            self._candidates &= candidates
+            self._seen += 1
+        else:
+            # First sample or the format changed, start again
+            self._candidates = candidates
+            self._seen = 1
+
+        if self._seen >= self.samples:
+            fmt = min(self._candidates, key=self._candidate_formats.index)
+            self.formats = [fmt] + [f for f in self.formats if f != fmt][:self.max_formats - 1]
+            self._candidates = None
+            self._seen = 0
+
+    def info(self):
+        """ Return a dict with the learned formats and the hits and misses using them. """
+        return {'formats': list(self.formats), 'hits': self.hits, 'misses': self.misses}
+
+
+def _strptime_equals(v, fmt, dd):
+    try:
+        return datetime.datetime.strptime(v, fmt) == dd
+    except ValueError:
+        return False
+
+
 def has_valid_date(target_date, min_date, max_date):
     """ Return ``True`` if ``target_date`` is inside the range [min_date, max_date] """
     return min_date <= target_date < max_date
 
 
-def _get_min_date(kwargs):
+def _get_min_date(kwargs, relative_base=None, parser=None):
     """ Return datetime object or None.
 
     Accepted parameters:
@@ -47,18 +382,18 @@ def _get_min_date(kwargs):
     min_date_arg = kwargs.get('min_date')
 
     if min_date_arg:
-        min_date = _to_datetime(min_date_arg)
+        min_date = _to_datetime(min_date_arg, relative_base, parser=parser)
     elif on:
-        min_date = _to_datetime(on)
+        min_date = _to_datetime(on, relative_base, parser=parser)
     elif after:
-        min_date = _to_datetime(after)
+        min_date = _to_datetime(after, relative_base, parser=parser)
     elif since:
-        min_date = _to_datetime(since)
+        min_date = _to_datetime(since, relative_base, parser=parser)
 
     return min_date
 
 
-def _get_max_date(kwargs):
+def _get_max_date(kwargs, relative_base=None, parser=None):
     """ Return datetime object or None.
 
     Time in result is set to 23:59 if no time is provided.
@@ -76,11 +411,11 @@ def _get_max_date(kwargs):
     max_date_arg = kwargs.get('max_date')
 
     if max_date_arg:
-        max_date = _to_datetime(max_date_arg)
+        max_date = _to_datetime(max_date_arg, relative_base, parser=parser)
     elif on:
-        max_date = _to_datetime(on)
+        max_date = _to_datetime(on, relative_base, parser=parser)
     elif before:
-        max_date = _to_datetime(before)
+        max_date = _to_datetime(before, relative_base, parser=parser)
 
     # Set to midnight if time is not set
     if max_date and not (max_date.hour or max_date.minute or max_date.second):
@@ -103,11 +438,23 @@ def date_matches(data, **kwargs):
     if not data:
         return False
 
-    target_date = _to_datetime(data)
-    min_date = _get_min_date(kwargs)
-    max_date = _get_max_date(kwargs)
+    return compile_date_matcher(**kwargs).matches(data)
+
+
+def date_matches_many(values, as_indices=False, **kwargs):
+    """ Return which of ``values`` are dates in the valid date range.
 
-    return has_valid_date(target_date, min_date, max_date)
+    Batch version of :func:`date_matches`, see :meth:`DateMatcher.matches_many`.
+
+    :param values: the dates to validate
+    :type values: iterable of strings, dates or datetimes
+    :param as_indices: return the positions of the matching values instead of a mask
+    :type as_indices: bool
+    :param kwargs: special delimitation parameters
+    :type kwargs: dict
+
+    """
+    return compile_date_matcher(**kwargs).matches_many(values, as_indices)
 
 
 def _date_in_period_day(target_date, min_date, max_date, check_maximum):
@@ -119,39 +466,66 @@ def _date_in_period_day(target_date, min_date, max_date, check_maximum):
     return result
 
 
-def _date_in_period_week(target_date, min_date, max_date, check_maximum):
-    week_under_question = target_date.year, get_week_number_from_date(target_date)
-    min_week = min_date.year, get_week_number_from_date(min_date)
-    result = min_week <= week_under_question
+def _hour_key(date_obj):
+    return date_obj.toordinal() * 24 + date_obj.hour
 
-    if result and check_maximum:
-        max_week = max_date.year, get_week_number_from_date(max_date)
-        result &= week_under_question <= max_week
 
-    return result
+def _week_key(date_obj):
+    # Ordinal 1 (0001-01-01) is a Monday, so this is the index of the ISO week
+    return (date_obj.toordinal() - 1) // 7
 
 
-def _date_in_period_month(target_date, min_date, max_date, check_maximum):
-    month_under_question = target_date.year, target_date.month
-    min_month = min_date.year, min_date.month
-    result = min_month <= month_under_question
+def _month_key(date_obj):
+    return date_obj.year * 12 + date_obj.month - 1
 
-    if result and check_maximum:
-        max_month = max_date.year, max_date.month
-        result &= month_under_question <= max_month
 
-    return result
+def _quarter_key(date_obj):
+    return date_obj.year * 4 + (date_obj.month - 1) // 3
 
 
-def _date_in_period_year(target_date, min_date, max_date, check_maximum):
-    result = min_date.year <= target_date.year
+def _year_key(date_obj):
+    return date_obj.year
+
+
+# Period name -> function returning the integer index of the period a date falls in.
+# ``None`` means the full datetime is compared, as in ``_date_in_period_day``.
+_PERIOD_KEYS = {
+    'hour': _hour_key,
+    'hours': _hour_key,
+    'day': None,
+    'week': _week_key,
+    'weeks': _week_key,
+    'month': _month_key,
+    'months': _month_key,
+    'quarter': _quarter_key,
+    'quarters': _quarter_key,
+    'year': _year_key,
+    'years': _year_key,
+}
+
+
+def _date_in_period(key, target_date, min_date, max_date, check_maximum):
+    period_under_question = key(target_date)
+    result = key(min_date) <= period_under_question
 
     if result and check_maximum:
-        result &= target_date.year <= max_date.year
+        result &= period_under_question <= key(max_date)
 
     return result
 
 
+def _date_in_period_week(target_date, min_date, max_date, check_maximum):
+    return _date_in_period(_week_key, target_date, min_date, max_date, check_maximum)
+
+
+def _date_in_period_month(target_date, min_date, max_date, check_maximum):
+    return _date_in_period(_month_key, target_date, min_date, max_date, check_maximum)
+
+
+def _date_in_period_year(target_date, min_date, max_date, check_maximum):
+    return _date_in_period(_year_key, target_date, min_date, max_date, check_maximum)
+
+
 def date_in_period_matches(data, period='day', check_maximum=True, **kwargs):
     """ Return ``True`` if ``data`` is a date in the valid date range defined by ``period``.
         Otherwise ``False``.
@@ -187,7 +561,7 @@ def date_in_period_matches(data, period='day', check_maximum=True, **kwargs):
 
         :param data: the date to validate
         :type data: string, date or datetime
-        :param period: the period to evaluate ('day', 'month', 'year')
+        :param period: the period to evaluate ('hour', 'day', 'week', 'month', 'quarter', 'year')
         :type period: string
         :param check_maximum: check maximum date
         :type check_maximum: bool
@@ -199,22 +573,516 @@ def date_in_period_matches(data, period='day', check_maximum=True, **kwargs):
     if not data:
         return False
 
-    target_date = _to_datetime(data)
-    min_date = _get_min_date(kwargs)
-    max_date = _get_max_date(kwargs)
+    matcher = compile_date_matcher(period=period, check_maximum=check_maximum, **kwargs)
+    return matcher.matches(data)
 
+
+def date_in_period_matches_many(values, period='day', check_maximum=True,
+                                as_indices=False, **kwargs):
+    """ Return which of ``values`` are dates in the valid date range defined by ``period``.
+
+    Batch version of :func:`date_in_period_matches`, see :meth:`DateMatcher.matches_many`.
+
+    :param values: the dates to validate
+    :type values: iterable of strings, dates or datetimes
+    :param period: the period to evaluate ('hour', 'day', 'week', 'month', 'quarter', 'year')
+    :type period: string
+    :param check_maximum: check maximum date
+    :type check_maximum: bool
+    :param as_indices: return the positions of the matching values instead of a mask
+    :type as_indices: bool
+    :param kwargs: special delimitation parameters
+    :type kwargs: dict
+
+    """
+    matcher = compile_date_matcher(period=period, check_maximum=check_maximum, **kwargs)
+    return matcher.matches_many(values, as_indices)
+
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+# datetime.min and datetime.max stand for unbounded limits
+_MIN_EPOCH = -2 ** 63
+_MAX_EPOCH = 2 ** 63 - 1
+
+
+def _get_timezone(timezone):
+    """ Return the tzinfo for ``timezone``, a name like ``'Europe/Madrid'`` or a tzinfo. """
+    if isinstance(timezone, six.string_types):
+        import pytz
+        return pytz.timezone(timezone)
+    return timezone
+
+
+def _to_naive(date_obj):
     # jettison tzinfo to force comparison only with naive approach
-    target_date = target_date.replace(tzinfo=None)
-
-    if period == 'day':
-        result = _date_in_period_day(target_date, min_date, max_date, check_maximum)
-    elif period in ['week', 'weeks']:
-        result = _date_in_period_week(target_date, min_date, max_date, check_maximum)
-    elif period in ['month', 'months']:
-        result = _date_in_period_month(target_date, min_date, max_date, check_maximum)
-    elif period in ['year', 'years']:
-        result = _date_in_period_year(target_date, min_date, max_date, check_maximum)
+    if date_obj.tzinfo is not None:
+        return date_obj.replace(tzinfo=None)
+    return date_obj
+
+
+def _to_utc(date_obj, timezone):
+    """ Return ``date_obj`` as a naive UTC datetime. Naive dates are read in ``timezone``. """
+    if date_obj.tzinfo is None:
+        if date_obj in (datetime.datetime.min, datetime.datetime.max):
+            return date_obj
+
+        if hasattr(timezone, 'localize'):
+            date_obj = timezone.localize(date_obj)
+        else:
+            date_obj = date_obj.replace(tzinfo=timezone)
+
+    return date_obj.replace(tzinfo=None) - date_obj.utcoffset()
+
+
+def _to_epoch(date_obj, timezone):
+    """ Return ``date_obj`` in microseconds since the Unix epoch.
+    Naive dates are read in ``timezone``.
+
+    """
+    if date_obj.tzinfo is None:
+        if date_obj == datetime.datetime.min:
+            return _MIN_EPOCH
+        if date_obj == datetime.datetime.max:
+            return _MAX_EPOCH
+
+    delta = _to_utc(date_obj, timezone) - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+
+class DateMatcher(Matcher):
+    """ Date matcher with its bounds resolved once.
+
+    It accepts the same delimitation parameters as :func:`date_matches`.
+    If ``period`` is given, it behaves as :func:`date_in_period_matches`.
+
+    Relative expressions like *5 days ago* are resolved against ``relative_base``,
+    which defaults to the moment the matcher is built. That way, every item
+    of a crawl is evaluated against the same window and the bounds
+    are parsed only once.
+
+    :param period: the period to evaluate ('hour', 'day', 'week', 'month', 'quarter', 'year')
+    :type period: string
+    :param check_maximum: check maximum date (only used with ``period``)
+    :type check_maximum: bool
+    :param relative_base: the date relative expressions are resolved against
+    :type relative_base: datetime
+    :param learner: learner of the formats of the matched strings
+    :type learner: :class:`FormatLearner`
+    :param languages: dateparser languages, restricting them makes parsing much faster
+    :type languages: list
+    :param locales: dateparser locales
+    :type locales: list
+    :param settings: dateparser settings, like ``DATE_ORDER`` or ``PREFER_DATES_FROM``
+    :type settings: dict
+    :param timezone: if set, dates are compared in UTC and naive ones are read in this timezone
+    :type timezone: string or tzinfo
+    :param stats: recorder of the calls, defaults to the one installed by the extension
+    :type stats: :class:`MatcherStats <scrapy_mosquitera.stats.MatcherStats>`
+    :param windows: disjoint date ranges to match instead of the delimitation parameters,
+        as ``(min_date, max_date)`` tuples or dicts of delimitation parameters
+    :type windows: iterable
+    :param kwargs: special delimitation parameters
+    :type kwargs: dict
+
+    """
+    # Estimated microseconds per call, parsing strings is the most expensive part
+    cost = 50.0
+
+    def __init__(self, period=None, check_maximum=True, relative_base=None, learner=None,
+                 languages=None, locales=None, settings=None, timezone=None, stats=None, windows=None, **kwargs):
+        if period is not None and period not in _PERIOD_KEYS:
+            raise ValueError('Unknown period: {period}'.format(period=period))
+        if windows is not None and kwargs:
+            raise ValueError("Windows and delimitation parameters can't be combined")
+
+        settings = dict(settings or {})
+        relative_base = relative_base or settings.get('RELATIVE_BASE') or datetime.datetime.now()
+        settings['RELATIVE_BASE'] = relative_base
+
+        self.period = period
+        self.check_maximum = check_maximum
+        self.relative_base = relative_base
+        self.learner = learner
+        self.stats = stats
+        self.name = 'date_in_period' if period else 'date'
+        self.parser = _ConfiguredParser(languages, locales, settings)
+        self.min_date = _get_min_date(kwargs, relative_base, self.parser)
+        self.max_date = _get_max_date(kwargs, relative_base, self.parser)
+
+        self.timezone = _get_timezone(timezone) if timezone else None
+        key = _PERIOD_KEYS[period] if period else None
+
+        # Parsed dates are normalized before matching: to UTC if a timezone is set,
+        # to naive datetimes when matching periods.
+        if self.timezone is not None:
+            convert = _to_utc if key else _to_epoch
+            self._normalize = functools.partial(convert, timezone=self.timezone)
+        elif period is not None:
+            self._normalize = _to_naive
+        else:
+            self._normalize = None
+
+        normalize = self._normalize or (lambda date_obj: date_obj)
+        self._key = key
+        if key is None:
+            self._min_key = normalize(self.min_date)
+            self._max_key = normalize(self.max_date) if period is None or check_maximum else None
+            self._match = self._match_bounds
+        else:
+            # Without maximum, any key is below the maximum key
+            self._min_key = key(normalize(self.min_date))
+            self._max_key = key(normalize(self.max_date) if check_maximum else datetime.datetime.max)
+            self._match = self._match_period
+
+        self.windows = None
+        self._window_arrays = None
+        if windows is not None:
+            self.windows = self._build_windows(windows, normalize)
+            self._match = self._match_windows
+
+    def _build_windows(self, windows, normalize):
+        """ Return the :class:`IntervalIndex` of the normalized ``windows``. """
+        ranges = []
+        for window in windows:
+            if not isinstance(window, dict):
+                window = {'min_date': window[0], 'max_date': window[1]}
+
+            min_date = normalize(_get_min_date(window, self.relative_base, self.parser))
+            max_date = normalize(_get_max_date(window, self.relative_base, self.parser))
+            if self._key is None:
+                # Same as the bounds, the maximum is excluded
+                ranges.append((min_date, max_date, 'left'))
+            else:
+                ranges.append((self._key(min_date), self._key(max_date)))
+
+        return IntervalIndex(ranges)
+
+    def _match_windows(self, target_date):
+        if self._key is not None:
+            target_date = self._key(target_date)
+        return self.windows.find(target_date) >= 0
+
+    def _match_bounds(self, target_date):
+        if self._max_key is None:
+            return self._min_key <= target_date
+        return self._min_key <= target_date < self._max_key
+
+    def _match_period(self, target_date):
+        return self._min_key <= self._key(target_date) <= self._max_key
+
+    def matches(self, data):
+        """ Return ``True`` if ``data`` is a date inside the matcher range.
+        Otherwise ``False``.
+
+        :param data: the date to validate
+        :type data: string, date or datetime
+        :rtype: bool
+
+        """
+        recorder = self.stats or matcher_stats.recorder
+        if recorder is not None:
+            return self._recorded_matches(data, recorder)
+
+        if not data:
+            return False
+
+        target_date = _to_datetime(data, self.relative_base, self.learner, self.parser)
+        if self._normalize is not None:
+            target_date = self._normalize(target_date)
+
+        return self._match(target_date)
+
+    __call__ = matches
+
+    def _recorded_matches(self, data, recorder):
+        if not data:
+            recorder.record_result(self.name, False)
+            return False
+
+        try:
+            if recorder.should_time():
+                start = recorder.timer()
+                target_date = _to_datetime(data, self.relative_base, self.learner, self.parser)
+                recorder.record_latency(recorder.timer() - start)
+            else:
+                target_date = _to_datetime(data, self.relative_base, self.learner, self.parser)
+        except TypeError:
+            recorder.record_failure(self.name)
+            raise
+
+        if self._normalize is not None:
+            target_date = self._normalize(target_date)
+
+        result = self._match(target_date)
+        recorder.record_result(self.name, result)
+        return result
+
+    def compare(self, data):
+        """ Return -1 if ``data`` is a date older than the matcher range,
+        1 if it's newer and 0 if it's inside.
+
+        With ``windows``, the range spans from the first window to the last one.
+        It's used to know on which side of the range a listing page falls.
+
+        :param data: the date to compare
+        :type data: string, date or datetime
+        :rtype: int
+
+        """
+        target_date = _to_datetime(data, self.relative_base, self.learner, self.parser)
+        if self._normalize is not None:
+            target_date = self._normalize(target_date)
+        if self._key is not None:
+            target_date = self._key(target_date)
+
+        if self.windows is not None:
+            if not self.windows:
+                return -1
+            key = (target_date, 0)
+            if key < self.windows.starts[0]:
+                return -1
+            return 1 if key > self.windows.ends[-1] else 0
+
+        if target_date < self._min_key:
+            return -1
+        if self._max_key is None:
+            return 0
+        if self._key is None:
+            # The maximum is excluded when comparing dates
+            return 1 if target_date >= self._max_key else 0
+        return 1 if target_date > self._max_key else 0
+
+    @classmethod
+    def from_settings(cls, settings, **kwargs):
+        """ Return a matcher configured with the dateparser options in Scrapy ``settings``:
+
+        * ``MOSQUITERA_DATEPARSER_LANGUAGES``
+        * ``MOSQUITERA_DATEPARSER_LOCALES``
+        * ``MOSQUITERA_DATEPARSER_SETTINGS``
+        * ``MOSQUITERA_TIMEZONE``
+
+        Options given in ``kwargs`` have precedence.
+
+        """
+        kwargs.setdefault('languages', settings.getlist('MOSQUITERA_DATEPARSER_LANGUAGES') or None)
+        kwargs.setdefault('locales', settings.getlist('MOSQUITERA_DATEPARSER_LOCALES') or None)
+        kwargs.setdefault('settings', settings.getdict('MOSQUITERA_DATEPARSER_SETTINGS') or None)
+        kwargs.setdefault('timezone', settings.get('MOSQUITERA_TIMEZONE'))
+        return cls(**kwargs)
+
+    @classmethod
+    def from_crawler(cls, crawler, **kwargs):
+        """ Return a matcher configured like :meth:`from_settings`, recording its calls
+        to the :class:`MatcherStats <scrapy_mosquitera.stats.MatcherStats>` extension of ``crawler``
+        and resolving relative expressions against the start of the crawl, see :func:`pin_to_crawl`.
+
+        """
+        kwargs.setdefault('stats', matcher_stats.get_recorder(crawler))
+        kwargs.setdefault('relative_base', pin_to_crawl(crawler))
+        return cls.from_settings(crawler.settings, **kwargs)
+
+    def _match_unique(self, dates):
+        """ Return the match result for each parsed date in ``dates``. """
+        if self._normalize is not None:
+            dates = [self._normalize(d) for d in dates]
+
+        numpy = _get_numpy()
+        if numpy is None or not dates:
+            return [self._match(d) for d in dates]
+
+        min_key, max_key = self._min_key, self._max_key
+        if self._key is not None:
+            arr = numpy.fromiter((self._key(d) for d in dates), dtype=numpy.int64, count=len(dates))
+        elif self.timezone is not None:
+            arr = numpy.array(dates, dtype=numpy.int64)
+        elif all(d.tzinfo is None for d in dates):
+            arr = numpy.array(dates, dtype='datetime64[us]')
+            if self.windows is None:
+                min_key = numpy.datetime64(min_key, 'us')
+                if max_key is not None:
+                    max_key = numpy.datetime64(max_key, 'us')
+        else:
+            return [self._match(d) for d in dates]
+
+        if self.windows is not None:
+            return self._match_windows_array(numpy, arr)
+
+        if self._key is not None:
+            return (arr >= min_key) & (arr <= max_key)
+
+        mask = arr >= min_key
+        if max_key is not None:
+            mask &= arr < max_key
+        return mask
+
+    def _match_windows_array(self, numpy, arr):
+        """ Vectorized :meth:`IntervalIndex.find` over ``arr``. """
+        # The boundary arrays are built once, the dtype only depends on the matcher
+        if self._window_arrays is None:
+            self._window_arrays = (
+                numpy.array([value for value, _ in self.windows.starts], dtype=arr.dtype),
+                numpy.array([value for value, _ in self.windows.ends], dtype=arr.dtype),
+                numpy.array([flag == 0 for _, flag in self.windows.starts], dtype=bool),
+                numpy.array([flag == 0 for _, flag in self.windows.ends], dtype=bool),
+            )
+        starts, ends, start_inclusive, end_inclusive = self._window_arrays
+
+        if not len(starts):
+            return numpy.zeros(len(arr), dtype=bool)
+
+        # The last window starting at or before each value
+        positions = numpy.searchsorted(starts, arr, side='right') - 1
+        found = positions >= 0
+        positions = numpy.maximum(positions, 0)
+
+        start, end = starts[positions], ends[positions]
+        found &= start_inclusive[positions] | (arr > start)
+        found &= (arr < end) | (end_inclusive[positions] & (arr == end))
+        return found
+
+    def matches_many(self, values, as_indices=False):
+        """ Return which of ``values`` are dates inside the matcher range.
+
+        Every distinct value is parsed only once. The result is a boolean mask,
+        a NumPy array if NumPy is installed or a list otherwise.
+        If ``as_indices`` is ``True``, the list of matching positions is returned instead.
+
+        :param values: the dates to validate
+        :type values: iterable of strings, dates or datetimes
+        :param as_indices: return the positions of the matching values
+        :type as_indices: bool
+
+        """
+        # Position of every value in the unique dates, -1 for empty values
+        positions = []
+        seen = {}
+        dates = []
+
+        for value in values:
+            if not value:
+                positions.append(-1)
+                continue
+
+            position = seen.get(value)
+            if position is None:
+                position = seen[value] = len(dates)
+                dates.append(_to_datetime(value, self.relative_base, self.learner, self.parser))
+
+            positions.append(position)
+
+        unique_mask = self._match_unique(dates)
+
+        numpy = _get_numpy()
+        if numpy is not None:
+            # The extra False is picked by empty values
+            unique_mask = numpy.append(numpy.asarray(unique_mask, dtype=bool), False)
+            mask = unique_mask[numpy.array(positions, dtype=int)]
+            self._record_many(len(positions), int(numpy.count_nonzero(mask)))
+            return numpy.flatnonzero(mask).tolist() if as_indices else mask
+
+        mask = [position >= 0 and bool(unique_mask[position]) for position in positions]
+        self._record_many(len(mask), sum(mask))
+        if as_indices:
+            return [i for i, result in enumerate(mask) if result]
+        return mask
+
+    def _record_many(self, calls, accepted):
+        recorder = self.stats or matcher_stats.recorder
+        if recorder is not None:
+            recorder.record_results(self.name, calls, accepted)
+
+
+# Matchers compiled outside a crawl expire, so their relative bounds don't go stale.
+MATCHER_CACHE_SIZE = 256
+MATCHER_CACHE_TTL = 60
+
+_matcher_cache = LRUCache(maxsize=MATCHER_CACHE_SIZE, ttl=MATCHER_CACHE_TTL)
+# Compiled matchers of each crawler, and the crawlers not closed yet
+_crawl_caches = weakref.WeakKeyDictionary()
+_open_crawlers = weakref.WeakSet()
+
+
+class _CrawlCache(object):
+    """ Compiled matchers of a crawl, resolving relative bounds against its start. """
+    def __init__(self, crawler, relative_base):
+        self.crawler = weakref.ref(crawler)
+        self.relative_base = relative_base
+        self.matchers = LRUCache(maxsize=MATCHER_CACHE_SIZE)
+
+    def spider_closed(self, spider):
+        crawler = self.crawler()
+        if crawler is not None:
+            _open_crawlers.discard(crawler)
+
+
+def pin_to_crawl(crawler):
+    """ Pin the relative bounds of the matchers compiled for ``crawler`` to the time
+    it's first called, usually the start of the crawl, and return that time.
+
+    Matchers compiled without a crawler use its cache too while it's the only crawl
+    in the process. :class:`PaginationMixin <.PaginationMixin>` and
+    :meth:`DateMatcher.from_crawler` call it.
+
+    """
+    crawl = _crawl_caches.get(crawler)
+    if crawl is None:
+        from scrapy import signals
+
+        crawl = _crawl_caches[crawler] = _CrawlCache(crawler, datetime.datetime.now())
+        _open_crawlers.add(crawler)
+        crawler.signals.connect(crawl.spider_closed, signal=signals.spider_closed)
+    return crawl.relative_base
+
+
+def compile_date_matcher(period=None, check_maximum=True, crawler=None, **kwargs):
+    """ Return a :class:`DateMatcher` for the given parameters.
+
+    Matchers are cached, so the bounds are parsed only once. The matchers of a crawl,
+    given by ``crawler`` or the only one pinned with :func:`pin_to_crawl`, are kept
+    for the whole crawl and resolve relative expressions against its start.
+    Otherwise they're pinned to the time they're compiled and expire
+    after ``MATCHER_CACHE_TTL`` seconds.
+    Use :func:`clear_date_matcher_cache` to resolve them again by hand.
+
+    Matchers with ``windows`` aren't cached, build a :class:`DateMatcher` once
+    and reuse it instead.
+
+    """
+    if crawler is None and len(_open_crawlers) == 1:
+        # The calls of many crawls can't be told apart
+        crawler = next(iter(_open_crawlers), None)
+
+    crawl = None
+    if crawler is not None:
+        pin_to_crawl(crawler)
+        crawl = _crawl_caches[crawler]
+
+    if crawl is None:
+        cache = _matcher_cache
     else:
-        raise ValueError('Unknown period: {period}'.format(period=period))
+        cache = crawl.matchers
+        kwargs.setdefault('relative_base', crawl.relative_base)
 
-    return result
+    if kwargs.get('windows'):
+        # Their key would be rebuilt from every window on each call
+        return DateMatcher(period=period, check_maximum=check_maximum, **kwargs)
+
+    try:
+        key = (period, check_maximum, freeze(kwargs))
+        matcher = cache.get(key)
+    except TypeError:
+        # Unhashable parameters can't be cached
+        return DateMatcher(period=period, check_maximum=check_maximum, **kwargs)
+
+    if matcher is None:
+        matcher = DateMatcher(period=period, check_maximum=check_maximum, **kwargs)
+        cache.set(key, matcher)
+
+    return matcher
+
+
+def clear_date_matcher_cache():
+    """ Forget every compiled matcher, including the ones of the crawls. """
+    _matcher_cache.clear()
+    for crawl in _crawl_caches.values():
+        crawl.matchers.clear()
@@ -0,0 +1,147 @@
+from bisect import bisect_right
+
+
+class _Unbounded(object):
+    """ Value below (or above) any other, used for ranges without lower (or upper) bound. """
+    def __init__(self, sign, name):
+        self.sign = sign
+        self.name = name
+
+    def __eq__(self, other):
+        return self is other
+
+    def __ne__(self, other):
+        return self is not other
+
+    def __hash__(self):
+        return hash(self.name)
+
+    def __lt__(self, other):
+        return self is not other and self.sign < 0
+
+    def __le__(self, other):
+        return self is other or self.sign < 0
+
+    def __gt__(self, other):
+        return self is not other and self.sign > 0
+
+    def __ge__(self, other):
+        return self is other or self.sign > 0
+
+    def __repr__(self):
+        return self.name
+
+
+LOWEST = _Unbounded(-1, 'LOWEST')
+HIGHEST = _Unbounded(1, 'HIGHEST')
+
+# Inclusiveness of the (lower, upper) bounds for each ``closed`` value
+CLOSED = {
+    'both': (True, True),
+    'left': (True, False),
+    'right': (False, True),
+    'neither': (False, False),
+}
+
+
+def _start_key(value, inclusive):
+    # A value ``x`` is probed as (x, 0), so (v, 1) is only passed by x > v
+    return value, 0 if inclusive else 1
+
+
+def _end_key(value, inclusive):
+    # (v, -1) is only reached by x < v
+    return value, 0 if inclusive else -1
+
+
+class IntervalIndex(object):
+    """ Sorted index of ranges, finding if a value is inside any of them in O(log n).
+
+    Ranges are given as ``(low, high)`` or ``(low, high, closed)`` tuples,
+    ``closed`` being one of 'both' (default), 'left', 'right' or 'neither'.
+    A ``None`` bound means the range is unbounded on that side.
+    Overlapping and adjacent ranges are merged when the index is built,
+    so a lookup is a single bisection over disjoint intervals::
+
+        index = IntervalIndex([(1, 10), (10, 20, 'left'), (100, None)])
+        5 in index     # True
+        20 in index    # False
+        500 in index   # True
+
+    Bounds and values only need to be comparable with each other,
+    so the same index works for numbers, datetimes or version tuples.
+
+    :param ranges: the ranges to index
+    :type ranges: iterable of tuples
+
+    """
+    def __init__(self, ranges=()):
+        intervals = sorted(self._normalize(r) for r in ranges)
+        self.starts = []
+        self.ends = []
+
+        for start, end in intervals:
+            if self.ends and self._touches(self.ends[-1], start):
+                self.ends[-1] = max(self.ends[-1], end)
+            else:
+                self.starts.append(start)
+                self.ends.append(end)
+
+    @staticmethod
+    def _normalize(range_):
+        if len(range_) == 3:
+            low, high, closed = range_
+        else:
+            (low, high), closed = range_, 'both'
+
+        try:
+            low_inclusive, high_inclusive = CLOSED[closed]
+        except KeyError:
+            raise ValueError('Unknown closed value: {closed}'.format(closed=closed))
+
+        start = _start_key(LOWEST if low is None else low, low_inclusive)
+        end = _end_key(HIGHEST if high is None else high, high_inclusive)
+        return start, end
+
+    @staticmethod
+    def _touches(end, start):
+        """ Return ``True`` if no value fits between ``end`` and the next ``start``. """
+        if start[0] == end[0]:
+            # Only a gap if both bounds exclude the shared value
+            return start[1] - end[1] < 2
+        return start[0] < end[0]
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __bool__(self):
+        return bool(self.starts)
+
+    __nonzero__ = __bool__
+
+    def __contains__(self, value):
+        return self.find(value) >= 0
+
+    def find(self, value):
+        """ Return the position of the merged interval containing ``value``, or -1. """
+        key = (value, 0)
+        position = bisect_right(self.starts, key) - 1
+        if position >= 0 and key <= self.ends[position]:
+            return position
+        return -1
+
+    def intervals(self):
+        """ Return the merged intervals as ``(low, high, closed)`` tuples. """
+        closed_names = dict((v, k) for k, v in CLOSED.items())
+        result = []
+        for (low, low_flag), (high, high_flag) in zip(self.starts, self.ends):
+            closed = closed_names[low_flag == 0, high_flag == 0]
+            result.append((
+                None if low is LOWEST else low,
+                None if high is HIGHEST else high,
+                closed,
+            ))
+        return result
+
+    def __repr__(self):
+        return 'IntervalIndex({!r})'.format(self.intervals())
@@ -0,0 +1,217 @@
+import re
+import decimal
+
+import six
+
+from scrapy_mosquitera import stats as matcher_stats
+from scrapy_mosquitera.cache import LRUCache, freeze
+from scrapy_mosquitera.matchers.compose import Matcher
+from scrapy_mosquitera.matchers.intervals import IntervalIndex
+
+# Optional sign, digits with thousands separators and decimals: -1,299.90
+_NUMBER_RE = re.compile(r'[-+]?\d[\d,]*(?:\.\d+)?')
+_VERSION_RE = re.compile(r'\d+(?:\.\d+)*')
+
+_NUMBER_TYPES = six.integer_types + (float, decimal.Decimal)
+
+
+def _to_number(v):
+    """ Return the number in ``v`` or raise TypeError.
+
+    Strings like ``'#1234'``, ``'$1,299.90'`` or ``'Page 3'`` are accepted,
+    the first number in them is used.
+
+    """
+    if isinstance(v, _NUMBER_TYPES) and not isinstance(v, bool):
+        return v
+
+    if isinstance(v, six.string_types):
+        match = _NUMBER_RE.search(v)
+        if match:
+            number = match.group().replace(',', '')
+            return float(number) if '.' in number else int(number)
+
+    raise TypeError('Invalid argument for number type.')
+
+
+def _to_version(v):
+    """ Return ``v`` as a tuple of integers, like ``(1, 10, 2)`` for ``'v1.10.2'``, or raise TypeError. """
+    if isinstance(v, tuple):
+        return v
+    if isinstance(v, six.integer_types) and not isinstance(v, bool):
+        return (v,)
+
+    if isinstance(v, six.string_types):
+        match = _VERSION_RE.search(v)
+        if match:
+            return tuple(int(part) for part in match.group().split('.'))
+
+    raise TypeError('Invalid argument for version type.')
+
+
+class NumberMatcher(Matcher):
+    """ Matcher of values inside any of many numeric ranges.
+
+    Ranges are kept in an :class:`IntervalIndex <.IntervalIndex>`, so matching a value
+    against hundreds of them costs a single bisection.
+    The range given by the delimitation parameters is added to ``ranges``.
+
+    Accepted delimitation parameters:
+
+    * min_value (inclusive)
+    * max_value (inclusive)
+    * greater_than (exclusive)
+    * less_than (exclusive)
+
+    :param ranges: ``(low, high)`` or ``(low, high, closed)`` ranges, see :class:`IntervalIndex <.IntervalIndex>`
+    :type ranges: iterable of tuples
+    :param stats: recorder of the calls, defaults to the one installed by the extension
+    :type stats: :class:`MatcherStats <scrapy_mosquitera.stats.MatcherStats>`
+    :param kwargs: special delimitation parameters
+    :type kwargs: dict
+
+    """
+    name = 'number'
+    cost = 2.0
+    convert = staticmethod(_to_number)
+
+    def __init__(self, ranges=(), stats=None, **kwargs):
+        ranges = [self._convert_range(r) for r in ranges]
+
+        bounds = self._get_bounds(kwargs)
+        if bounds is not None or not ranges:
+            # Without any range, every value matches
+            ranges.append(bounds or (None, None))
+
+        self.stats = stats
+        self.index = IntervalIndex(ranges)
+
+    def _convert_range(self, range_):
+        low, high = range_[:2]
+        low = None if low is None else self.convert(low)
+        high = None if high is None else self.convert(high)
+        return (low, high) + tuple(range_[2:])
+
+    def _get_bounds(self, kwargs):
+        """ Return the range given by the delimitation parameters or ``None``. """
+        min_value = kwargs.get('min_value')
+        max_value = kwargs.get('max_value')
+        greater_than = kwargs.get('greater_than')
+        less_than = kwargs.get('less_than')
+
+        if min_value is None and max_value is None and greater_than is None and less_than is None:
+            return None
+
+        low_inclusive = greater_than is None
+        high_inclusive = less_than is None
+        low = min_value if low_inclusive else greater_than
+        high = max_value if high_inclusive else less_than
+
+        closed = {
+            (True, True): 'both',
+            (True, False): 'left',
+            (False, True): 'right',
+            (False, False): 'neither',
+        }[low_inclusive, high_inclusive]
+        return self._convert_range((low, high, closed))
+
+    def matches(self, data):
+        """ Return ``True`` if ``data`` is inside any of the ranges.
+        Otherwise ``False``.
+
+        :param data: the value to validate
+        :type data: string or number
+        :rtype: bool
+
+        """
+        recorder = self.stats or matcher_stats.recorder
+        if data is None or data == '':
+            result = False
+        elif recorder is None:
+            return self.convert(data) in self.index
+        else:
+            try:
+                result = self.convert(data) in self.index
+            except TypeError:
+                recorder.record_failure(self.name)
+                raise
+
+        if recorder is not None:
+            recorder.record_result(self.name, result)
+        return result
+
+    __call__ = matches
+
+
+class VersionMatcher(NumberMatcher):
+    """ :class:`NumberMatcher` of version strings like ``'1.10.2'``, compared part by part. """
+    name = 'version'
+    convert = staticmethod(_to_version)
+
+
+_matcher_cache = LRUCache(maxsize=256)
+
+
+def _compile(matcher_class, kwargs):
+    if kwargs.get('ranges'):
+        # Their key would be rebuilt from every range on each call
+        return matcher_class(**kwargs)
+
+    try:
+        key = (matcher_class, freeze(kwargs))
+        matcher = _matcher_cache.get(key)
+    except TypeError:
+        # Unhashable parameters can't be cached
+        return matcher_class(**kwargs)
+
+    if matcher is None:
+        matcher = matcher_class(**kwargs)
+        _matcher_cache.set(key, matcher)
+    return matcher
+
+
+def compile_number_matcher(**kwargs):
+    """ Return a cached :class:`NumberMatcher` for the given parameters.
+
+    Matchers with ``ranges`` aren't cached, build a :class:`NumberMatcher` once
+    and reuse it instead.
+
+    """
+    return _compile(NumberMatcher, kwargs)
+
+
+def compile_version_matcher(**kwargs):
+    """ Return a cached :class:`VersionMatcher` for the given parameters.
+
+    Matchers with ``ranges`` aren't cached, like in :func:`compile_number_matcher`.
+
+    """
+    return _compile(VersionMatcher, kwargs)
+
+
+def number_matches(data, **kwargs):
+    """ Return ``True`` if ``data`` is a number inside any of the valid ranges.
+    Otherwise ``False``.
+
+    :param data: the number to validate, strings like ``'$1,299.90'`` are accepted
+    :type data: string or number
+    :param kwargs: ``ranges`` and special delimitation parameters, see :class:`NumberMatcher`
+    :type kwargs: dict
+    :rtype: bool
+
+    """
+    return compile_number_matcher(**kwargs).matches(data)
+
+
+def version_matches(data, **kwargs):
+    """ Return ``True`` if ``data`` is a version inside any of the valid ranges.
+    Otherwise ``False``.
+
+    :param data: the version to validate
+    :type data: string or tuple
+    :param kwargs: ``ranges`` and special delimitation parameters, see :class:`NumberMatcher`
+    :type kwargs: dict
+    :rtype: bool
+
+    """
+    return compile_version_matcher(**kwargs).matches(data)
@@ -0,0 +1,263 @@
+import re
+import logging
+import datetime
+
+from scrapy import signals
+from scrapy.http import Request
+from scrapy.exceptions import DontCloseSpider, IgnoreRequest, NotConfigured
+
+from scrapy_mosquitera import stats as matcher_stats
+from scrapy_mosquitera.matchers import DateMatcher
+from scrapy_mosquitera.scheduling import schedule_request
+from scrapy_mosquitera.registry import ListingRegistry
+
+# Named groups read directly into a datetime, without parsing
+_DATE_GROUPS = ('year', 'month', 'day', 'hour', 'minute', 'second')
+
+
+class UrlDateFilter(object):
+    """ Find the date embedded in URLs and check it against a date window.
+
+    Each pattern either has the named group ``year`` and optionally ``month``, ``day``,
+    ``hour``, ``minute`` and ``second``, read as numbers,
+    or captures the date in its first group (or whole match) to be parsed
+    like any other date string.
+    URLs without a date are allowed.
+
+    :param patterns: regular expressions finding the date in the URL, tried in order
+    :type patterns: list of strings or compiled patterns
+    :param matcher: the date window
+    :type matcher: :class:`DateMatcher <.DateMatcher>`
+
+    """
+    def __init__(self, patterns, matcher):
+        self.patterns = [re.compile(p) for p in patterns]
+        self.matcher = matcher
+
+    @classmethod
+    def from_settings(cls, settings, stats=None):
+        """ Return a filter configured with the Scrapy ``settings``:
+
+        * ``MOSQUITERA_URL_DATE_PATTERNS``: list of regular expressions
+        * ``MOSQUITERA_URL_DATE_WINDOW``: delimitation parameters of the window,
+          like ``{'after': '5 days ago'}``
+
+        Raise NotConfigured without patterns.
+        The calls of the window are recorded by ``stats``, if given.
+
+        """
+        patterns = settings.getlist('MOSQUITERA_URL_DATE_PATTERNS')
+        if not patterns:
+            raise NotConfigured('MOSQUITERA_URL_DATE_PATTERNS is not set')
+
+        window = settings.getdict('MOSQUITERA_URL_DATE_WINDOW')
+        window.setdefault('stats', stats)
+        return cls(patterns, DateMatcher.from_settings(settings, **window))
+
+    def extract_date(self, url):
+        """ Return the date embedded in ``url``, a datetime or a string, or ``None``. """
+        for pattern in self.patterns:
+            match = pattern.search(url)
+            if match is None:
+                continue
+
+            groups = match.groupdict()
+            if 'year' in groups:
+                parts = dict((g, groups[g]) for g in _DATE_GROUPS if groups.get(g))
+                try:
+                    values = dict((g, int(v)) for g, v in parts.items())
+                    values.setdefault('month', 1)
+                    values.setdefault('day', 1)
+                    return datetime.datetime(**values)
+                except ValueError:
+                    # Month names and other formats are parsed as strings
+                    return ' '.join(parts[g] for g in _DATE_GROUPS if g in parts)
+
+            return match.group(1) if pattern.groups else match.group()
+
+        return None
+
+    def allows(self, request):
+        """ Return ``False`` if ``request`` has a URL date outside the window. """
+        if request.meta.get('dont_filter_date'):
+            return True
+
+        date = self.extract_date(request.url)
+        if date is None:
+            return True
+
+        try:
+            return self.matcher.matches(date)
+        except (TypeError, ValueError):
+            logging.debug('[-] Invalid date %r in %s', date, request.url)
+            return True
+
+
+class _UrlDateMiddleware(object):
+    stats_key = 'mosquitera/url_date/dropped'
+
+    def __init__(self, url_filter, stats=None):
+        self.url_filter = url_filter
+        self.stats = stats
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        url_filter = UrlDateFilter.from_settings(crawler.settings, matcher_stats.get_recorder(crawler))
+        return cls(url_filter, crawler.stats)
+
+    def _drop(self, request, spider):
+        logging.debug('[-] Dropped request out of the date window: %s', request.url)
+        if self.stats is not None:
+            self.stats.inc_value(self.stats_key)
+
+
+class UrlDateSpiderMiddleware(_UrlDateMiddleware):
+    """ Spider middleware dropping requests whose URL date is outside the window.
+
+    Requests are dropped as they're yielded, so they never reach the scheduler.
+    It's configured with :meth:`UrlDateFilter.from_settings` and counts the dropped
+    requests in the ``mosquitera/url_date/dropped`` stat::
+
+        SPIDER_MIDDLEWARES = {
+            'scrapy_mosquitera.middlewares.UrlDateSpiderMiddleware': 500,
+        }
+        MOSQUITERA_URL_DATE_PATTERNS = [r'/(?P<year>\\d{4})/(?P<month>\\d{2})/(?P<day>\\d{2})/']
+        MOSQUITERA_URL_DATE_WINDOW = {'after': '5 days ago'}
+
+    Set ``dont_filter_date`` in the request meta to skip the check.
+
+    """
+    def _filter(self, result, spider):
+        for request_or_item in result:
+            if isinstance(request_or_item, Request) and not self.url_filter.allows(request_or_item):
+                self._drop(request_or_item, spider)
+                continue
+            yield request_or_item
+
+    def process_spider_output(self, response, result, spider):
+        return self._filter(result, spider)
+
+    def process_start_requests(self, start_requests, spider):
+        return self._filter(start_requests, spider)
+
+
+class UrlDateDownloaderMiddleware(_UrlDateMiddleware):
+    """ Downloader middleware ignoring requests whose URL date is outside the window.
+
+    It catches the requests which don't go through the spider middlewares,
+    like the ones scheduled directly in the engine, before they're downloaded.
+    It's configured like :class:`UrlDateSpiderMiddleware`.
+
+    """
+    def process_request(self, request, spider):
+        if not self.url_filter.allows(request):
+            self._drop(request, spider)
+            raise IgnoreRequest('URL date out of the window: {}'.format(request.url))
+
+
+class PrefetchMiddleware(object):
+    """ Downloader middleware serving the next pages prefetched by
+    :class:`PaginationMixin <.PaginationMixin>` with ``pagination_prefetch`` set,
+    instead of downloading them again::
+
+        DOWNLOADER_MIDDLEWARES = {
+            'scrapy_mosquitera.middlewares.PrefetchMiddleware': 50,
+        }
+
+    """
+    def process_request(self, request, spider):
+        pop_prefetched_response = getattr(spider, 'pop_prefetched_response', None)
+        if pop_prefetched_response is not None:
+            return pop_prefetched_response(request)
+
+
+class PaginationMiddleware(object):
+    """ Spider middleware requesting the next page only if every item request
+    of the listing yielded something, like :class:`PaginationMixin <.PaginationMixin>`
+    but without decorators.
+
+    Responses which aren't item pages of a listing are listings. Their requests are tracked
+    as item pages through the ``mosquitera_listing`` meta key, except the next page requests,
+    recognized by the ``mosquitera_next_page`` meta flag or by their callback name in
+    ``MOSQUITERA_PAGINATION_NEXT_PAGE_CALLBACKS``. Those are held until the spider
+    is idle and only requested for the listings whose item pages all yielded something::
+
+        SPIDER_MIDDLEWARES = {
+            'scrapy_mosquitera.middlewares.PaginationMiddleware': 600,
+        }
+        MOSQUITERA_PAGINATION_NEXT_PAGE_CALLBACKS = ['parse']
+
+    The accounting is done in a single pass over the callback output.
+
+    """
+    listing_key = 'mosquitera_listing'
+    next_page_key = 'mosquitera_next_page'
+
+    def __init__(self, crawler=None, next_page_callbacks=()):
+        self.crawler = crawler
+        self.next_page_callbacks = frozenset(next_page_callbacks)
+        self.registry = ListingRegistry()
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        middleware = cls(
+            crawler,
+            next_page_callbacks=crawler.settings.getlist('MOSQUITERA_PAGINATION_NEXT_PAGE_CALLBACKS'),
+        )
+        crawler.signals.connect(middleware.spider_idle, signal=signals.spider_idle)
+        return middleware
+
+    def is_next_page(self, request):
+        """ Return ``True`` if ``request`` is a next page request. """
+        if self.next_page_key in request.meta:
+            return bool(request.meta[self.next_page_key])
+
+        callback = request.callback
+        name = 'parse' if callback is None else getattr(callback, '__name__', callback)
+        return name in self.next_page_callbacks
+
+    def process_spider_output(self, response, result, spider):
+        listing_id = response.meta.get(self.listing_key)
+        if listing_id is None:
+            return self._process_listing(result)
+        return self._process_item_page(listing_id, result)
+
+    def _process_listing(self, result):
+        listing_id = self.registry.new_id()
+        record = self.registry[listing_id]
+
+        for request_or_item in result:
+            if isinstance(request_or_item, Request):
+                if self.is_next_page(request_or_item):
+                    record.hold(request_or_item)
+                    continue
+
+                request_or_item.meta[self.listing_key] = listing_id
+                record.counter += 1
+
+            yield request_or_item
+
+    def _process_item_page(self, listing_id, result):
+        pending = listing_id in self.registry
+
+        for request_or_item in result:
+            # Only the first result counts, like deregister_response
+            if pending and request_or_item is not None:
+                self.registry.decrement(listing_id)
+                pending = False
+            yield request_or_item
+
+    def spider_idle(self, spider):
+        """ Request the held next pages of the completed listings. """
+        valid_nprs = self.registry.pop_completed_nprs()
+
+        # Listings with pending items are abandoned, like in PaginationMixin
+        self.registry.clear()
+
+        if not valid_nprs:
+            logging.info("[-] No more valid new page requests to process ..")
+            return
+
+        for request in valid_nprs:
+            schedule_request(self.crawler.engine, request, spider)
+        raise DontCloseSpider
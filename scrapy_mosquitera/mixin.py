@@ -1,16 +1,22 @@
-import uuid
 import logging
 import types
 import itertools
 
-from collections import defaultdict
+from collections import deque
 from functools import wraps
 
+import six
 from scrapy import signals
 from scrapy.http import Request, Response
 from scrapy.exceptions import DontCloseSpider
 from pydispatch import dispatcher
 from pydispatch.errors import DispatcherKeyError
+from scrapy.utils.conf import build_component_list
+from scrapy.utils.misc import load_object
+
+from scrapy_mosquitera.matchers.date import pin_to_crawl
+from scrapy_mosquitera.registry import ListingRegistry
+from scrapy_mosquitera.scheduling import schedule_request
 
 
 def get_consistent_generator(iterable):
@@ -30,59 +36,138 @@ def get_consistent_generator(iterable):
 
 
 class PaginationMixin(object):
-    def _set_attributes_to_initial_state(self):
-        # Each entry in registry has {'counter': int, 'nprs': []}
-        self._request_registry = defaultdict(dict)
-        self._response_id_cache = {}
+    #: Tag the requests of generator callbacks as they're yielded, instead of
+    #: collecting them in a list first
+    pagination_streaming = False
+    #: Schedule the next page requests of a listing as soon as it's completed,
+    #: instead of waiting for the spider to be idle
+    pagination_eager = False
+    #: Maximum of next page requests scheduled eagerly and not parsed yet
+    pagination_max_in_flight = 4
+    #: Meta key of the pagination chain of a listing
+    pagination_chain_key = 'mosquitera_chain'
+    #: Download the next page requests while their listing is being checked,
+    #: needs :class:`PrefetchMiddleware <.PrefetchMiddleware>` or it's disabled
+    pagination_prefetch = False
+    #: Priority of the prefetch requests, relative to their next page request
+    pagination_prefetch_priority = -10
+    #: Meta key of the prefetched response of a next page request
+    prefetch_key = 'mosquitera_prefetch'
+
+    def _set_attributes_to_initial_state(self, chain=None):
+        if chain is not None:
+            registry = self._get_registry(chain)
+            self._discard_prefetched_responses(registry)
+            registry.clear()
+            return
+
+        # The registry is kept, so listing IDs aren't reused
+        if getattr(self, '_request_registry', None) is None:
+            self._request_registry = ListingRegistry()
+            # Registries of the pagination chains, by chain key
+            self._chain_registries = {}
+        else:
+            self._discard_prefetched_responses(self._request_registry)
+            self._request_registry.clear()
 
     def __init__(self, *args, **kwargs):
         super(PaginationMixin, self).__init__(*args, **kwargs)
 
+        # Prefetched responses by key, ``None`` while they're downloaded
+        self._prefetched = {}
+        self._prefetch_ids = itertools.count(1)
+        # Keys of the prefetched responses whose next page request was dispatched
+        self._dispatched_prefetches = set()
+        self._prefetch_checked = False
+
         self._set_attributes_to_initial_state()
         self._was_setup_called = False
+        # Next page requests of completed listings waiting for a slot in eager mode
+        self._eager_nprs = deque()
+        self._nprs_in_flight = 0
+        # Item requests of each pagination chain not answered yet
+        self._chain_in_flight = {}
+
+    def _signal_manager(self):
+        """ Return the signal manager of the spider's crawler, or the global dispatcher without crawler. """
+        crawler = getattr(self, 'crawler', None)
+        if crawler is None:
+            return dispatcher
+        return crawler.signals
 
     def dm_setup(self):
         """ Set method for spider idle state.
-        It's implemented this way to support one and many instances of the mixin.
+        It's connected to the signals of the spider's crawler, so many spiders
+        using the mixin can run in the same process.
 
         """
-        dispatcher.connect(
+        self._signal_manager().connect(
             self.dequeue_next_page_requests,
             signal=signals.spider_idle
         )
+        crawler = getattr(self, 'crawler', None)
+        if crawler is not None:
+            # The date matchers of the crawl resolve relative bounds against its start
+            pin_to_crawl(crawler)
         self._was_setup_called = True
 
     def dm_teardown(self):
-        """ Disconnect the method from the signal.
-        It's done to avoid conflicts when many instances of the mixin are being executed.
-
-        """
+        """ Disconnect the method from the signal. """
         try:
-            dispatcher.disconnect(
+            self._signal_manager().disconnect(
                 self.dequeue_next_page_requests,
                 signal=signals.spider_idle
             )
         except DispatcherKeyError:
             pass
+        self._was_setup_called = False
+
+    def get_pagination_chain(self, response):
+        """ Return the key of the pagination chain of the listing in ``response``.
+
+        Each chain, like the pages of a category, has its own registry and continues
+        to its next page regardless of the others. By default, it's the value of
+        ``pagination_chain_key`` in the meta, and ``None`` for the shared chain.
+
+        """
+        return response.meta.get(self.pagination_chain_key)
+
+    def _get_registry(self, chain=None):
+        """ Return the registry of the ``chain`` listings. """
+        if chain is None:
+            return self._request_registry
+
+        registry = self._chain_registries.get(chain)
+        if registry is None:
+            registry = self._chain_registries[chain] = ListingRegistry()
+        return registry
+
+    def _get_response_registry(self, response):
+        """ Return the registry of the chain in ``response`` meta. """
+        return self._get_registry(response.meta.get(self.pagination_chain_key))
+
+    def _registries(self):
+        """ Return the registries of every chain. """
+        return [self._request_registry] + list(self._chain_registries.values())
 
     @staticmethod
-    def _add_identifiers_to_request(request, response_id):
-        """ Add ``response_id`` to ``request`` meta. """
+    def _add_identifiers_to_request(request, response_id, chain_key=None, chain=None):
+        """ Add ``response_id`` and the ``chain`` of its listing to ``request`` meta. """
         meta = request.meta
+        # Inherited from the listing if it was built with its meta
+        meta.pop('__listing_id', None)
         meta['__id'] = response_id
+        if chain is not None:
+            meta[chain_key] = chain
         return request.replace(meta=meta)
 
     def _increase_counter(self, response):
         """ Increase registry counter for identifier inside ``response``. """
-        response_id = response.meta['__id']
-        spot = self._request_registry[response_id]
-        spot['counter'] = spot.get('counter', 0) + 1
+        self._get_response_registry(response).increment(response.meta['__id'])
 
     def _decrease_counter(self, response):
         """ Decrease registry counter for identifier inside ``response``. """
-        response_id = response.meta['__id']
-        spot = self._request_registry[response_id]
-        spot['counter'] = spot.get('counter', 0) - 1
+        self._get_response_registry(response).decrement(response.meta['__id'])
 
     def _get_response(self, args=[], kwargs={}):
         """ Get response from ``args`` or ``kwargs``. """
@@ -104,22 +189,46 @@ class PaginationMixin(object):
             return response_objs[0]
 
     def _get_response_id(self, response):
-        """ Return response_id from cache or generate it.
-            It's a short-term cache, just for the current batch of responses.
+        """ Return the response_id of ``response``, generating it on the first call.
+            It's kept in the response meta, so no cache is needed.
 
         """
-        if response.url in self._response_id_cache:
-            return self._response_id_cache[response.url]
-        else:
-            response_id = str(uuid.uuid4())
-            self._response_id_cache[response.url] = response_id
-            return response_id
+        response_id = response.meta.get('__listing_id')
+        if response_id is None:
+            registry = self._get_response_registry(response)
+            response_id = response.meta['__listing_id'] = registry.new_id()
+        return response_id
+
+    def _stream_requests(self, result, response_id, chain):
+        """ Tag and count the requests in ``result`` as they're yielded. """
+        registry = self._get_registry(chain)
+        record = registry[response_id]
+        record.open = True
+        try:
+            for r in result:
+                if isinstance(r, Request):
+                    r = self._add_identifiers_to_request(r, response_id, self.pagination_chain_key, chain)
+                    record.counter += 1
+                    if chain is not None:
+                        self._chain_in_flight[chain] = self._chain_in_flight.get(chain, 0) + 1
+                yield r
+        finally:
+            registry.close(response_id)
+            # Its items may have all been answered while it was streaming
+            if self.pagination_eager:
+                self._dispatch_completed_listings(registry)
+            elif chain is not None:
+                self._continue_chain(chain)
 
     @staticmethod
     def register_requests(fn):
         """ Register requests yielded from ``fn`` in the registry
             using as key its parent response id.
 
+            If ``pagination_streaming`` is ``True`` and ``fn`` is a generator,
+            a generator registering each request as it's yielded is returned,
+            so Scrapy can schedule the first requests before the listing is parsed.
+
             It's a decorator.
 
         """
@@ -129,6 +238,9 @@ class PaginationMixin(object):
                 self.dm_setup()
 
             response = self._get_response(args, kwargs)
+            chain = self.get_pagination_chain(response)
+            if chain is not None:
+                response.meta[self.pagination_chain_key] = chain
             response_id = self._get_response_id(response)
             response.meta['__id'] = response_id
 
@@ -136,6 +248,9 @@ class PaginationMixin(object):
             if not result:
                 return
 
+            if self.pagination_streaming and isinstance(result, types.GeneratorType):
+                return self._stream_requests(result, response_id, chain)
+
             # Save original type to return the same results from ``fn``
             original_type = type(result)
 
@@ -145,11 +260,16 @@ class PaginationMixin(object):
             request_list = []
             for r in result:
                 if isinstance(r, Request):
-                    r = self._add_identifiers_to_request(r, response_id)
+                    r = self._add_identifiers_to_request(r, response_id, self.pagination_chain_key, chain)
                     self._increase_counter(response)
+                    if chain is not None:
+                        self._chain_in_flight[chain] = self._chain_in_flight.get(chain, 0) + 1
 
                 request_list.append(r)
 
+            if chain is not None:
+                self._continue_chain(chain)
+
             if original_type in (list, types.GeneratorType):
                 return request_list
             else:
@@ -171,10 +291,19 @@ class PaginationMixin(object):
             if isinstance(item_or_request, types.GeneratorType):
                 item_or_request = get_consistent_generator(item_or_request)
 
+            response = self._get_response(args, kwargs)
+
             # Only decrease counter if the item_or_request passed the filter
             if item_or_request:
-                response = self._get_response(args, kwargs)
                 self._decrease_counter(response)
+                if self.pagination_eager:
+                    self._dispatch_completed_listings(self._get_response_registry(response))
+
+            # Every answer counts towards the end of its chain, valid or not
+            chain = response.meta.get(self.pagination_chain_key)
+            if chain is not None and chain in self._chain_in_flight:
+                self._chain_in_flight[chain] -= 1
+                self._continue_chain(chain)
 
             return item_or_request
 
@@ -201,54 +330,279 @@ class PaginationMixin(object):
             if not isinstance(request_or_requests, list):
                 request_or_requests = [request_or_requests]
 
-            self._request_registry[response_id]['nprs'] = request_or_requests
+            # Next pages built with the listing meta would be taken for the same listing
+            for request in request_or_requests:
+                request.meta.pop('__listing_id', None)
+                request.meta.pop('__id', None)
+
+            # Next pages continue the chain of their listing
+            chain = response.meta.get(self.pagination_chain_key)
+            if chain is not None:
+                for request in request_or_requests:
+                    request.meta.setdefault(self.pagination_chain_key, chain)
+
+            if self.pagination_prefetch and self._check_prefetch_middleware():
+                for request in request_or_requests:
+                    self._prefetch(request)
+
+            self._get_registry(chain)[response_id].nprs = request_or_requests
 
         return inner
 
-    def dequeue_next_page_requests(self, spider):
-        """ Yield the first next page request meeting the conditions and
-            recover spider from idle state.
+    def _check_prefetch_middleware(self):
+        """ Return whether :class:`PrefetchMiddleware <.PrefetchMiddleware>` is enabled,
+            disabling ``pagination_prefetch`` with a warning if it isn't, as the prefetched
+            responses would never be served.
 
         """
-        logging.debug("[+] Dequeueing next page requests ..")
-        valid_nprs = []
+        if self._prefetch_checked:
+            return self.pagination_prefetch
+        self._prefetch_checked = True
+
+        # The middlewares import the mixin
+        from scrapy_mosquitera.middlewares import PrefetchMiddleware
+
+        middlewares = build_component_list(self.crawler.settings.getwithbase('DOWNLOADER_MIDDLEWARES'))
+        for middleware in middlewares:
+            if isinstance(middleware, six.string_types):
+                middleware = load_object(middleware)
+            if issubclass(middleware, PrefetchMiddleware):
+                return True
+
+        logging.warning('[-] PrefetchMiddleware is not enabled in DOWNLOADER_MIDDLEWARES. '
+                        'Disabling pagination_prefetch.')
+        self.pagination_prefetch = False
+        return False
+
+    def _inc_prefetch_stat(self, key, count=1):
+        crawler = getattr(self, 'crawler', None)
+        if crawler is None:
+            return
 
-        for response_id, data in self._request_registry.items():
-            if data['counter'] != 0:
-                continue
+        stats = crawler.stats
+        stats.inc_value('mosquitera/prefetch/' + key, count)
+        if key in ('requests', 'hits'):
+            requests = stats.get_value('mosquitera/prefetch/requests', 0)
+            hits = stats.get_value('mosquitera/prefetch/hits', 0)
+            stats.set_value('mosquitera/prefetch/hit_rate', hits / float(requests) if requests else 0.0)
+
+    def _prefetch(self, npr):
+        """ Schedule the download of ``npr`` at low priority, holding its response. """
+        key = npr.meta[self.prefetch_key] = next(self._prefetch_ids)
+        self._prefetched[key] = None
+
+        meta = dict(npr.meta)
+        meta['mosquitera_prefetching'] = True
+        request = npr.replace(
+            callback=self._hold_prefetched_response,
+            errback=self._prefetch_failed,
+            priority=npr.priority + self.pagination_prefetch_priority,
+            dont_filter=True,
+            meta=meta
+        )
+        schedule_request(self.crawler.engine, request, self)
+        self._inc_prefetch_stat('requests')
 
-            valid_nprs += data.get('nprs', [])
+    def _hold_prefetched_response(self, response):
+        key = response.meta[self.prefetch_key]
+        if key in self._prefetched:
+            self._prefetched[key] = response
+        else:
+            # Its listing was discarded or it was downloaded again meanwhile
+            self._waste_prefetched_response(response)
 
-        # Get first next page request and save original callback
-        try:
-            npr = valid_nprs.pop(0)
-        except IndexError:
-            logging.info("[-] No more valid new page requests to process ..")
+    def _prefetch_failed(self, failure):
+        # The next page request will be downloaded as usual
+        self._prefetched.pop(failure.request.meta[self.prefetch_key], None)
+
+    def _waste_prefetched_response(self, response):
+        self._inc_prefetch_stat('discarded')
+        self._inc_prefetch_stat('wasted_bytes', len(response.body))
+
+    def _discard_prefetched_responses(self, registry):
+        """ Discard the prefetched responses of the listings in ``registry``. """
+        if not self._prefetched:
+            return
+
+        for record in registry.records():
+            for npr in record.nprs:
+                key = npr.meta.get(self.prefetch_key)
+                if key is None or key not in self._prefetched:
+                    continue
+                response = self._prefetched.pop(key)
+                if response is not None:
+                    self._waste_prefetched_response(response)
+
+    def pop_prefetched_response(self, request):
+        """ Return the response prefetched for the next page ``request``, or ``None``
+            if it wasn't prefetched or isn't downloaded yet.
+
+        """
+        key = request.meta.get(self.prefetch_key)
+        if key is None or request.meta.get('mosquitera_prefetching'):
+            return None
+
+        self._dispatched_prefetches.discard(key)
+        response = self._prefetched.pop(key, None)
+        self._inc_prefetch_stat('misses' if response is None else 'hits')
+        if response is None:
+            return None
+        # Tied to ``request``, so it goes to its callback
+        return response.replace(request=request)
+
+    def _mark_prefetch_dispatched(self, npr):
+        key = npr.meta.get(self.prefetch_key)
+        if key in self._prefetched:
+            self._dispatched_prefetches.add(key)
+
+    def _release_prefetched_response(self, key):
+        """ Drop the prefetched response of a dispatched next page request,
+            whether it was served or not.
+
+        """
+        self._dispatched_prefetches.discard(key)
+        if key not in self._prefetched:
+            return
+        # A prefetch still in flight is wasted once it's downloaded
+        response = self._prefetched.pop(key)
+        if response is not None:
+            self._waste_prefetched_response(response)
+
+    def _release_dispatched_prefetches(self):
+        # Next page requests filtered or failed never reach their callback
+        for key in list(self._dispatched_prefetches):
+            self._release_prefetched_response(key)
+
+    def call_prefetched_next_page_request(self, response):
+        """ Parse a next page request which was prefetched, dropping its prefetched response. """
+        self._release_prefetched_response(response.meta.get(self.prefetch_key))
+        cb = response.meta.pop('ocb') or self.parse
+        return cb(response)
+
+    def _dispatch_completed_listings(self, *registries):
+        """ Schedule the next page requests of the completed listings in ``registries``,
+            keeping at most ``pagination_max_in_flight`` of them unparsed.
+
+        """
+        for registry in registries:
+            self._eager_nprs.extend(registry.pop_completed_nprs())
+
+        while self._eager_nprs and self._nprs_in_flight < self.pagination_max_in_flight:
+            npr = self._eager_nprs.popleft()
+            new_meta = npr.meta
+            new_meta['ocb'] = npr.callback
+            new_npr = npr.replace(callback=self.call_eager_next_page_request, meta=new_meta)
+
+            self._mark_prefetch_dispatched(new_npr)
+            schedule_request(self.crawler.engine, new_npr, self)
+            self._nprs_in_flight += 1
+
+    def call_eager_next_page_request(self, response):
+        """ Parse a next page request scheduled in eager mode, freeing its slot. """
+        logging.debug("[+] Requesting eager next page request ..")
+        self._nprs_in_flight -= 1
+        self._dispatch_completed_listings(self._get_response_registry(response))
+
+        return self.call_prefetched_next_page_request(response)
+
+    def _continue_chain(self, chain):
+        """ Request the next page of ``chain`` once all its item requests are answered,
+            without waiting for the spider to be idle.
+
+        """
+        if self.pagination_eager or self._chain_in_flight.get(chain, 0) > 0:
+            return
+
+        registry = self._get_registry(chain)
+        if any(record.open for record in registry.records()):
             return
 
+        valid_nprs = registry.pop_completed_nprs()
+        if valid_nprs:
+            self._schedule_next_page_requests(valid_nprs, self)
+
+    def _schedule_next_page_requests(self, valid_nprs, spider):
+        """ Schedule the first of ``valid_nprs``, which yields the rest once it's parsed. """
+        npr = valid_nprs[0]
         new_meta = npr.meta
         new_meta['ocb'] = npr.callback
-        new_meta['remaining_nprs'] = valid_nprs
+        new_meta['remaining_nprs'] = valid_nprs[1:]
         new_npr = npr.replace(callback=self.call_next_page_requests, meta=new_meta)
 
-        self.crawler.engine.schedule(new_npr, spider=spider)
+        self._mark_prefetch_dispatched(new_npr)
+        schedule_request(self.crawler.engine, new_npr, spider)
+
+    def dequeue_next_page_requests(self, spider):
+        """ Yield the first next page request meeting the conditions
+            of each pagination chain and recover spider from idle state.
+
+            In eager mode, the next page requests are usually scheduled before,
+            so this is only a fallback for the ones left waiting, like the ones
+            whose slot was taken by a failed request.
+
+        """
+        logging.debug("[+] Dequeueing next page requests ..")
+        # The dispatched next page requests are done once the spider is idle
+        self._release_dispatched_prefetches()
+        if self.pagination_eager:
+            # Nothing is in flight once the spider is idle
+            self._nprs_in_flight = 0
+            self._dispatch_completed_listings(*self._registries())
+            if not self._nprs_in_flight:
+                logging.info("[-] No more valid new page requests to process ..")
+                self._discard_all_prefetched_responses()
+                return
+            raise DontCloseSpider
+
+        # Nothing is in flight once the spider is idle, like failed item requests
+        self._chain_in_flight.clear()
+
+        scheduled = False
+        for registry in self._registries():
+            # Completed listings are freed as their next page requests are dispatched
+            valid_nprs = registry.pop_completed_nprs()
+            if not valid_nprs:
+                continue
+
+            self._schedule_next_page_requests(valid_nprs, spider)
+            scheduled = True
+
+        if not scheduled:
+            logging.info("[-] No more valid new page requests to process ..")
+            self._discard_all_prefetched_responses()
+            return
         raise DontCloseSpider
 
+    def _discard_all_prefetched_responses(self):
+        # Listings still pending when the spider is idle will never be completed
+        for registry in self._registries():
+            self._discard_prefetched_responses(registry)
+
     def call_next_page_requests(self, response):
         logging.debug("[+] Requesting next page requests ..")
         remaining_nprs = response.meta['remaining_nprs'][:]
-
-        # Do some cleaning
-        self._set_attributes_to_initial_state()
-        self.dm_teardown()
+        self._release_prefetched_response(response.meta.get(self.prefetch_key))
+
+        # Do some cleaning, only of its own chain
+        chain = response.meta.get(self.pagination_chain_key)
+        self._set_attributes_to_initial_state(chain)
+        # The idle handler is shared by the chains
+        if chain is None and not any(self._chain_registries.values()):
+            self.dm_teardown()
         del response.meta['remaining_nprs']
 
         # Deal with current response
         # As they are pages parsing lists, they usually yield requests
-        cb = response.meta['ocb']
+        # Like in Scrapy, requests without a callback are parsed by parse
+        cb = response.meta['ocb'] or self.parse
         for request in cb(response):
             yield request
 
         # Yield pending next page requests
         for request in remaining_nprs:
+            if request.meta.get(self.prefetch_key) in self._prefetched:
+                self._mark_prefetch_dispatched(request)
+                new_meta = request.meta
+                new_meta['ocb'] = request.callback
+                request = request.replace(callback=self.call_prefetched_next_page_request, meta=new_meta)
             yield request
@@ -0,0 +1,125 @@
+import itertools
+
+from collections import deque
+
+
+class ListingRecord(object):
+    """ Pagination state of a listing: its pending item requests and held next page requests.
+
+    ``open`` is ``True`` while the listing is still yielding requests.
+
+    """
+    __slots__ = ('counter', 'nprs', 'open')
+
+    def __init__(self, counter=0, nprs=()):
+        self.counter = counter
+        self.nprs = nprs
+        self.open = False
+
+    def hold(self, request):
+        """ Hold the next page ``request`` until the listing is complete. """
+        if self.nprs:
+            self.nprs.append(request)
+        else:
+            self.nprs = [request]
+
+    def __repr__(self):
+        return 'ListingRecord(counter={!r}, nprs={!r})'.format(self.counter, self.nprs)
+
+
+class ListingRegistry(object):
+    """ Records of the listings being paginated, keyed by integer IDs.
+
+    IDs keep increasing after :meth:`clear`, so requests still in flight
+    from a cleared listing never match a new one.
+
+    Listings join a ready queue when they're created and when their counter drops
+    to zero through :meth:`decrement` or :meth:`close`, so :meth:`pop_completed_nprs`
+    only visits those instead of every record. Queued listings are checked again
+    when they're popped, as they may have pending requests by then.
+
+    """
+    def __init__(self):
+        self._records = {}
+        self._ready = deque()
+        self._ids = itertools.count(1)
+
+    def new_id(self):
+        """ Return a new listing ID. """
+        return next(self._ids)
+
+    def __getitem__(self, listing_id):
+        """ Return the record of ``listing_id``, creating it if it's missing. """
+        record = self._records.get(listing_id)
+        if record is None:
+            record = self._records[listing_id] = ListingRecord()
+            self._ready.append(listing_id)
+        return record
+
+    def increment(self, listing_id):
+        """ Count a new pending item request of ``listing_id``. """
+        self[listing_id].counter += 1
+
+    def decrement(self, listing_id):
+        """ Count an answered item request of ``listing_id``.
+
+        Answers of unknown listings, like the ones already dispatched, and answers
+        beyond the pending requests of a listing are ignored.
+
+        """
+        record = self._records.get(listing_id)
+        if record is None or record.counter <= 0:
+            return
+        record.counter -= 1
+        if record.counter == 0 and not record.open:
+            self._ready.append(listing_id)
+
+    def close(self, listing_id):
+        """ Mark ``listing_id`` as done yielding requests. """
+        record = self._records.get(listing_id)
+        if record is not None:
+            record.open = False
+            if record.counter == 0:
+                self._ready.append(listing_id)
+
+    def get(self, listing_id):
+        """ Return the record of ``listing_id`` or ``None``. """
+        return self._records.get(listing_id)
+
+    def pop(self, listing_id):
+        """ Remove the record of ``listing_id`` and return it, or ``None``. """
+        return self._records.pop(listing_id, None)
+
+    def __contains__(self, listing_id):
+        return listing_id in self._records
+
+    def __len__(self):
+        return len(self._records)
+
+    def records(self):
+        """ Return the records of every listing. """
+        return self._records.values()
+
+    def pop_completed_nprs(self):
+        """ Remove the listings without pending item requests
+        and return their next page requests.
+        Listings still yielding requests aren't completed.
+
+        """
+        nprs = []
+        records = self._records
+        ready = self._ready
+        while ready:
+            listing_id = ready.popleft()
+            record = records.get(listing_id)
+            # Already dispatched, or pending again since it was queued
+            if record is None or record.counter != 0 or record.open:
+                continue
+            del records[listing_id]
+            nprs.extend(record.nprs)
+        return nprs
+
+    def clear(self):
+        """ Remove every record. """
+        self._records.clear()
+        self._ready.clear()
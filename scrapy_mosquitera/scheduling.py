@@ -0,0 +1,19 @@
+def schedule_request(engine, request, spider):
+    """ Schedule ``request`` in the ``engine`` of any Scrapy version.
+
+    ``engine.schedule`` was removed from recent Scrapy versions,
+    and ``engine.crawl`` also takes the spider before Scrapy 2.6.
+
+    :param engine: the engine of the spider's crawler
+    :type engine: :class:`scrapy.core.engine.ExecutionEngine`
+    :param request: the request to schedule
+    :type request: :class:`scrapy.http.Request`
+    :param spider: the spider the request belongs to
+    :type spider: :class:`scrapy.Spider`
+
+    """
+    try:
+        engine.crawl(request)
+    except TypeError:
+        # Scrapy < 2.6 also takes the spider
+        engine.crawl(request, spider)
@@ -0,0 +1,219 @@
+import logging
+
+from scrapy.http import Request
+
+from scrapy_mosquitera.matchers import DateMatcher
+
+# Position of a listing page against the date range
+NEWER = 'newer'
+INSIDE = 'inside'
+OLDER = 'older'
+
+
+class PageSearchMixin(object):
+    """ Pagination strategy finding the pages of a date range with binary search.
+
+    Archives with numbered pages sorted by date, newest first, are usually walked
+    page by page until the range ends. Instead, this mixin probes page numbers,
+    first with exponentially growing steps and then with binary search, to find
+    the first and last pages with dates in the range. Only those pages are parsed,
+    so a deep range costs O(log n) extra listing requests instead of O(n).
+
+    Spiders define how to build the URL of a page and how to extract its dates::
+
+        class ArchiveSpider(PageSearchMixin, Spider):
+            page_search_window = {'after': '30 days ago'}
+
+            def start_requests(self):
+                yield self.start_page_search()
+
+            def get_page_url(self, page):
+                return 'http://blog.tld/archive?page={}'.format(page)
+
+            def get_page_dates(self, response):
+                return response.css('.post time::attr(datetime)').extract()
+
+            def parse(self, response):
+                ...
+
+    Pages found inside the range while probing are passed to the callback directly,
+    the rest are requested once the boundaries are known.
+    Pages without dates or answering with an error are considered older
+    than the range, like the pages past the end of the archive.
+
+    """
+    #: Delimitation parameters of the range, passed to :class:`DateMatcher <.DateMatcher>`
+    page_search_window = {}
+    #: Name of the method parsing the pages inside the range
+    page_search_callback = 'parse'
+    #: Number of the newest page
+    first_page = 1
+    #: Pages after this one are never probed
+    page_search_max_page = 100000
+
+    def get_page_url(self, page):
+        """ Return the URL of the listing page numbered ``page``. """
+        raise NotImplementedError
+
+    def get_page_dates(self, response):
+        """ Return the dates of the listing page in ``response``. """
+        raise NotImplementedError
+
+    def get_page_search_matcher(self):
+        """ Return the :class:`DateMatcher <.DateMatcher>` of the searched range. """
+        crawler = getattr(self, 'crawler', None)
+        if crawler is not None:
+            return DateMatcher.from_crawler(crawler, **self.page_search_window)
+
+        settings = getattr(self, 'settings', None)
+        if settings is not None:
+            return DateMatcher.from_settings(settings, **self.page_search_window)
+        return DateMatcher(**self.page_search_window)
+
+    def start_page_search(self):
+        """ Return the request of the first probed page. """
+        self._page_search = {
+            'matcher': self.get_page_search_matcher(),
+            # Classification of the probed pages
+            'pages': {},
+            # Boundaries: last page known to be newer and first page known not to be
+            'low': self.first_page - 1,
+            'high': None,
+            'start': None,
+        }
+        return self._probe_request(self.first_page)
+
+    def _probe_request(self, page):
+        self._inc_stat('mosquitera/page_search/probes')
+        return Request(
+            self.get_page_url(page),
+            callback=self._parse_probe,
+            errback=self._probe_failed,
+            dont_filter=True,
+            meta={'page_search_page': page, 'handle_httpstatus_all': True},
+        )
+
+    def _inc_stat(self, key):
+        crawler = getattr(self, 'crawler', None)
+        if crawler is not None:
+            crawler.stats.inc_value(key)
+
+    def classify_page(self, dates):
+        """ Return whether a page with ``dates`` is ``'newer'``, ``'inside'``
+        or ``'older'`` than the searched range.
+
+        """
+        matcher = self._page_search['matcher']
+        positions = set()
+        for date in dates:
+            if not date:
+                continue
+            try:
+                positions.add(matcher.compare(date))
+            except TypeError:
+                logging.debug('[-] Ignoring invalid date in listing: %r', date)
+
+        if not positions or positions == {-1}:
+            return OLDER
+        if positions == {1}:
+            return NEWER
+        return INSIDE
+
+    def _parse_probe(self, response):
+        page = response.meta['page_search_page']
+        if response.status == 200:
+            kind = self.classify_page(self.get_page_dates(response))
+        else:
+            kind = OLDER
+
+        state = self._page_search
+        state['pages'][page] = kind
+        logging.debug('[+] Page %d is %s than the range', page, kind)
+
+        if kind == INSIDE:
+            for result in self._page_callback()(response) or ():
+                yield result
+
+        request = self._next_probe(page, kind)
+        if request is not None:
+            yield request
+            return
+
+        for request in self._range_requests():
+            yield request
+
+    def _probe_failed(self, failure):
+        page = failure.request.meta['page_search_page']
+        self._page_search['pages'][page] = OLDER
+
+        request = self._next_probe(page, OLDER)
+        if request is not None:
+            return [request]
+        return list(self._range_requests())
+
+    def _page_callback(self):
+        return getattr(self, self.page_search_callback)
+
+    def _next_step(self, anchor, low, high):
+        """ Return the next page to probe between ``low`` and ``high``, or ``None``. """
+        if high is None:
+            # Exponential search: double the distance from the anchor
+            page = low + max(1, low - anchor + 1)
+            if page > self.page_search_max_page:
+                return None
+            return page
+
+        if high - low <= 1:
+            return None
+        return (low + high) // 2
+
+    def _next_probe(self, page, kind):
+        """ Update the search with the class of ``page`` and return the next probe, if any. """
+        state = self._page_search
+
+        if state['start'] is None:
+            # Looking for the first page which isn't newer than the range
+            if kind == NEWER:
+                state['low'] = page
+            elif state['high'] is None or page < state['high']:
+                state['high'] = page
+
+            next_page = self._next_step(self.first_page, state['low'], state['high'])
+            if next_page is not None:
+                return self._probe_request(next_page)
+
+            if state['high'] is None:
+                # Every probed page is newer up to the maximum page
+                state['high'] = state['low'] + 1
+            start = state['start'] = state['high']
+
+            # Pages probed past the start may already bound the end
+            older = [p for p, k in state['pages'].items() if k == OLDER and p >= start]
+            state['high'] = min(older) if older else None
+            inside = [p for p, k in state['pages'].items() if k == INSIDE and p >= start]
+            state['low'] = max(inside) if inside else start - 1
+        else:
+            # Looking for the first page older than the range
+            if kind == OLDER:
+                if state['high'] is None or page < state['high']:
+                    state['high'] = page
+            else:
+                state['low'] = page
+
+        next_page = self._next_step(state['start'], state['low'], state['high'])
+        if next_page is not None:
+            return self._probe_request(next_page)
+
+        state['end'] = state['low']
+        return None
+
+    def _range_requests(self):
+        """ Yield the requests of the pages inside the range which weren't probed. """
+        state = self._page_search
+        logging.info('[+] Pages %d to %d are inside the range', state['start'], state['end'])
+
+        callback = self._page_callback()
+        for page in range(state['start'], state['end'] + 1):
+            if state['pages'].get(page) == INSIDE:
+                continue
+            yield Request(self.get_page_url(page), callback=callback, dont_filter=True)
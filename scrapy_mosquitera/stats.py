@@ -0,0 +1,192 @@
+import random
+import timeit
+
+from collections import defaultdict
+
+
+# Recorder used by matchers without their own, installed by the extension.
+recorder = None
+# Recorders installed by the open crawlers
+_installed = []
+
+
+def _update_recorder():
+    global recorder
+    # The calls of many crawlers can't be told apart, so none records them
+    recorder = _installed[0] if len(_installed) == 1 else None
+
+
+def install(new_recorder):
+    """ Make ``new_recorder`` the recorder of every matcher without its own,
+    while it's the only one installed.
+
+    """
+    _installed.append(new_recorder)
+    _update_recorder()
+
+
+def uninstall(old_recorder=None):
+    """ Uninstall ``old_recorder``, or every recorder. """
+    if old_recorder is None:
+        del _installed[:]
+    elif old_recorder in _installed:
+        _installed.remove(old_recorder)
+    _update_recorder()
+
+
+def get_recorder(crawler):
+    """ Return the :class:`MatcherStats` extension of ``crawler``, or ``None``. """
+    extensions = getattr(crawler, 'extensions', None)
+    for extension in getattr(extensions, 'middlewares', ()):
+        if isinstance(extension, MatcherStats):
+            return extension
+    return None
+
+
+def _percentile(sorted_values, percent):
+    index = int(round(percent / 100.0 * (len(sorted_values) - 1)))
+    return sorted_values[index]
+
+
+class MatcherStats(object):
+    """ Record matcher activity and publish it to a Scrapy stats collector.
+
+    Counters are kept in memory and only published by :meth:`publish`,
+    so recording a call doesn't touch the stats collector.
+    Parse latency is measured once every ``sample_every`` calls and the samples
+    are kept in a reservoir of ``max_samples`` values for the percentiles.
+
+    It's also a Scrapy extension. Once enabled, it records the matchers of the crawl
+    and publishes the stats when the spider is closed::
+
+        EXTENSIONS = {'scrapy_mosquitera.stats.MatcherStats': 500}
+        MOSQUITERA_STATS_SAMPLE_EVERY = 10
+
+    The matchers built by the middlewares and mixins of this package record to the
+    extension of their crawler, and spiders can pass ``stats=self.matcher_stats`` to theirs.
+    Matchers without a recorder are only recorded while a single crawler runs,
+    as the calls of many crawlers in the same process can't be told apart.
+    The ``parse_cache`` and ``parse_tier`` stats are totals of the process.
+
+    :param stats: the stats collector
+    :type stats: :class:`scrapy.statscollectors.StatsCollector`
+    :param prefix: prefix of the published keys
+    :type prefix: string
+    :param sample_every: calls between each latency measurement
+    :type sample_every: int
+    :param max_samples: maximum number of latency samples kept
+    :type max_samples: int
+
+    """
+    timer = staticmethod(timeit.default_timer)
+
+    def __init__(self, stats=None, prefix='mosquitera/', sample_every=1, max_samples=10000):
+        self.stats = stats
+        self.prefix = prefix
+        self.sample_every = sample_every
+        self.max_samples = max_samples
+        # Each key is (matcher name, counter name)
+        self.counters = defaultdict(int)
+        self.latencies = []
+        self._latency_total = 0.0
+        self._latency_count = 0
+        self._calls = 0
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        from scrapy import signals
+
+        settings = crawler.settings
+        extension = cls(
+            crawler.stats,
+            prefix=settings.get('MOSQUITERA_STATS_PREFIX', 'mosquitera/'),
+            sample_every=settings.getint('MOSQUITERA_STATS_SAMPLE_EVERY', 1),
+        )
+        crawler.signals.connect(extension.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(extension.spider_closed, signal=signals.spider_closed)
+        return extension
+
+    def spider_opened(self, spider):
+        spider.matcher_stats = self
+        install(self)
+
+    def spider_closed(self, spider):
+        self.publish()
+        uninstall(self)
+
+    def should_time(self):
+        """ Return ``True`` if the current call has to be timed. """
+        self._calls += 1
+        return self._calls % self.sample_every == 0
+
+    def record_result(self, name, result):
+        self.counters[name, 'calls'] += 1
+        self.counters[name, 'accepted' if result else 'rejected'] += 1
+
+    def record_results(self, name, calls, accepted):
+        """ Record ``calls`` results at once, ``accepted`` of them being ``True``. """
+        self.counters[name, 'calls'] += calls
+        self.counters[name, 'accepted'] += accepted
+        self.counters[name, 'rejected'] += calls - accepted
+
+    def record_failure(self, name):
+        self.counters[name, 'calls'] += 1
+        self.counters[name, 'parse_failures'] += 1
+
+    def record_latency(self, seconds):
+        self._latency_total += seconds
+        self._latency_count += 1
+
+        if len(self.latencies) < self.max_samples:
+            self.latencies.append(seconds)
+        else:
+            # Reservoir sampling, every sample has the same chance to be kept
+            index = random.randint(0, self._latency_count - 1)
+            if index < self.max_samples:
+                self.latencies[index] = seconds
+
+    def get_values(self):
+        """ Return a dict with every stat, with keys without prefix. """
+        values = {}
+        names = set(name for name, _ in self.counters)
+
+        for name in names:
+            for counter in ('calls', 'accepted', 'rejected', 'parse_failures'):
+                values['{}/{}'.format(name, counter)] = self.counters[name, counter]
+
+            calls = self.counters[name, 'calls']
+            if calls:
+                values['{}/accept_ratio'.format(name)] = self.counters[name, 'accepted'] / float(calls)
+
+        if self.latencies:
+            latencies = sorted(self.latencies)
+            mean = self._latency_total / self._latency_count
+            # Only sampled calls are timed, so the total is estimated from the mean
+            parses = sum(self.counters[name, 'calls'] for name in names) or self._latency_count
+            values['parse_latency/samples'] = self._latency_count
+            values['parse_latency/total_us'] = mean * parses * 1e6
+            values['parse_latency/mean_us'] = mean * 1e6
+            for percent in (50, 90, 99):
+                values['parse_latency/p{}_us'.format(percent)] = _percentile(latencies, percent) * 1e6
+
+        from scrapy_mosquitera.matchers.date import parse_cache_info, parse_tier_info
+
+        cache = parse_cache_info()
+        lookups = cache['hits'] + cache['misses']
+        values['parse_cache/hits'] = cache['hits']
+        values['parse_cache/misses'] = cache['misses']
+        if lookups:
+            values['parse_cache/hit_rate'] = cache['hits'] / float(lookups)
+
+        for tier, hits in parse_tier_info().items():
+            values['parse_tier/{}'.format(tier)] = hits
+
+        return values
+
+    def publish(self):
+        """ Set every stat in the stats collector. """
+        if self.stats is None:
+            return
+
+        for key, value in self.get_values().items():
+            self.stats.set_value(self.prefix + key, value)
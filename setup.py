@@ -20,6 +20,9 @@ setup(
     package_dir={'scrapy_mosquitera': 'scrapy_mosquitera'},
     include_package_data=True,
     install_requires=requirements,
+    extras_require={
+        'numpy': ['numpy'],
+    },
     license='BSD',
     zip_safe=False,
     keywords='mosquitera,scrapy-mosquitera',
@@ -1,8 +1,18 @@
+import pytest
+
 from scrapy.http import Request
 from pytest_bdd import given
+from scrapy_mosquitera.matchers import date as date_module
 from tests.utils import given_response
 
 
+@pytest.fixture(autouse=True)
+def forget_pinned_crawls():
+    yield
+    # Mocked crawlers are never closed
+    date_module._open_crawlers.clear()
+
+
 @given('a response')
 def response():
     return given_response(url='http://domain.tld/post1')
@@ -0,0 +1,47 @@
+Feature: Composable matchers
+    The matcher algebra and its compiled evaluator.
+
+
+Scenario: Combine matchers
+    Given an item with category <category> and score <score>
+    Then the combined matcher is <true_or_false>
+    And the compiled combined matcher is <true_or_false>
+    And the negated combined matcher is the opposite
+
+    Examples:
+    | category | score | true_or_false |
+    | news     | 10    | True          |
+    | news     | 1     | False         |
+    | sports   | 10    | False         |
+    | blog     | 1     | True          |
+
+
+Scenario: Registered matchers
+    Given a registered matcher
+    Then it can be used by name
+    And an unknown name raises exception
+
+
+Scenario: Expensive matchers are evaluated last
+    Given an expensive matcher and a cheap matcher rejecting everything
+    When I evaluate <n_items> items
+    Then the expensive matcher is never called
+
+    Examples:
+    | n_items |
+    | 100     |
+
+
+Scenario: Selective matchers are moved first
+    Given a matcher accepting everything and a matcher rejecting most items
+    When I evaluate <n_items> items
+    Then the rejecting matcher is evaluated first
+
+    Examples:
+    | n_items |
+    | 500     |
+
+
+Scenario: Date matching is skipped for rejected items
+    Given items rejected by category
+    Then dates aren't parsed when matching them
@@ -132,6 +132,38 @@ Scenario: Date in period week
     | 2016-04-25  | 2016-05-05 | 2016-05-20 | True    | False         |
     | 2017-05-02  | 2016-05-05 | 2016-05-20 | True    | False         |
     | 2017-05-02  | 2016-05-05 | 2016-05-20 | False   | True          |
+    | 2015-12-31  | 2016-01-01 | 2016-01-20 | True    | True          |
+    | 2016-01-03  | 2016-01-04 | 2016-01-20 | True    | False         |
+
+
+Scenario: Date in period hour
+    Given target date <target_date>
+    Given min date <min_date>
+    Given max date <max_date>
+    Then date in period hour with <maximum> is <true_or_false>
+
+    Examples:
+    | target_date      | min_date         | max_date         | maximum | true_or_false |
+    | 2016-05-02 10:05 | 2016-05-02 10:30 | 2016-05-02 12:00 | True    | True          |
+    | 2016-05-02 09:59 | 2016-05-02 10:30 | 2016-05-02 12:00 | True    | False         |
+    | 2016-05-02 12:59 | 2016-05-02 10:30 | 2016-05-02 12:00 | True    | True          |
+    | 2016-05-02 13:00 | 2016-05-02 10:30 | 2016-05-02 12:00 | True    | False         |
+    | 2016-05-02 13:00 | 2016-05-02 10:30 | 2016-05-02 12:00 | False   | True          |
+
+
+Scenario: Date in period quarter
+    Given target date <target_date>
+    Given min date <min_date>
+    Given max date <max_date>
+    Then date in period quarter with <maximum> is <true_or_false>
+
+    Examples:
+    | target_date | min_date   | max_date   | maximum | true_or_false |
+    | 2016-04-01  | 2016-05-05 | 2016-08-20 | True    | True          |
+    | 2016-03-31  | 2016-05-05 | 2016-08-20 | True    | False         |
+    | 2016-09-30  | 2016-05-05 | 2016-08-20 | True    | True          |
+    | 2016-10-01  | 2016-05-05 | 2016-08-20 | True    | False         |
+    | 2017-10-01  | 2016-05-05 | 2016-08-20 | False   | True          |
 
 
 Scenario: Date in period month
@@ -162,3 +194,217 @@ Scenario: Date in period year
     | 2015-04-25  | 2016-05-05 | 2016-05-20 | True    | False         |
     | 2017-05-02  | 2016-05-05 | 2016-05-20 | True    | False         |
     | 2017-05-02  | 2016-05-05 | 2016-05-20 | False   | True          |
+
+
+Scenario: Date matcher resolves relative bounds against its base
+    Given a date matcher after 5 days ago based on 2016-04-15
+    Then the matcher minimum date is 2016-04-10
+
+
+Scenario: Date matcher
+    Given target date <target_date>
+    Given min date <min_date>
+    Given max date <max_date>
+    Then date matcher in period <period> with <maximum> is <true_or_false>
+
+    Examples:
+    | target_date | min_date   | max_date   | period  | maximum | true_or_false |
+    | 2016-04-15  | 2016-04-01 | 2016-04-30 | None    | True    | True          |
+    | 2016-04-15  | 2016-04-16 | 2016-04-30 | None    | True    | False         |
+    | 2016-04-15  | 2016-04-30 | 2016-04-30 | day     | True    | False         |
+    | 2016-05-02  | 2016-05-05 | 2016-05-20 | week    | True    | True          |
+    | 2017-05-02  | 2016-05-05 | 2016-05-20 | week    | False   | True          |
+    | 2016-07-02  | 2016-04-21 | 2016-06-01 | month   | True    | False         |
+    | 2017-05-02  | 2016-05-05 | 2016-05-20 | year    | True    | False         |
+    | 2016-05-20  | 2016-05-05 | 2016-05-20 | hour    | True    | True          |
+    | 2016-09-02  | 2016-05-05 | 2016-05-20 | quarter | True    | False         |
+    | 2016-06-02  | 2016-05-05 | 2016-05-20 | quarter | True    | True          |
+
+
+Scenario: Compiled date matchers are reused
+    Given a date string
+    Then compiling the same parameters twice returns the same matcher
+    And matching many dates parses the bounds once
+    And the compiled matchers of each crawl are pinned to its start
+    And the compiled matchers expire outside a crawl
+
+
+Scenario: Date matcher with unknown period
+    Given a date string
+    Then building a date matcher with an unknown period raises exception
+
+
+Scenario: Parse cache
+    Given a parse cache with <maxsize> entries
+    When I parse the date strings <strings>
+    Then the parse cache has <hits> hits and <misses> misses
+    And the parse cache size is <size>
+
+    Examples:
+    | maxsize | strings                                        | hits | misses | size |
+    | 10      | 2016-04-15, 2016-04-15, Mar 3 2016             | 1    | 2      | 2    |
+    | 10      | Yesterday, Yesterday, Yesterday                | 2    | 1      | 1    |
+    | 2       | 2016-04-15, 2016-04-16, 2016-04-17, 2016-04-15 | 0    | 4      | 2    |
+
+
+Scenario: Parse cache expires unpinned relative dates
+    Given a parse cache with a ttl
+    When I parse a relative date string twice with <seconds> seconds in between
+    Then the parse cache has <hits> hits and <misses> misses
+
+    Examples:
+    | seconds | hits | misses |
+    | 10      | 1    | 1      |
+    | 120     | 0    | 2      |
+
+
+Scenario: Parse cache keeps pinned dates
+    Given a parse cache with a ttl
+    Then pinned dates are cached without expiration
+
+
+Scenario: Batch date matching
+    Given a list of dates
+    Given numpy is <numpy_state>
+    Then batch date matches agrees with date matches
+    And batch date matches returns the matching indices
+    And batch date in period matches agrees with date in period matches
+
+    Examples:
+    | numpy_state |
+    | installed   |
+    | missing     |
+
+
+Scenario: Fast parser tiers are equivalent to dateparser
+    Given the date string <string>
+    Then it is parsed by the <tier> tier
+    And the result is the same as dateparser's
+
+    Examples:
+    | string                           | tier       |
+    | 1460716830                       | timestamp  |
+    | 1460716830123                    | timestamp  |
+    | 1460716830123456                 | timestamp  |
+    | 2016-04-15                       | iso8601    |
+    | 2016-04-15T10:20                 | iso8601    |
+    | 2016-04-15 10:20:30              | iso8601    |
+    | 2016-04-15T10:20:30.123456       | iso8601    |
+    | 2016-04-15T10:20:30.5Z           | iso8601    |
+    | 2016-04-15T10:20:30+02:00        | iso8601    |
+    | 2016-04-15T10:20:30+0530         | iso8601    |
+    | 2016-04-15T10:20:30-00:00        | iso8601    |
+    | Fri, 15 Apr 2016 10:20:30 +0200  | rfc2822    |
+    | Fri, 15 Apr 2016 10:20 +0200     | rfc2822    |
+    | Fri, 5 Apr 2016 10:20:30 GMT     | rfc2822    |
+    | 15 Apr 2016 10:20:30 UTC         | rfc2822    |
+    | Fri, 15 Apr 2016 10:20:30 UT     | rfc2822    |
+    | Mar 3, 2016                      | dateparser |
+    | 2 hours ago                      | dateparser |
+    | 2016-02-30                       | dateparser |
+
+
+Scenario: Format learner
+    Given a format learner
+    When I parse <n_strings> date strings like <string> with the learner
+    Then the learner knows the format <learned_format>
+
+    Examples:
+    | n_strings | string              | learned_format  |
+    | 2         | Mar 3, 2016         | None            |
+    | 3         | Mar 3, 2016         | %b %d, %Y       |
+    | 3         | 13/04/2016          | %d/%m/%Y        |
+    | 3         | 2 hours ago         | None            |
+    | 3         | March 3, 2016 10:15 | %B %d, %Y %H:%M |
+
+
+Scenario: Format learner parses with the learned format
+    Given a format learner
+    When I parse 3 date strings like Mar 3, 2016 with the learner
+    Then the next strings are parsed by the learned format
+    And relative strings still go to dateparser
+
+
+Scenario: Format learner learns a new format
+    Given a format learner
+    When I parse 3 date strings like Mar 3, 2016 with the learner
+    And I parse 3 date strings like 2016/03/03 with the learner
+    Then the learner knows the format %Y/%m/%d
+
+
+Scenario: Date matcher with dateparser settings
+    Given a date matcher with dateparser settings
+    Then the dateparser parser is built once
+    And the settings are used to parse
+
+
+Scenario: Date matcher with dateparser settings from Scrapy settings
+    Given a date string
+    Then the matcher is configured from scrapy settings
+    And date matches accepts dateparser settings
+
+
+Scenario: Date matcher with timezone
+    Given a date matcher in Europe/Madrid after 2016-04-15 10:00
+    Then date matcher with timezone matches <target_date> is <true_or_false>
+
+    Examples:
+    | target_date               | true_or_false |
+    | 2016-04-15T09:30:00Z      | True          |
+    | 2016-04-15T07:30:00Z      | False         |
+    | 2016-04-15T10:30:00+02:00 | True          |
+    | 2016-04-15 09:30          | False         |
+    | 2016-04-15 10:30          | True          |
+
+
+Scenario: Date matcher with timezone in batch
+    Given a date matcher in Europe/Madrid after 2016-04-15 10:00
+    Given numpy is <numpy_state>
+    Then batch matching with timezone agrees with matching one by one
+
+    Examples:
+    | numpy_state |
+    | installed   |
+    | missing     |
+
+
+Scenario: Date matcher in period with timezone
+    Given a date string
+    Then date matcher in period with timezone compares periods in UTC
+
+
+Scenario: Date matcher with windows
+    Given a date matcher with windows in period <period>
+    Then date matcher with windows matches <target_date> is <true_or_false>
+
+    Examples:
+    | period | target_date         | true_or_false |
+    | None   | 2016-04-04          | True          |
+    | None   | 2016-04-06          | False         |
+    | None   | 2016-05-10 23:00    | True          |
+    | None   | 2016-05-11          | False         |
+    | None   | 2014-06-01          | True          |
+    | day    | 2016-04-05 12:00    | True          |
+    | week   | 2016-04-06          | True          |
+    | week   | 2016-04-12          | False         |
+    | month  | 2016-05-31          | True          |
+
+
+Scenario: Date matcher with windows in batch
+    Given a date matcher with windows in period <period>
+    Given numpy is <numpy_state>
+    Then batch matching with windows agrees with matching one by one
+
+    Examples:
+    | period | numpy_state |
+    | None   | installed   |
+    | None   | missing     |
+    | week   | installed   |
+    | hour   | installed   |
+
+
+Scenario: Date matches with many windows
+    Given a date string
+    Then date matches accepts windows
+    And windows can't be combined with delimitation parameters
+    And thousands of windows are matched with a single bisection
@@ -0,0 +1,88 @@
+Feature: Numeric matchers
+    The interval index and the number and version matchers.
+
+
+Scenario: Find values in an interval index
+    Given an interval index of <ranges>
+    Then <value> is inside the index is <true_or_false>
+
+    Examples:
+    | ranges                              | value | true_or_false |
+    | (1, 10)                             | 1     | True          |
+    | (1, 10)                             | 10    | True          |
+    | (1, 10, 'left')                     | 10    | False         |
+    | (1, 10, 'right')                    | 1     | False         |
+    | (1, 10, 'neither')                  | 5     | True          |
+    | (1, 10), (20, 30)                   | 15    | False         |
+    | (1, 10), (20, 30)                   | 25    | True          |
+    | (None, 10), (20, None)              | -500  | True          |
+    | (None, 10), (20, None)              | 500   | True          |
+    | (1, 5, 'left'), (5, 10, 'right')    | 5     | False         |
+
+
+Scenario: Merge overlapping and adjacent ranges
+    Given an interval index of <ranges>
+    Then the merged intervals are <intervals>
+
+    Examples:
+    | ranges                                | intervals                            |
+    | (1, 10), (5, 20)                      | [(1, 20, 'both')]                    |
+    | (1, 10, 'left'), (10, 20)             | [(1, 20, 'both')]                    |
+    | (1, 5, 'left'), (5, 10, 'right')      | [(1, 5, 'left'), (5, 10, 'right')]   |
+    | (20, 30), (1, 2), (2, 3, 'neither')   | [(1, 3, 'left'), (20, 30, 'both')]   |
+    | (None, 5), (1, None)                  | [(None, None, 'both')]               |
+
+
+Scenario: Many ranges are matched in logarithmic time
+    Given an interval index of 1000 disjoint ranges
+    Then every value is found with a bisection
+
+
+Scenario: Match numbers
+    Given number <data>
+    Then number matches with <kwargs> is <true_or_false>
+
+    Examples:
+    | data        | kwargs                                           | true_or_false |
+    | 1234        | {'min_value': 1000}                              | True          |
+    | 1234        | {'greater_than': 1234}                           | False         |
+    | 1234        | {'less_than': 1234}                              | False         |
+    | '#1234'     | {'min_value': 1000, 'max_value': 2000}           | True          |
+    | '$1,299.90' | {'max_value': 1000}                              | False         |
+    | '$1,299.90' | {'ranges': [(0, 100), (1000, 1500)]}             | True          |
+    | 0           | {'ranges': [(0, 10, 'left')]}                    | True          |
+    | None        | {}                                               | False         |
+    | 'Page 3'    | {}                                               | True          |
+
+
+Scenario: Match versions
+    Given version <data>
+    Then version matches with <kwargs> is <true_or_false>
+
+    Examples:
+    | data     | kwargs                                        | true_or_false |
+    | '1.10.2' | {'min_value': '1.9'}                          | True          |
+    | 'v1.2'   | {'min_value': '1.10'}                         | False         |
+    | '2.0'    | {'less_than': '2.0'}                          | False         |
+    | '1.4.1'  | {'ranges': [('1.0', '1.2'), ('1.4', '1.5')]}  | True          |
+
+
+Scenario: Compiled number matchers
+    Given a list of ranges
+    Then compiling the same bounds twice returns the same matcher
+    And matchers with ranges aren't cached
+
+
+Scenario: Invalid numbers
+    Given number 'no number here'
+    Then matching the number raises exception
+
+
+Scenario: Use numeric matchers by name
+    Given number <data>
+    Then the registered number matcher with <kwargs> is <true_or_false>
+
+    Examples:
+    | data | kwargs                 | true_or_false |
+    | 15   | {'min_value': 10}      | True          |
+    | 5    | {'min_value': 10}      | False         |
@@ -0,0 +1,148 @@
+import pytest
+
+from pytest_bdd import when, then, given, scenarios
+from scrapy_mosquitera.matchers import (
+    Predicate, Match, And, Or, Not, compile_matcher, register_matcher, get_matcher
+)
+from scrapy_mosquitera.matchers import date as date_module
+
+converters = dict(
+    score=int,
+    n_items=int,
+    true_or_false=eval
+)
+scenarios('./compose.feature', example_converters=converters)
+
+
+class CountingPredicate(Predicate):
+    def __init__(self, fn, cost=None):
+        super(CountingPredicate, self).__init__(fn, cost=cost)
+        self.calls = 0
+
+    def matches(self, data):
+        self.calls += 1
+        return super(CountingPredicate, self).matches(data)
+
+
+@pytest.fixture
+def combined_matcher():
+    is_news = Predicate(lambda category: category == 'news', field='category')
+    is_sports = Predicate(lambda category: category == 'sports', field='category')
+    high_score = Predicate(lambda score: score > 5, field='score')
+    # news with high score, or anything which isn't news nor sports
+    return (is_news & high_score) | ~Or(is_news, is_sports)
+
+
+@given('an item with category <category> and score <score>')
+def item(category, score):
+    return {'category': category, 'score': score}
+
+
+@given('a registered matcher')
+def registered_matcher():
+    @register_matcher('category', cost=0.5)
+    def category_matches(data, allowed=()):
+        return data in allowed
+
+    return category_matches
+
+
+@given('an expensive matcher and a cheap matcher rejecting everything', target_fixture='matchers')
+def matchers_with_costs():
+    expensive = CountingPredicate(lambda item: True, cost=100)
+    cheap = CountingPredicate(lambda item: False, cost=1)
+    return expensive, cheap, And(expensive, cheap)
+
+
+@given('a matcher accepting everything and a matcher rejecting most items',
+       target_fixture='matchers')
+def matchers_with_selectivity():
+    accepting = CountingPredicate(lambda item: True)
+    rejecting = CountingPredicate(lambda item: item % 10 == 0)
+    return accepting, rejecting, And(accepting, rejecting)
+
+
+@pytest.fixture
+def evaluated():
+    return {}
+
+
+@given('items rejected by category')
+def items_rejected_by_category():
+    return [{'category': 'sports', 'date': 'Apr %d, 2016 10:00' % day} for day in range(1, 29)]
+
+
+@when('I evaluate <n_items> items')
+def evaluate_items(matchers, n_items, evaluated):
+    evaluator = compile_matcher(matchers[2], reorder_every=50)
+    evaluated['results'] = [evaluator(i) for i in range(n_items)]
+    evaluated['evaluator'] = evaluator
+
+
+@then('the combined matcher is <true_or_false>')
+def the_combined_matcher_is(combined_matcher, item, true_or_false):
+    assert combined_matcher(item) == true_or_false
+
+
+@then('the compiled combined matcher is <true_or_false>')
+def the_compiled_combined_matcher_is(combined_matcher, item, true_or_false):
+    evaluator = combined_matcher.compile(reorder_every=1, sample_every=1)
+    for _ in range(5):
+        assert evaluator(item) == true_or_false
+
+
+@then('the negated combined matcher is the opposite')
+def the_negated_combined_matcher_is_the_opposite(combined_matcher, item, true_or_false):
+    assert Not(combined_matcher)(item) == (not true_or_false)
+    assert Not(combined_matcher).compile()(item) == (not true_or_false)
+
+
+@then('it can be used by name')
+def it_can_be_used_by_name(registered_matcher):
+    assert get_matcher('category') is registered_matcher
+    matcher = Match('category', field='category', allowed=('news', 'blog'))
+    assert matcher.cost == 0.5
+    assert matcher({'category': 'news'})
+    assert not matcher({'category': 'sports'})
+
+
+@then('an unknown name raises exception')
+def an_unknown_name_raises_exception():
+    with pytest.raises(ValueError):
+        Match('unknown')
+
+
+@then('the expensive matcher is never called')
+def the_expensive_matcher_is_never_called(matchers, evaluated):
+    expensive, cheap, _ = matchers
+    assert not any(evaluated['results'])
+    assert expensive.calls == 0
+    assert cheap.calls == 100
+
+
+@then('the rejecting matcher is evaluated first')
+def the_rejecting_matcher_is_evaluated_first(matchers, evaluated):
+    accepting, rejecting, _ = matchers
+    assert evaluated['results'] == [i % 10 == 0 for i in range(500)]
+    assert rejecting.calls == 500
+    # Only the items accepted by the rejecting matcher reach the other one
+    assert accepting.calls < 150
+    assert evaluated['evaluator'].root.children[0].matcher is rejecting
+
+    stats = dict((s['matcher'], s) for s in evaluated['evaluator'].stats())
+    assert stats[rejecting]['calls'] == 500
+    assert stats[rejecting]['accepted'] == 50
+    assert stats[accepting]['calls'] == accepting.calls
+
+
+@then("dates aren't parsed when matching them")
+def dates_arent_parsed_when_matching_them(items_rejected_by_category):
+    date_module._parse_cache.clear()
+    matcher = And(
+        Match('date', field='date', after='2016-04-01'),
+        Predicate(lambda category: category == 'news', field='category'),
+    ).compile()
+
+    before = date_module.parse_tier_info()
+    assert not any(matcher(item) for item in items_rejected_by_category)
+    assert date_module.parse_tier_info() == before
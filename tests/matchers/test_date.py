@@ -1,11 +1,16 @@
 import datetime
 import dateparser
+import pytest
 
-from pytest_bdd import then, given, scenarios
+from pytest_bdd import then, given, when, scenarios, parsers
+from scrapy_mosquitera.cache import LRUCache
+from scrapy_mosquitera.matchers import date as date_module
 from scrapy_mosquitera.matchers.date import (
     _to_datetime, has_valid_date, _get_min_date, _get_max_date,
     date_matches, date_in_period_matches, _date_in_period_day,
-    _date_in_period_week, _date_in_period_month, _date_in_period_year
+    _date_in_period_week, _date_in_period_month, _date_in_period_year,
+    DateMatcher, compile_date_matcher, date_matches_many, date_in_period_matches_many,
+    FormatLearner
 )
 
 
@@ -15,7 +20,15 @@ converters = dict(
     min_date=dateparser.parse,
     max_date=dateparser.parse,
     true_or_false=eval,
-    maximum=eval
+    maximum=eval,
+    period=lambda v: None if v == 'None' else v,
+    maxsize=int,
+    seconds=int,
+    hits=int,
+    misses=int,
+    size=int,
+    n_strings=int,
+    learned_format=lambda v: None if v == 'None' else v
 )
 scenarios('./date.feature', example_converters=converters)
 
@@ -143,6 +156,18 @@ def date_in_period_week_with_maximum_is(maximum, true_or_false, target_date, min
     assert _date_in_period_week(target_date, min_date, max_date, maximum) == true_or_false
 
 
+@then('date in period hour with <maximum> is <true_or_false>')
+def date_in_period_hour_with_maximum_is(maximum, true_or_false, target_date, min_date, max_date):
+    assert date_in_period_matches(target_date, period='hour', check_maximum=maximum,
+                                  min_date=min_date, max_date=max_date) == true_or_false
+
+
+@then('date in period quarter with <maximum> is <true_or_false>')
+def date_in_period_quarter_with_maximum_is(maximum, true_or_false, target_date, min_date, max_date):
+    assert date_in_period_matches(target_date, period='quarter', check_maximum=maximum,
+                                  min_date=min_date, max_date=max_date) == true_or_false
+
+
 @then('date in period month with <maximum> is <true_or_false>')
 def date_in_period_month_with_maximum_is(maximum, true_or_false, target_date, min_date, max_date):
     assert _date_in_period_month(target_date, min_date, max_date, maximum) == true_or_false
@@ -151,3 +176,390 @@ def date_in_period_month_with_maximum_is(maximum, true_or_false, target_date, mi
 @then('date in period year with <maximum> is <true_or_false>')
 def date_in_period_year_with_maximum_is(maximum, true_or_false, target_date, min_date, max_date):
     assert _date_in_period_year(target_date, min_date, max_date, maximum) == true_or_false
+
+
+@given(parsers.parse('a date matcher after {expression} based on {base}'))
+def date_matcher_with_base(expression, base):
+    return DateMatcher(after=expression, relative_base=dateparser.parse(base))
+
+
+@given('a date string')
+def a_date_string():
+    return '2016-04-15'
+
+
+@then(parsers.parse('the matcher minimum date is {expected}'))
+def the_matcher_minimum_date_is(date_matcher_with_base, expected):
+    assert date_matcher_with_base.min_date.date() == dateparser.parse(expected).date()
+
+
+@then('date matcher in period <period> with <maximum> is <true_or_false>')
+def date_matcher_in_period_with_maximum_is(period, maximum, true_or_false,
+                                           target_date, min_date, max_date):
+    matcher = DateMatcher(period=period, check_maximum=maximum,
+                          min_date=min_date, max_date=max_date)
+    assert matcher.matches(target_date) == true_or_false
+
+
+@then('compiling the same parameters twice returns the same matcher')
+def compiling_the_same_parameters_twice_returns_the_same_matcher():
+    first = compile_date_matcher(after='5 days ago', period='week')
+    assert compile_date_matcher(after='5 days ago', period='week') is first
+    assert compile_date_matcher(after='5 days ago') is not first
+
+
+@then('matching many dates parses the bounds once')
+def matching_many_dates_parses_the_bounds_once():
+    date_module.clear_date_matcher_cache()
+    before = date_module.parse_tier_info()['dateparser']
+
+    for _ in range(10):
+        date_matches('Apr 15, 2016', after='Apr 1, 2016', before='Apr 30, 2016')
+
+    # Two bounds plus the matched date, which is cached afterwards
+    assert date_module.parse_tier_info()['dateparser'] - before == 2 + 1
+
+
+@then('building a date matcher with an unknown period raises exception')
+def building_a_date_matcher_with_an_unknown_period_raises_exception():
+    with pytest.raises(ValueError):
+        DateMatcher(period='decade')
+
+
+@given('a parse cache with <maxsize> entries')
+def parse_cache(maxsize):
+    date_module.configure_parse_cache(maxsize=maxsize)
+    yield
+    date_module.configure_parse_cache()
+
+
+@given('a parse cache with a ttl')
+def parse_cache_with_ttl(mocker):
+    now = [1000.0]
+    cache = LRUCache(maxsize=10, ttl=60, timer=lambda: now[0])
+    mocker.patch.object(date_module, '_parse_cache', cache)
+    return now
+
+
+@when('I parse the date strings <strings>')
+def parse_the_date_strings(strings):
+    for string in strings.split(','):
+        _to_datetime(string.strip())
+
+
+@when('I parse a relative date string twice with <seconds> seconds in between')
+def parse_a_relative_date_string_twice(parse_cache_with_ttl, seconds):
+    _to_datetime('2 hours ago')
+    parse_cache_with_ttl[0] += seconds
+    _to_datetime('2 hours ago')
+
+
+@then('the parse cache has <hits> hits and <misses> misses')
+def the_parse_cache_has_hits_and_misses(hits, misses):
+    info = date_module.parse_cache_info()
+    assert (info['hits'], info['misses']) == (hits, misses)
+
+
+@then('the parse cache size is <size>')
+def the_parse_cache_size_is(size):
+    assert date_module.parse_cache_info()['size'] == size
+
+
+@then('pinned dates are cached without expiration')
+def pinned_dates_are_cached_without_expiration(parse_cache_with_ttl):
+    base = datetime.datetime(2016, 4, 15)
+    first = _to_datetime('2 hours ago', relative_base=base)
+    parse_cache_with_ttl[0] += 3600
+    assert _to_datetime('2 hours ago', relative_base=base) == first
+    assert date_module.parse_cache_info()['hits'] == 1
+
+
+@given('a list of dates')
+def list_of_dates():
+    return [
+        '2016-04-15', None, datetime.date(2016, 4, 2), '2016-03-31',
+        datetime.datetime(2016, 5, 1, 10), '2016-04-15', '', 'Apr 30, 2016',
+    ]
+
+
+@given('numpy is <numpy_state>')
+def numpy_state(mocker, numpy_state):
+    if numpy_state == 'installed':
+        pytest.importorskip('numpy')
+    else:
+        mocker.patch.object(date_module, '_get_numpy', return_value=None)
+
+
+@then('batch date matches agrees with date matches')
+def batch_date_matches_agrees_with_date_matches(list_of_dates, numpy_state):
+    bounds = {'after': '2016-04-01', 'before': '2016-04-30'}
+    expected = [date_matches(v, **bounds) for v in list_of_dates]
+    assert list(date_matches_many(list_of_dates, **bounds)) == expected
+
+
+@then('batch date matches returns the matching indices')
+def batch_date_matches_returns_the_matching_indices(list_of_dates, numpy_state):
+    result = date_matches_many(list_of_dates, as_indices=True, after='2016-04-01', before='2016-04-30')
+    assert result == [0, 2, 5, 7]
+
+
+@then('batch date in period matches agrees with date in period matches')
+def batch_date_in_period_matches_agrees(list_of_dates, numpy_state):
+    for period in ('hour', 'day', 'week', 'month', 'quarter', 'year'):
+        bounds = {'period': period, 'after': '2016-04-05', 'before': '2016-04-20'}
+        expected = [date_in_period_matches(v, **bounds) for v in list_of_dates]
+        assert list(date_in_period_matches_many(list_of_dates, **bounds)) == expected
+
+
+@given('the date string <string>')
+def the_date_string(string):
+    return string
+
+
+@then('it is parsed by the <tier> tier')
+def it_is_parsed_by_the_tier(the_date_string, tier):
+    before = date_module.parse_tier_info()
+    date_module._parse_with_tiers(the_date_string)
+    after = date_module.parse_tier_info()
+    assert [name for name in after if after[name] != before[name]] == [tier]
+
+
+@then("the result is the same as dateparser's")
+def the_result_is_the_same_as_dateparsers(the_date_string):
+    base = datetime.datetime(2016, 4, 15)
+    result = date_module._parse_with_tiers(the_date_string, relative_base=base)
+    expected = dateparser.parse(the_date_string, settings={'RELATIVE_BASE': base})
+
+    assert result == expected
+    if expected is not None:
+        assert result.utcoffset() == expected.utcoffset()
+        assert result.replace(tzinfo=None) == expected.replace(tzinfo=None)
+
+
+SAMPLE_FORMATS = {
+    'Mar 3, 2016': '%b %d, %Y',
+    '13/04/2016': '%d/%m/%Y',
+    '2016/03/03': '%Y/%m/%d',
+    'March 3, 2016 10:15': '%B %d, %Y %H:%M',
+}
+
+
+def _dates_like(string, n):
+    """ Return ``n`` different dates written like ``string``. """
+    fmt = SAMPLE_FORMATS.get(string)
+    if fmt is None:
+        return [string] * n
+
+    base = datetime.datetime.strptime(string, fmt)
+    return [(base + datetime.timedelta(days=i)).strftime(fmt) for i in range(n)]
+
+
+@given('a format learner')
+def format_learner():
+    date_module._parse_cache.clear()
+    return FormatLearner(samples=3)
+
+
+@when('I parse <n_strings> date strings like <string> with the learner')
+@when(parsers.parse('I parse {n_strings:d} date strings like {string} with the learner'))
+def parse_date_strings_with_the_learner(format_learner, n_strings, string):
+    for value in _dates_like(string, n_strings):
+        _to_datetime(value, learner=format_learner)
+
+
+@then('the learner knows the format <learned_format>')
+@then(parsers.parse('the learner knows the format {learned_format}'))
+def the_learner_knows_the_format(format_learner, learned_format):
+    learned = format_learner.formats[0] if format_learner.formats else None
+    assert learned == learned_format
+
+
+@then('the next strings are parsed by the learned format')
+def the_next_strings_are_parsed_by_the_learned_format(format_learner):
+    before = date_module.parse_tier_info()
+    assert _to_datetime('Apr 20, 2016', learner=format_learner) == datetime.datetime(2016, 4, 20)
+    after = date_module.parse_tier_info()
+    assert after['learned'] == before['learned'] + 1
+    assert after['dateparser'] == before['dateparser']
+
+
+@then('relative strings still go to dateparser')
+def relative_strings_still_go_to_dateparser(format_learner):
+    before = date_module.parse_tier_info()
+    assert _to_datetime('3 days ago', learner=format_learner)
+    assert date_module.parse_tier_info()['dateparser'] == before['dateparser'] + 1
+    assert format_learner.formats == ['%b %d, %Y']
+
+
+@given('a date matcher with dateparser settings')
+def date_matcher_with_settings():
+    return DateMatcher(after=datetime.datetime(2016, 4, 1), languages=['en'],
+                       settings={'DATE_ORDER': 'DMY'})
+
+
+@then('the dateparser parser is built once')
+def the_dateparser_parser_is_built_once(date_matcher_with_settings):
+    parser = date_matcher_with_settings.parser
+
+    assert date_matcher_with_settings.matches('05/04/2016 10:00')
+    built = parser._parser
+    assert date_matcher_with_settings.matches('06/04/2016 10:00')
+    assert built is not None and parser._parser is built
+
+
+@then('the settings are used to parse')
+def the_settings_are_used_to_parse(date_matcher_with_settings):
+    assert date_matcher_with_settings.matches('02/05/2016')
+    assert not date_matcher_with_settings.matches('05/02/2016')
+    # DATE_ORDER changes how fixed formats are read, so dateparser parses them
+    assert not date_matcher_with_settings.matches('2016-05-02')
+
+
+@then('the matcher is configured from scrapy settings')
+def the_matcher_is_configured_from_scrapy_settings():
+    from scrapy.settings import Settings
+    settings = Settings({
+        'MOSQUITERA_DATEPARSER_LANGUAGES': ['en'],
+        'MOSQUITERA_DATEPARSER_SETTINGS': {'PREFER_DATES_FROM': 'past'},
+    })
+    matcher = DateMatcher.from_settings(settings, after='2016-04-01')
+    assert matcher.parser.languages == ['en']
+    assert matcher.parser.settings['PREFER_DATES_FROM'] == 'past'
+    assert matcher.parser.settings['RELATIVE_BASE'] == matcher.relative_base
+
+
+@then('date matches accepts dateparser settings')
+def date_matches_accepts_dateparser_settings():
+    kwargs = {'after': '2016-04-01', 'languages': ['en'], 'settings': {'DATE_ORDER': 'DMY'}}
+    assert date_matches('02/05/2016', **kwargs)
+    assert compile_date_matcher(**kwargs) is compile_date_matcher(**kwargs)
+
+
+TIMEZONE_DATES = [
+    '2016-04-15T09:30:00Z', '2016-04-15T07:30:00Z', '2016-04-15T10:30:00+02:00',
+    '2016-04-15 09:30', '2016-04-15 10:30', None,
+]
+
+
+@given(parsers.parse('a date matcher in {timezone} after {after}'))
+def date_matcher_with_timezone(timezone, after):
+    return DateMatcher(after=after, timezone=timezone)
+
+
+@then('date matcher with timezone matches <target_date> is <true_or_false>')
+def date_matcher_with_timezone_matches(date_matcher_with_timezone, target_date, true_or_false):
+    assert date_matcher_with_timezone.matches(target_date) == true_or_false
+
+
+@then('batch matching with timezone agrees with matching one by one')
+def batch_matching_with_timezone_agrees(date_matcher_with_timezone, numpy_state):
+    expected = [date_matcher_with_timezone.matches(v) for v in TIMEZONE_DATES]
+    assert list(date_matcher_with_timezone.matches_many(TIMEZONE_DATES)) == expected
+    assert expected == [True, False, True, False, True, False]
+
+
+@then('date matcher in period with timezone compares periods in UTC')
+def date_matcher_in_period_with_timezone_compares_periods_in_utc():
+    # Monday 2016-04-18 01:00 in Madrid is still Sunday in UTC
+    matcher = DateMatcher(period='week', on='2016-04-18 01:00', timezone='Europe/Madrid')
+    assert matcher.matches('2016-04-11T12:00:00Z')
+    assert not matcher.matches('2016-04-18T12:00:00Z')
+    assert not DateMatcher(period='week', on='2016-04-18 01:00').matches('2016-04-11T12:00:00Z')
+
+
+WINDOWS = [
+    ('2016-04-01', '2016-04-03'), ('2016-04-02', '2016-04-05'),
+    {'on': '2016-05-10'}, (None, '2015-01-01'),
+]
+
+WINDOW_DATES = [
+    '2016-04-04', '2016-04-06', '2016-05-10 23:00', '2016-05-11', '2014-06-01',
+    datetime.datetime(2016, 4, 12), None, '2016-04-04',
+]
+
+
+@given('a date matcher with windows in period <period>')
+def date_matcher_with_windows(period):
+    return DateMatcher(period=period, windows=WINDOWS)
+
+
+@then('date matcher with windows matches <target_date> is <true_or_false>')
+def date_matcher_with_windows_matches(date_matcher_with_windows, target_date, true_or_false):
+    assert date_matcher_with_windows.matches(target_date) == true_or_false
+
+
+@then('batch matching with windows agrees with matching one by one')
+def batch_matching_with_windows_agrees(date_matcher_with_windows, numpy_state):
+    expected = [date_matcher_with_windows.matches(v) for v in WINDOW_DATES]
+    assert list(date_matcher_with_windows.matches_many(WINDOW_DATES)) == expected
+
+
+@then('date matches accepts windows')
+def date_matches_accepts_windows():
+    assert date_matches('2016-04-04', windows=WINDOWS)
+    assert not date_matches('2016-04-06', windows=WINDOWS)
+    assert date_in_period_matches('2016-04-06', period='week', windows=WINDOWS)
+    assert compile_date_matcher(windows=WINDOWS) is not compile_date_matcher(windows=WINDOWS)
+
+
+@then("windows can't be combined with delimitation parameters")
+def windows_cant_be_combined():
+    with pytest.raises(ValueError):
+        DateMatcher(windows=WINDOWS, after='2016-04-01')
+
+
+@then('thousands of windows are matched with a single bisection')
+def thousands_of_windows(mocker):
+    start = datetime.datetime(2010, 1, 1)
+    windows = [
+        (start + datetime.timedelta(days=i * 2), start + datetime.timedelta(days=i * 2, hours=12))
+        for i in range(5000)
+    ]
+    matcher = DateMatcher(windows=windows)
+    assert len(matcher.windows) == 5000
+
+    bisect = mocker.patch('scrapy_mosquitera.matchers.intervals.bisect_right',
+                          wraps=__import__('bisect').bisect_right)
+    assert matcher.matches(start + datetime.timedelta(days=4000, hours=1))
+    assert not matcher.matches(start + datetime.timedelta(days=4001, hours=1))
+    assert bisect.call_count == 2
+
+
+@then('the compiled matchers of each crawl are pinned to its start')
+def compiled_matchers_are_pinned_to_each_crawl():
+    from scrapy import Spider, signals
+    from scrapy.utils.test import get_crawler
+
+    first, second = get_crawler(Spider), get_crawler(Spider)
+    first_base = date_module.pin_to_crawl(first)
+    # The only crawl is used by the matchers compiled without crawler
+    assert compile_date_matcher(after='5 days ago').relative_base == first_base
+    assert DateMatcher.from_crawler(first, after='5 days ago').relative_base == first_base
+
+    second_base = date_module.pin_to_crawl(second)
+    assert date_module.pin_to_crawl(second) == second_base
+    matcher = compile_date_matcher(after='5 days ago', crawler=second)
+    assert matcher.relative_base == second_base
+    assert compile_date_matcher(after='5 days ago', crawler=second) is matcher
+    assert compile_date_matcher(after='5 days ago', crawler=first).relative_base == first_base
+    # Opening another crawl doesn't resolve the others again
+    assert compile_date_matcher(after='5 days ago', crawler=second) is matcher
+
+    first.signals.send_catch_log(signals.spider_closed, spider=None, reason='finished')
+    assert compile_date_matcher(after='5 days ago').relative_base == second_base
+    second.signals.send_catch_log(signals.spider_closed, spider=None, reason='finished')
+    assert not date_module._open_crawlers
+
+
+@then('the compiled matchers expire outside a crawl')
+def compiled_matchers_expire_outside_a_crawl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(date_module, '_matcher_cache', LRUCache(
+        maxsize=10, ttl=date_module.MATCHER_CACHE_TTL, timer=lambda: now[0]
+    ))
+
+    first = compile_date_matcher(after='5 days ago')
+    now[0] += date_module.MATCHER_CACHE_TTL - 1
+    assert compile_date_matcher(after='5 days ago') is first
+    now[0] += 1
+    assert compile_date_matcher(after='5 days ago') is not first
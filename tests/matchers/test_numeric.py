@@ -0,0 +1,105 @@
+import pytest
+
+from pytest_bdd import then, given, scenarios
+from scrapy_mosquitera.matchers import (
+    IntervalIndex, Match, NumberMatcher, number_matches, version_matches,
+    compile_number_matcher, compile_version_matcher
+)
+
+converters = dict(
+    ranges=lambda v: list(eval('[{}]'.format(v))),
+    intervals=eval,
+    value=int,
+    data=eval,
+    kwargs=eval,
+    true_or_false=eval
+)
+scenarios('./numeric.feature', example_converters=converters)
+
+
+@given('an interval index of <ranges>')
+def index(ranges):
+    return IntervalIndex(ranges)
+
+
+@given('an interval index of 1000 disjoint ranges', target_fixture='index')
+def large_index():
+    return IntervalIndex([(i * 10, i * 10 + 5) for i in range(1000)])
+
+
+@given('number <data>')
+def number(data):
+    return data
+
+
+@given("number 'no number here'", target_fixture='number')
+def invalid_number():
+    return 'no number here'
+
+
+@given('version <data>')
+def version(data):
+    return data
+
+
+@then('<value> is inside the index is <true_or_false>')
+def value_inside_index(index, value, true_or_false):
+    assert (value in index) is true_or_false
+
+
+@then('the merged intervals are <intervals>')
+def merged_intervals(index, intervals):
+    assert index.intervals() == intervals
+
+
+@then('every value is found with a bisection')
+def found_with_bisection(index, mocker):
+    bisect = mocker.patch('scrapy_mosquitera.matchers.intervals.bisect_right',
+                          wraps=__import__('bisect').bisect_right)
+    assert len(index) == 1000
+    assert 9993 in index
+    assert 9997 not in index
+    assert bisect.call_count == 2
+
+
+@then('number matches with <kwargs> is <true_or_false>')
+def number_matches_with(number, kwargs, true_or_false):
+    assert number_matches(number, **kwargs) is true_or_false
+
+
+@then('version matches with <kwargs> is <true_or_false>')
+def version_matches_with(version, kwargs, true_or_false):
+    assert version_matches(version, **kwargs) is true_or_false
+
+
+@given('a list of ranges', target_fixture='range_list')
+def range_list():
+    return [(0, 100), (1000, 1500)]
+
+
+@then('compiling the same bounds twice returns the same matcher')
+def compiling_the_same_bounds_twice():
+    assert compile_number_matcher(min_value=1000) is compile_number_matcher(min_value=1000)
+    assert compile_number_matcher(min_value=1000) is not compile_number_matcher(min_value=10)
+
+
+@then("matchers with ranges aren't cached")
+def matchers_with_ranges_arent_cached(range_list):
+    assert compile_number_matcher(ranges=range_list) is not compile_number_matcher(ranges=range_list)
+    assert compile_version_matcher(ranges=[('1.0', '1.2')]).matches('1.1')
+
+    # Changes to the ranges are seen by the next call
+    assert not number_matches(2500, ranges=range_list)
+    range_list.append((2000, 3000))
+    assert number_matches(2500, ranges=range_list)
+
+
+@then('matching the number raises exception')
+def matching_raises(number):
+    with pytest.raises(TypeError):
+        NumberMatcher(min_value=1).matches(number)
+
+
+@then('the registered number matcher with <kwargs> is <true_or_false>')
+def registered_number_matcher(number, kwargs, true_or_false):
+    assert Match('number', **kwargs).matches(number) is true_or_false
@@ -0,0 +1,83 @@
+Feature: URL date middlewares
+    Dropping requests whose URL date is outside the window.
+
+
+Scenario: Extract dates from URLs
+    Given a URL date filter
+    Then the date of <url> is <date>
+
+    Examples:
+    | url                                          | date                          |
+    | http://blog.tld/2016/04/15/post-title        | datetime(2016, 4, 15)         |
+    | http://blog.tld/2016/04/post-title           | datetime(2016, 4, 1)          |
+    | http://news.tld/archive/15-apr-2016.html     | '15-apr-2016'                 |
+    | http://blog.tld/about                        | None                          |
+
+
+Scenario: Filter requests by their URL date
+    Given a URL date filter
+    Then the request to <url> is allowed is <true_or_false>
+
+    Examples:
+    | url                                          | true_or_false |
+    | http://blog.tld/2016/04/15/post-title        | True          |
+    | http://blog.tld/2016/03/15/post-title        | False         |
+    | http://news.tld/archive/15-apr-2016.html     | True          |
+    | http://news.tld/archive/15-jan-2016.html     | False         |
+    | http://blog.tld/about                        | True          |
+    | http://blog.tld/2016/13/45/invalid           | True          |
+
+
+Scenario: Spider middleware drops requests out of the window
+    Given a crawler with URL date settings
+    When the spider middleware processes the spider output
+    Then only the requests in the window and the items are returned
+    And the dropped requests are counted
+
+
+Scenario: Downloader middleware ignores requests out of the window
+    Given a crawler with URL date settings
+    Then the downloader middleware ignores the requests out of the window
+    And the dropped requests are counted
+
+
+Scenario: Middlewares aren't configured without patterns
+    Given a crawler without URL date settings
+    Then creating the middlewares raises not configured
+
+
+Scenario: Pagination middleware tracks the listing requests
+    Given a pagination middleware
+    When the listing yields <n_requests> item requests and a next page request
+    Then the item requests are tracked by the listing
+    And the next page request is held
+
+    Examples:
+    | n_requests |
+    | 3          |
+
+
+Scenario: Pagination middleware requests the next page of complete listings
+    Given a pagination middleware
+    When the listing yields <n_requests> item requests and a next page request
+    And <n_valid> item pages yield items
+    Then the next page is requested when idle is <true_or_false>
+
+    Examples:
+    | n_requests | n_valid | true_or_false |
+    | 3          | 3       | True          |
+    | 3          | 2       | False         |
+    | 0          | 0       | True          |
+
+
+Scenario: Pagination middleware recognizes next pages
+    Given a pagination middleware
+    Then a request with callback <callback> and meta <meta> is a next page is <true_or_false>
+
+    Examples:
+    | callback   | meta                              | true_or_false |
+    | parse      | {}                                | True          |
+    | None       | {}                                | True          |
+    | parse_item | {}                                | False         |
+    | parse_item | {'mosquitera_next_page': True}    | True          |
+    | parse      | {'mosquitera_next_page': False}   | False         |
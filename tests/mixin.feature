@@ -23,8 +23,9 @@ Scenario: Increase counter
 Scenario: Decrease counter
     Given an instance of the mixin
     Given a response with id
-    When I use the response to decrease the counter
-    Then the counter for the response is -1
+    When I use the response to increase the counter
+    And I use the response to decrease the counter
+    Then the counter for the response is 0
 
 
 Scenario: Get response with attribute
@@ -43,18 +44,18 @@ Scenario: Get response with different number of response arguments
     Then getting response with any response objects returns the first one
 
 
-Scenario: Get response id from cache
+Scenario: Get response id from meta
     Given an instance of the mixin
     Given a response
-    When there's some response id cache
-    Then I get the response id from the cache
+    When the response already has a response id
+    Then I get the response id from the meta
 
 
-Scenario: Get response id from cache
+Scenario: Get new response id
     Given an instance of the mixin
     Given a response
-    When there's no response id cache
     Then I get a new response id
+    And the response id is kept in the meta
 
 
 Scenario: Register requests
@@ -73,8 +74,16 @@ Scenario: Register requests
 Scenario: Deregister response
     Given an instance of the mixin
     When I set the response for the pagination mixin
+    And request registry has counters > 0
     And I deregister response
-    Then the counter for the response is -1
+    Then the counter for the response is 4
+
+
+Scenario: Deregister response of an unknown listing
+    Given an instance of the mixin
+    When I set the response for the pagination mixin
+    And I deregister response
+    Then the response isn't registered
 
 
 Scenario: Enqueue next page requests
@@ -100,6 +109,7 @@ Scenario: Dequeue next page requests with valid nprs
     When request registry has some counters = 0
     And I mock crawler
     Then at dequeuing it raises dont close spider
+    And the completed listing is freed
 
 
 Scenario: Call next page requests
@@ -108,3 +118,198 @@ Scenario: Call next page requests
     Then many requests are yielded from call next page requests
     And it has initial attributes set
 
+
+
+Scenario: Next page requests without a callback are parsed by parse
+    Given an instance of the mixin
+    Given a response of a next page request without a callback
+    Then call next page requests parses it with parse
+    And an eager next page request parses it with parse
+
+
+Scenario: Next pages built with the listing meta are new listings
+    Given an instance of the mixin
+    When I paginate <n_pages> pages building every request with the listing meta
+    Then each page is a listing of its own
+
+    Examples:
+    | n_pages |
+    | 3       |
+
+
+Scenario: Register requests in streaming mode
+    Given an instance of the mixin
+    When I set the response for the pagination mixin
+    And I enable streaming and register a generator of <n_requests> requests
+    Then the requests are registered as they're yielded
+    And the listing isn't completed until the generator is exhausted
+
+    Examples:
+    | n_requests |
+    | 3          |
+
+
+Scenario: Register generator without streaming
+    Given an instance of the mixin
+    When I set the response for the pagination mixin
+    And I register a generator of <n_requests> requests
+    Then the generator is collected in a list
+
+    Examples:
+    | n_requests |
+    | 3          |
+
+
+Scenario: Eager next page requests are scheduled when the listing is completed
+    Given an instance of the mixin
+    When I enable eager pagination with <max_in_flight> requests in flight
+    And I mock crawler
+    And I set the response for the pagination mixin
+    And the listing has a pending item request and <n_requests> next page requests
+    And I deregister response
+    Then <n_scheduled> next page requests are scheduled
+    And parsing a next page request schedules another one
+
+    Examples:
+    | max_in_flight | n_requests | n_scheduled |
+    | 1             | 3          | 1           |
+    | 4             | 2          | 2           |
+
+
+Scenario: Idle spider schedules the eager next page requests left waiting
+    Given an instance of the mixin
+    When I enable eager pagination with <max_in_flight> requests in flight
+    And I mock crawler
+    And I set the response for the pagination mixin
+    And the listing has a pending item request and <n_requests> next page requests
+    And I deregister response
+    Then at dequeuing it raises dont close spider
+    And <n_scheduled> next page requests are scheduled
+
+    Examples:
+    | max_in_flight | n_requests | n_scheduled |
+    | 1             | 2          | 2           |
+
+
+Scenario: Pagination chains have their own registries
+    Given an instance of the mixin
+    When I register <n_requests> requests in the chains "a" and "b"
+    Then each chain counts <n_requests> requests
+    And the requests are tagged with their chain
+    And continuing the chain "a" keeps the chain "b"
+
+    Examples:
+    | n_requests |
+    | 2          |
+
+
+Scenario: A chain advances while another has pending items
+    Given an instance of the mixin
+    When I mock crawler
+    And I register <n_requests> requests in the chains "a" and "b"
+    And <n_valid> item pages of the chain "a" yield an item
+    Then the next pages of the chain "a" scheduled are <n_scheduled>
+    And the chain "b" keeps its pending items
+    And at dequeuing it doesn't raise dont close spider
+
+    Examples:
+    | n_requests | n_valid | n_scheduled |
+    | 2          | 2       | 1           |
+    | 2          | 1       | 0           |
+
+
+Scenario: Many spiders paginate in the same process
+    Given <n_spiders> spiders crawled in the same process
+    Then every spider requests the next page while its items are in the range
+
+    Examples:
+    | n_spiders |
+    | 30        |
+
+
+Scenario: Prefetched next pages are served to their next page requests
+    Given an instance of the mixin
+    When I enable prefetch with a mocked crawler
+    And I set the response for the pagination mixin
+    And I enqueue a method returning <n_requests>
+    Then <n_requests> next page requests are prefetched at low priority
+    And the downloaded prefetched response is served to its next page request
+    And a next page request is downloaded again if its prefetch is in flight
+
+    Examples:
+    | n_requests |
+    | 2          |
+
+
+Scenario: Prefetched next pages of discarded listings are wasted
+    Given an instance of the mixin
+    When I enable prefetch with a mocked crawler
+    And I set the response for the pagination mixin
+    And I enqueue a method returning <n_requests>
+    And every prefetch is downloaded
+    And the listings are discarded
+    Then <n_requests> prefetched responses are wasted
+
+    Examples:
+    | n_requests |
+    | 2          |
+
+
+Scenario: Dispatched next pages drop their prefetched responses
+    Given an instance of the mixin
+    When I enable prefetch with a mocked crawler
+    And I set the response for the pagination mixin
+    And I enqueue a method returning <n_requests>
+    And every prefetch is downloaded
+    And the next pages are parsed without being served
+    Then <n_requests> prefetched responses are wasted
+
+    Examples:
+    | n_requests |
+    | 2          |
+
+
+Scenario: Prefetch is disabled without its middleware
+    Given an instance of the mixin
+    When I enable prefetch with a mocked crawler without its middleware
+    And I set the response for the pagination mixin
+    And I enqueue a method returning <n_requests>
+    Then no next page request is prefetched
+
+    Examples:
+    | n_requests |
+    | 2          |
+
+
+Scenario: Many spiders prefetch their next pages in the same process
+    Given <n_spiders> spiders prefetching next pages crawled in the same process
+    Then every spider requests the next page while its items are in the range
+    And every next page requested is prefetched
+
+    Examples:
+    | n_spiders |
+    | 10        |
+
+
+Scenario: Many spiders prefetch their next pages without the middleware
+    Given <n_spiders> spiders prefetching next pages without the middleware
+    Then every spider requests the next page while its items are in the range
+    And no next page is prefetched
+
+    Examples:
+    | n_spiders |
+    | 3         |
+
+
+Scenario: Eager streaming listings are dispatched when they're exhausted
+    Given an instance of the mixin
+    When I enable eager pagination with <max_in_flight> requests in flight
+    And I mock crawler
+    And I set the response for the pagination mixin
+    And I enable streaming and register a generator of <n_requests> requests
+    And every streamed item page yields an item before the listing is exhausted
+    Then the next page is scheduled once the listing is exhausted
+
+    Examples:
+    | max_in_flight | n_requests |
+    | 4             | 2          |
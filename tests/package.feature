@@ -0,0 +1,23 @@
+Feature: Package
+    The package and its imports.
+
+
+Scenario: Importing doesn't load heavy dependencies
+    Given a new interpreter running <statement>
+    Then the modules <modules> aren't imported
+
+    Examples:
+    | statement                                                                      | modules                   |
+    | import scrapy_mosquitera                                                       | scrapy, dateparser        |
+    | import scrapy_mosquitera.matchers                                              | scrapy, dateparser, numpy |
+    | from scrapy_mosquitera.matchers import date_matches; date_matches('2016-04-15') | scrapy, dateparser        |
+
+
+Scenario: Public names are resolved lazily
+    Given a new interpreter running from scrapy_mosquitera import PaginationMixin
+    Then the modules scrapy_mosquitera.mixin are imported
+
+
+Scenario: Unknown names
+    Given the package
+    Then getting an unknown name raises attribute error
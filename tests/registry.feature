@@ -0,0 +1,57 @@
+Feature: Listing registry
+    The records of the listings being paginated.
+
+
+Scenario: Listing IDs are never reused
+    Given a listing registry
+    When I create <n_listings> listings and clear the registry
+    Then the next listing ID is <next_id>
+
+    Examples:
+    | n_listings | next_id |
+    | 0          | 1       |
+    | 3          | 4       |
+
+
+Scenario: Completed listings release their next page requests
+    Given a listing registry
+    When a listing has <pending> pending item requests and holds a next page request
+    Then the completed next page requests are <n_nprs>
+    And the completed listings are removed
+
+    Examples:
+    | pending | n_nprs |
+    | 0       | 1      |
+    | 2       | 0      |
+
+
+Scenario: Listings are ready when their last item request is answered
+    Given a listing registry
+    When <n_listings> listings have <pending> pending item requests
+    And the first listing answers <answered> item requests
+    Then the completed next page requests are <n_nprs>
+    And the ready queue is empty
+
+    Examples:
+    | n_listings | pending | answered | n_nprs |
+    | 3          | 2       | 1        | 0      |
+    | 3          | 2       | 2        | 1      |
+
+
+Scenario: Stray answers are ignored
+    Given a listing registry
+    When <n_listings> listings have <pending> pending item requests
+    And unknown listings and the first listing answer <answered> item requests
+    Then the completed next page requests are <n_nprs>
+    And only the first listing was removed
+
+    Examples:
+    | n_listings | pending | answered | n_nprs |
+    | 2          | 1       | 3        | 1      |
+
+
+Scenario: Open listings are ready when they're closed
+    Given a listing registry
+    When an open listing holds a next page request
+    Then the open listing isn't completed
+    And the listing is completed when it's closed
@@ -0,0 +1,14 @@
+Feature: Scheduling requests
+    Requests are scheduled in the engine of any Scrapy version.
+
+
+Scenario: Schedule a request in a recent engine
+    Given an engine whose crawl takes the request
+    When I schedule a request
+    Then the engine crawls the request
+
+
+Scenario: Schedule a request in an engine older than Scrapy 2.6
+    Given an engine whose crawl also takes the spider
+    When I schedule a request
+    Then the engine crawls the request with the spider
@@ -0,0 +1,32 @@
+Feature: Page search
+    Finding the listing pages of a date range with exponential and binary search.
+
+
+Scenario: Crawl only the pages inside the range
+    Given an archive of <n_pages> pages with <per_page> posts
+    Given a page search over the archive after <after> and before <before>
+    When I run the search
+    Then only the pages with posts in the range are parsed, once
+    And at most <max_probes> pages are probed
+
+    Examples:
+    | n_pages | per_page | after      | before     | max_probes |
+    | 1000    | 1        | 2016-04-01 | 2016-04-15 | 8          |
+    | 1000    | 1        | 2015-01-10 | 2015-01-20 | 21         |
+    | 1000    | 3        | 2014-01-01 | 2014-01-05 | 19         |
+    | 100     | 1        | 2016-05-01 | 2016-05-10 | 1          |
+    | 100     | 1        | 2010-01-01 | 2010-01-05 | 14         |
+
+
+Scenario: Classify pages against the range
+    Given a page search after 2016-04-01 and before 2016-04-15
+    Then a page with <dates> is <kind>
+
+    Examples:
+    | dates                        | kind   |
+    | 2016-04-20, 2016-04-18       | newer  |
+    | 2016-04-16, 2016-04-14       | inside |
+    | 2016-04-10                   | inside |
+    | 2016-03-31, 2016-03-30       | older  |
+    | 2016-04-20, 2016-03-30       | inside |
+    | none                         | older  |
@@ -0,0 +1,102 @@
+""" Spiders using PaginationMixin over ``data:`` URLs, run together in one process.
+
+    python -m tests.spiders 30 [prefetch] [no-middleware]
+
+prints the pages, items, prefetch stats and idle signals of each spider as JSON.
+The item pages of the last page of each spider are out of the range,
+so its pagination stops there.
+
+"""
+import sys
+import json
+
+from pydispatch import dispatcher
+from scrapy import Spider, signals
+from scrapy.http import Request
+from scrapy.crawler import CrawlerProcess
+
+from scrapy_mosquitera import PaginationMixin
+
+ITEMS_PER_PAGE = 3
+
+
+class ListingSpider(PaginationMixin, Spider):
+    name = 'listing'
+
+    def __init__(self, index=0, *args, **kwargs):
+        super(ListingSpider, self).__init__(*args, **kwargs)
+        self.index = int(index)
+        self.last_page = 2 + self.index % 3
+        self.pages = []
+        self.start_urls = [self.page_url(1)]
+        # Idle signals received from the crawlers of other spiders
+        self.foreign_idles = 0
+
+    def page_url(self, page):
+        return 'data:,listing-{}-{}'.format(self.index, page)
+
+    def dequeue_next_page_requests(self, spider):
+        if spider is not self:
+            self.foreign_idles += 1
+        return super(ListingSpider, self).dequeue_next_page_requests(spider)
+
+    @PaginationMixin.register_requests
+    def parse(self, response):
+        page = int(response.url.rsplit('-', 1)[1])
+        self.pages.append(page)
+        for i in range(ITEMS_PER_PAGE):
+            url = 'data:,item-{}-{}-{}'.format(self.index, page, i)
+            yield Request(url, callback=self.parse_item, meta={'page': page})
+
+        yield self.call_next_page(response)
+
+    @PaginationMixin.enqueue_next_page_requests
+    def call_next_page(self, response):
+        page = int(response.url.rsplit('-', 1)[1])
+        return Request(self.page_url(page + 1))
+
+    @PaginationMixin.deregister_response
+    def parse_item(self, response):
+        if response.meta['page'] < self.last_page:
+            return {'url': response.url}
+
+
+def main(n_spiders, prefetch=False, middleware=True):
+    settings = {
+        'LOG_ENABLED': False,
+        'TELNETCONSOLE_ENABLED': False,
+    }
+    if middleware:
+        settings['DOWNLOADER_MIDDLEWARES'] = {
+            'scrapy_mosquitera.middlewares.PrefetchMiddleware': 50,
+        }
+    process = CrawlerProcess(settings)
+
+    results = {}
+
+    def collect(spider):
+        results[spider.index] = {
+            'pages': spider.pages,
+            'items': spider.crawler.stats.get_value('item_scraped_count', 0),
+            'foreign_idles': spider.foreign_idles,
+            # Handlers connected for the idle signal of every crawler
+            'global_idle_receivers': len(list(dispatcher.getReceivers(dispatcher.Any, signals.spider_idle))),
+            'prefetch': dict(
+                (key.rsplit('/', 1)[1], value)
+                for key, value in spider.crawler.stats.get_stats().items()
+                if key.startswith('mosquitera/prefetch/')
+            ),
+            'prefetched_left': len(spider._prefetched),
+        }
+
+    for index in range(n_spiders):
+        crawler = process.create_crawler(ListingSpider)
+        crawler.signals.connect(collect, signal=signals.spider_closed)
+        process.crawl(crawler, index=index, pagination_prefetch=prefetch)
+
+    process.start()
+    print(json.dumps(results))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]), prefetch='prefetch' in sys.argv[2:], middleware='no-middleware' not in sys.argv[2:])
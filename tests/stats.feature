@@ -0,0 +1,54 @@
+Feature: Matcher stats
+    Recording matcher calls and publishing them to the Scrapy stats collector.
+
+
+Scenario: Record date matches
+    Given a stats recorder
+    When I match the dates <dates>
+    Then the date calls are <calls> and the accepted are <accepted>
+    And the published accept ratio is <ratio>
+
+    Examples:
+    | dates                                | calls | accepted | ratio |
+    | 2016-04-15, 2016-01-01               | 2     | 1        | 0.5   |
+    | 2016-04-15, 2016-04-16, 2016-04-17   | 3     | 3        | 1.0   |
+
+
+Scenario: Record parse failures
+    Given a stats recorder
+    When I match a value which isn't a date
+    Then a parse failure is recorded
+
+
+Scenario: Sample parse latency
+    Given a stats recorder timing one call every <sample_every>
+    When I match <n_dates> dates
+    Then <n_samples> latencies are sampled
+    And the latency percentiles are published
+
+    Examples:
+    | sample_every | n_dates | n_samples |
+    | 1            | 10      | 10        |
+    | 5            | 10      | 2         |
+
+
+Scenario: Record compiled matchers
+    Given a stats recorder
+    When I evaluate a compiled matcher named recent
+    Then the recent calls are recorded
+
+
+Scenario: Extension records the crawl
+    Given a crawler with the stats extension
+    When the spider is opened and matches dates
+    And the spider is closed
+    Then the crawler stats have the mosquitera stats
+    And the recorder is uninstalled
+
+
+Scenario: Crawlers in the same process keep their own stats
+    Given two crawlers with the stats extension
+    When both spiders are opened
+    And each spider matches its dates
+    Then each crawler records only its own matchers
+    And matchers without recorder aren't recorded
@@ -0,0 +1,181 @@
+import datetime
+
+import pytest
+
+from pytest_bdd import when, then, given, scenarios
+from scrapy import Spider
+from scrapy.exceptions import DontCloseSpider, IgnoreRequest, NotConfigured
+from scrapy.http import Request
+from scrapy.utils.test import get_crawler
+
+from scrapy_mosquitera.matchers import DateMatcher
+from scrapy_mosquitera.middlewares import (
+    UrlDateFilter, UrlDateSpiderMiddleware, UrlDateDownloaderMiddleware, PaginationMiddleware
+)
+from tests.utils import given_response
+
+converters = dict(
+    date=lambda v: eval(v, {'datetime': datetime.datetime}),
+    true_or_false=eval,
+    n_requests=int,
+    n_valid=int,
+    callback=lambda v: None if v == 'None' else v,
+    meta=eval
+)
+scenarios('./middlewares.feature', example_converters=converters)
+
+PATTERNS = [
+    r'/(?P<year>\d{4})/(?P<month>\d{2})/(?:(?P<day>\d{2})/)?',
+    r'/archive/([^/]+)\.html',
+]
+WINDOW = {'after': '2016-04-01', 'before': '2016-04-30'}
+
+REQUESTS = [
+    Request('http://blog.tld/2016/04/15/in-window'),
+    Request('http://blog.tld/2016/03/15/out-of-window'),
+    Request('http://blog.tld/2016/03/16/out-of-window', meta={'dont_filter_date': True}),
+    Request('http://blog.tld/about'),
+]
+
+
+@given('a URL date filter')
+def url_filter():
+    return UrlDateFilter(PATTERNS, DateMatcher(**WINDOW))
+
+
+@given('a crawler with URL date settings', target_fixture='crawler')
+def crawler_with_settings():
+    crawler = get_crawler(Spider, {
+        'MOSQUITERA_URL_DATE_PATTERNS': PATTERNS,
+        'MOSQUITERA_URL_DATE_WINDOW': WINDOW,
+    })
+    crawler.spider = Spider('test')
+    return crawler
+
+
+@given('a crawler without URL date settings', target_fixture='crawler')
+def crawler_without_settings():
+    return get_crawler(Spider)
+
+
+@when('the spider middleware processes the spider output')
+def spider_middleware_output(crawler):
+    middleware = UrlDateSpiderMiddleware.from_crawler(crawler)
+    response = given_response(url='http://blog.tld/')
+    result = REQUESTS + [{'item': 1}]
+    crawler.output = list(middleware.process_spider_output(response, iter(result), crawler.spider))
+
+
+@then('the date of <url> is <date>')
+def date_of_url(url_filter, url, date):
+    assert url_filter.extract_date(url) == date
+
+
+@then('the request to <url> is allowed is <true_or_false>')
+def request_is_allowed(url_filter, url, true_or_false):
+    assert url_filter.allows(Request(url)) is true_or_false
+
+
+@then('only the requests in the window and the items are returned')
+def only_requests_in_window(crawler):
+    assert crawler.output == [REQUESTS[0], REQUESTS[2], REQUESTS[3], {'item': 1}]
+
+
+@then('the downloader middleware ignores the requests out of the window')
+def downloader_middleware_ignores(crawler):
+    middleware = UrlDateDownloaderMiddleware.from_crawler(crawler)
+    assert middleware.process_request(REQUESTS[0], crawler.spider) is None
+    with pytest.raises(IgnoreRequest):
+        middleware.process_request(REQUESTS[1], crawler.spider)
+
+
+@then('the dropped requests are counted')
+def dropped_requests_counted(crawler):
+    assert crawler.stats.get_value('mosquitera/url_date/dropped') == 1
+
+
+@then('creating the middlewares raises not configured')
+def creating_raises_not_configured(crawler):
+    for middleware_class in (UrlDateSpiderMiddleware, UrlDateDownloaderMiddleware):
+        with pytest.raises(NotConfigured):
+            middleware_class.from_crawler(crawler)
+
+
+class ListingSpider(Spider):
+    name = 'listing'
+
+    def parse(self, response):
+        pass
+
+    def parse_item(self, response):
+        pass
+
+
+@given('a pagination middleware', target_fixture='middleware')
+def pagination_middleware(mocker):
+    crawler = get_crawler(ListingSpider, {'MOSQUITERA_PAGINATION_NEXT_PAGE_CALLBACKS': ['parse']})
+    crawler.spider = ListingSpider()
+    crawler.engine = mocker.Mock()
+    return PaginationMiddleware.from_crawler(crawler)
+
+
+@when('the listing yields <n_requests> item requests and a next page request')
+def listing_yields(middleware, n_requests):
+    spider = middleware.crawler.spider
+    item_requests = [
+        Request('http://domain.tld/post{}'.format(i), callback=spider.parse_item)
+        for i in range(n_requests)
+    ]
+    next_page = Request('http://domain.tld/page2', callback=spider.parse)
+
+    response = given_response(url='http://domain.tld/page1')
+    output = list(middleware.process_spider_output(response, iter(item_requests + [next_page]), spider))
+    middleware.output = output
+    middleware.next_page = next_page
+
+
+@when('<n_valid> item pages yield items')
+def item_pages_yield(middleware, n_valid, n_requests):
+    spider = middleware.crawler.spider
+    for i, request in enumerate(middleware.output):
+        response = given_response(url=request.url, meta=request.meta)
+        result = [{'item': i}] if i < n_valid else []
+        list(middleware.process_spider_output(response, iter(result), spider))
+
+
+@then('the item requests are tracked by the listing')
+def item_requests_tracked(middleware, n_requests):
+    assert len(middleware.output) == n_requests
+    listing_ids = set(r.meta['mosquitera_listing'] for r in middleware.output)
+    assert len(listing_ids) == 1
+    assert middleware.registry[listing_ids.pop()].counter == n_requests
+
+
+@then('the next page request is held')
+def next_page_held(middleware):
+    assert middleware.next_page not in middleware.output
+    assert [r.nprs for r in middleware.registry.records()] == [[middleware.next_page]]
+
+
+@then('the next page is requested when idle is <true_or_false>')
+def next_page_requested(middleware, true_or_false):
+    engine = middleware.crawler.engine
+    spider = middleware.crawler.spider
+
+    if true_or_false:
+        with pytest.raises(DontCloseSpider):
+            middleware.spider_idle(spider)
+        engine.crawl.assert_called_once_with(middleware.next_page)
+    else:
+        middleware.spider_idle(spider)
+        assert not engine.crawl.called
+
+    assert not middleware.registry
+
+
+@then('a request with callback <callback> and meta <meta> is a next page is <true_or_false>')
+def request_is_next_page(middleware, callback, meta, true_or_false):
+    spider = middleware.crawler.spider
+    callback = callback and getattr(spider, callback)
+    request = Request('http://domain.tld', callback=callback, meta=meta)
+    assert middleware.is_next_page(request) is true_or_false
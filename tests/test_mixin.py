@@ -1,19 +1,34 @@
+import os
+import sys
+import json
+import types
+import subprocess
+
 import pytest
 import six
 
 from scrapy_mosquitera import PaginationMixin
+from scrapy_mosquitera.middlewares import PrefetchMiddleware
+from scrapy import Spider
 from scrapy.http import Request
 from scrapy.exceptions import DontCloseSpider
+from scrapy.utils.test import get_crawler
 
 from pytest_bdd import when, then, given, scenarios, parsers
+from tests.spiders import ITEMS_PER_PAGE
 from tests.utils import given_response
 
 converters = dict(
-    n_requests=int
+    n_requests=int,
+    max_in_flight=int,
+    n_scheduled=int,
+    n_spiders=int,
+    n_valid=int,
+    n_pages=int
 )
 scenarios('./mixin.feature', example_converters=converters)
 
-RESPONSE_ID = 'abcdef'
+RESPONSE_ID = 1000
 
 
 @given('an instance of the mixin')
@@ -40,17 +55,21 @@ def response_with_nprs_inside(response):
     return given_response(url='http://domain.tld', meta=meta)
 
 
+@given('a response of a next page request without a callback', target_fixture='response')
+def response_of_npr_without_callback(mixin_instance):
+    mixin_instance.parse = lambda response: [{'url': response.url}]
+    meta = {'remaining_nprs': [], 'ocb': None}
+    return given_response(url='http://domain.tld/page2', meta=meta)
+
+
 @when('request registry has counters > 0')
 def request_registry_has_counters_greater_than_0(mixin_instance):
-    mixin_instance._request_registry[RESPONSE_ID] = {'counter': 5}
+    mixin_instance._request_registry[RESPONSE_ID].counter = 5
 
 
 @when('request registry has some counters = 0')
 def request_registry_has_some_counters_equal_0(mixin_instance):
-    mixin_instance._request_registry[RESPONSE_ID] = {
-        'counter': 0,
-        'nprs': [Request(url='http://domain.tld')]
-    }
+    mixin_instance._request_registry[RESPONSE_ID].nprs = [Request(url='http://domain.tld')]
 
 
 @when('I add an identifier to the request')
@@ -76,14 +95,9 @@ def set_the_response_for_the_pagination_mixin(mixin_instance):
     )
 
 
-@when("there's some response id cache")
-def theres_some_response_id_cache(mixin_instance):
-    mixin_instance._response_id_cache = {'http://domain.tld': RESPONSE_ID}
-
-
-@when("there's no response id cache")
-def theres_no_response_id_cache(mixin_instance):
-    mixin_instance._response_id_cache = {}
+@when('the response already has a response id')
+def the_response_already_has_a_response_id(response):
+    response.meta['__listing_id'] = RESPONSE_ID
 
 
 @when('I register requests with a method returning <n_requests>')
@@ -99,6 +113,37 @@ def register_requests_with_a_method_returning_n_requests(n_requests, mixin_insta
     mixin_instance._result = generate_requests(mixin_instance, n_requests)
 
 
+@when('I paginate <n_pages> pages building every request with the listing meta')
+def paginate_with_the_listing_meta(mixin_instance, n_pages):
+    @mixin_instance.register_requests
+    def parse(self, response):
+        return [Request(url=response.url + '/post', meta=response.meta)]
+
+    @mixin_instance.enqueue_next_page_requests
+    def next_page(self, response):
+        return Request(url=response.url + '/next', meta=response.meta)
+
+    response = given_response(url='http://domain.tld/page1')
+    mixin_instance._pages = []
+    for _ in range(n_pages):
+        item_request = parse(mixin_instance, response)[0]
+        next_page(mixin_instance, response)
+        listing_id = response.meta['__listing_id']
+        assert item_request.meta['__id'] == listing_id
+        assert '__listing_id' not in item_request.meta
+        mixin_instance._pages.append(listing_id)
+
+        npr = mixin_instance._request_registry[listing_id].nprs[0]
+        response = given_response(url=npr.url, meta=npr.meta)
+
+
+@then('each page is a listing of its own')
+def each_page_is_a_listing_of_its_own(mixin_instance, n_pages):
+    assert len(set(mixin_instance._pages)) == n_pages
+    for listing_id in mixin_instance._pages:
+        assert mixin_instance._request_registry[listing_id].counter == 1
+
+
 @when('I deregister response')
 def deregister_response(mixin_instance):
     @mixin_instance.deregister_response
@@ -132,17 +177,32 @@ def many_requests_are_yielded_from_call_next_page_requests(mixin_instance, respo
     assert len(result) > 1
 
 
+@then('call next page requests parses it with parse')
+def call_next_page_requests_parses_it_with_parse(mixin_instance, response):
+    meta = dict(response.meta)
+    result = list(mixin_instance.call_next_page_requests(response))
+    assert result == [{'url': 'http://domain.tld/page2'}]
+    response.meta.update(meta)
+
+
+@then('an eager next page request parses it with parse')
+def eager_npr_parses_it_with_parse(mixin_instance, response):
+    mixin_instance._nprs_in_flight = 1
+    result = mixin_instance.call_eager_next_page_request(response)
+    assert list(result) == [{'url': 'http://domain.tld/page2'}]
+    assert mixin_instance._nprs_in_flight == 0
+
+
 @then('the counter of nprs is <n_requests>')
 def the_counter_of_nprs_is_n_requests(mixin_instance, n_requests):
     rid = mixin_instance.response_for_pagination_mixin.meta['__id']
-    nprs = mixin_instance._request_registry[rid]['nprs']
+    nprs = mixin_instance._request_registry[rid].nprs
     assert len(nprs) == n_requests
 
 
 @then('it has initial attributes set')
 def has_initial_attributes_set(mixin_instance):
     assert hasattr(mixin_instance, '_request_registry')
-    assert hasattr(mixin_instance, '_response_id_cache')
     assert hasattr(mixin_instance, '_was_setup_called')
 
 
@@ -152,12 +212,17 @@ def every_request_is_marked(mixin_instance):
         assert req.meta['__id']
 
 
+@then("the response isn't registered")
+def the_response_isnt_registered(mixin_instance):
+    assert RESPONSE_ID not in mixin_instance._request_registry
+
+
 @then('the counter for the response is <n_requests>')
 def the_counter_for_the_response_is_n_requests(n_requests, mixin_instance):
     rid = mixin_instance._get_response_id(
         mixin_instance.response_for_pagination_mixin
     )
-    assert mixin_instance._request_registry[rid]['counter'] == n_requests
+    assert mixin_instance._request_registry[rid].counter == n_requests
 
 
 @then('the identifier is present in the request')
@@ -167,7 +232,7 @@ def the_identifier_is_present_in_the_request(req):
 
 @then(parsers.parse('the counter for the response is {number:d}'))
 def the_counter_for_the_response_is_number(mixin_instance, number):
-    assert mixin_instance._request_registry[RESPONSE_ID]['counter'] == number
+    assert mixin_instance._request_registry[RESPONSE_ID].counter == number
 
 
 @then('getting response returns the same response')
@@ -195,24 +260,379 @@ def calling_get_response_with_n_responses_gives_us_the_first_response(mixin_inst
     assert result.meta['tag'] == 0
 
 
-@then('I get the response id from the cache')
-def get_the_response_id_from_the_cache(mixin_instance, response):
+@then('I get the response id from the meta')
+def get_the_response_id_from_the_meta(mixin_instance, response):
     assert mixin_instance._get_response_id(response) == RESPONSE_ID
 
 
 @then('I get a new response id')
 def get_a_new_response_id(mixin_instance, response):
     result = mixin_instance._get_response_id(response)
-    assert isinstance(result, six.string_types)
+    assert isinstance(result, six.integer_types)
     assert result != RESPONSE_ID
 
 
+@then('the response id is kept in the meta')
+def the_response_id_is_kept_in_the_meta(mixin_instance, response):
+    response_id = mixin_instance._get_response_id(response)
+    assert response.meta['__listing_id'] == response_id
+    assert mixin_instance._get_response_id(response) == response_id
+
+
 @then("at dequeuing it doesn't raise dont close spider")
 def at_dequeuing_it_doesnt_raisee_dont_close_spider(mixin_instance):
     mixin_instance.dequeue_next_page_requests(None)
 
 
+@then('the completed listing is freed')
+def the_completed_listing_is_freed(mixin_instance):
+    assert RESPONSE_ID not in mixin_instance._request_registry
+
+
 @then('at dequeuing it raises dont close spider')
 def at_dequeuing_it_raises_dont_close_spider(mixin_instance):
     with pytest.raises(DontCloseSpider):
         mixin_instance.dequeue_next_page_requests(None)
+
+
+def _generate_requests(self, number):
+    for i in range(number):
+        yield Request(url='http://domain.tld/post%d' % i)
+
+
+@when('I enable streaming and register a generator of <n_requests> requests')
+def enable_streaming_and_register(mixin_instance, n_requests):
+    mixin_instance.pagination_streaming = True
+    register = PaginationMixin.register_requests(_generate_requests)
+    mixin_instance._result = register(mixin_instance, n_requests)
+
+
+@when('I register a generator of <n_requests> requests')
+def register_a_generator(mixin_instance, n_requests):
+    register = PaginationMixin.register_requests(_generate_requests)
+    mixin_instance._result = register(mixin_instance, n_requests)
+
+
+@then("the requests are registered as they're yielded")
+def requests_registered_as_yielded(mixin_instance, n_requests):
+    rid = mixin_instance._get_response_id(mixin_instance.response_for_pagination_mixin)
+    assert isinstance(mixin_instance._result, types.GeneratorType)
+    assert mixin_instance._request_registry[rid].counter == 0
+
+    request = next(mixin_instance._result)
+    assert request.meta['__id'] == rid
+    assert mixin_instance._request_registry[rid].counter == 1
+
+
+@then("the listing isn't completed until the generator is exhausted")
+def listing_not_completed_until_exhausted(mixin_instance, n_requests):
+    rid = mixin_instance._get_response_id(mixin_instance.response_for_pagination_mixin)
+    record = mixin_instance._request_registry[rid]
+    record.hold(Request(url='http://domain.tld/page2'))
+
+    # Every yielded item page answered, but the listing is still being parsed
+    record.counter = 0
+    assert mixin_instance._request_registry.pop_completed_nprs() == []
+
+    remaining = list(mixin_instance._result)
+    assert len(remaining) == n_requests - 1
+    assert record.counter == n_requests - 1
+    assert not record.open
+
+
+@then('the generator is collected in a list')
+def generator_collected(mixin_instance, n_requests):
+    assert isinstance(mixin_instance._result, list)
+    assert len(mixin_instance._result) == n_requests
+
+
+@when('I enable eager pagination with <max_in_flight> requests in flight')
+def enable_eager_pagination(mixin_instance, max_in_flight):
+    mixin_instance.pagination_eager = True
+    mixin_instance.pagination_max_in_flight = max_in_flight
+
+
+@when('the listing has a pending item request and <n_requests> next page requests')
+def listing_with_pending_item_request(mixin_instance, n_requests):
+    record = mixin_instance._request_registry[RESPONSE_ID]
+    record.counter = 1
+    for i in range(n_requests):
+        record.hold(Request(url='http://domain.tld/page%d' % i))
+
+
+@then('<n_scheduled> next page requests are scheduled')
+def next_page_requests_are_scheduled(mixin_instance, n_scheduled):
+    calls = mixin_instance.crawler.engine.crawl.call_args_list
+    assert len(calls) == n_scheduled
+    for call in calls:
+        request = call[0][0]
+        assert request.callback == mixin_instance.call_eager_next_page_request
+    assert RESPONSE_ID not in mixin_instance._request_registry
+
+
+@then('parsing a next page request schedules another one')
+def parsing_a_next_page_request_schedules_another_one(mixin_instance, n_requests, n_scheduled):
+    request = mixin_instance.crawler.engine.crawl.call_args[0][0]
+    request.meta['ocb'] = lambda response: [{'item': 'yes'}]
+    response = given_response(url=request.url, meta=request.meta)
+
+    assert mixin_instance.call_eager_next_page_request(response) == [{'item': 'yes'}]
+    expected = min(n_requests, n_scheduled + 1)
+    assert mixin_instance.crawler.engine.crawl.call_count == expected
+
+
+@when('I register <n_requests> requests in the chains "a" and "b"')
+def register_requests_in_chains(mixin_instance, n_requests):
+    register = PaginationMixin.register_requests(_generate_requests)
+    enqueue = PaginationMixin.enqueue_next_page_requests(
+        lambda self, response: Request(url=response.url + '/page2')
+    )
+    mixin_instance._chain_results = {}
+    for chain in ('a', 'b'):
+        response = given_response(url='http://domain.tld/' + chain, meta={'mosquitera_chain': chain})
+        mixin_instance.response_for_pagination_mixin = response
+        mixin_instance._chain_results[chain] = register(mixin_instance, n_requests)
+        enqueue(mixin_instance, response)
+
+
+@when('<n_valid> item pages of the chain "a" yield an item')
+def item_pages_of_chain_yield(mixin_instance, n_valid):
+    @mixin_instance.deregister_response
+    def generate_item(self, valid):
+        if valid:
+            return {'test': 'yes'}
+
+    for i, request in enumerate(mixin_instance._chain_results['a']):
+        mixin_instance.response_for_pagination_mixin = given_response(url=request.url, meta=request.meta)
+        generate_item(mixin_instance, i < n_valid)
+
+
+@then('each chain counts <n_requests> requests')
+def each_chain_counts_requests(mixin_instance, n_requests):
+    assert len(mixin_instance._request_registry) == 0
+    for chain in ('a', 'b'):
+        records = list(mixin_instance._get_registry(chain).records())
+        assert [record.counter for record in records] == [n_requests]
+        assert records[0].nprs[0].meta['mosquitera_chain'] == chain
+
+
+@then('the requests are tagged with their chain')
+def requests_are_tagged_with_their_chain(mixin_instance):
+    for chain, requests in mixin_instance._chain_results.items():
+        assert all(r.meta['mosquitera_chain'] == chain for r in requests)
+
+
+@then('continuing the chain "a" keeps the chain "b"')
+def continuing_chain_keeps_the_others(mixin_instance):
+    response = given_response(
+        url='http://domain.tld/a/page2',
+        meta={'mosquitera_chain': 'a', 'remaining_nprs': [], 'ocb': lambda response: []}
+    )
+    list(mixin_instance.call_next_page_requests(response))
+
+    assert len(mixin_instance._get_registry('a')) == 0
+    assert len(mixin_instance._get_registry('b')) == 1
+
+
+@then('the next pages of the chain "a" scheduled are <n_scheduled>')
+def next_pages_of_chain_scheduled(mixin_instance, n_scheduled):
+    # Scheduled without waiting for the spider to be idle
+    calls = mixin_instance.crawler.engine.crawl.call_args_list
+    assert [call[0][0].url for call in calls] == ['http://domain.tld/a/page2'] * n_scheduled
+    if n_scheduled:
+        assert calls[0][0][0].callback == mixin_instance.call_next_page_requests
+        assert len(mixin_instance._get_registry('a')) == 0
+
+
+@then('the chain "b" keeps its pending items')
+def chain_b_keeps_its_pending_items(mixin_instance, n_requests):
+    records = list(mixin_instance._get_registry('b').records())
+    assert [record.counter for record in records] == [n_requests]
+
+
+def _crawl(*args):
+    # The reactor can't be restarted, so the spiders run in their own process
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    output = subprocess.check_output(
+        [sys.executable, '-m', 'tests.spiders'] + [str(arg) for arg in args],
+        cwd=root
+    )
+    return json.loads(output.decode('utf-8').strip().splitlines()[-1])
+
+
+@given('<n_spiders> spiders crawled in the same process', target_fixture='crawl_results')
+def spiders_crawled_in_the_same_process(n_spiders):
+    return _crawl(n_spiders)
+
+
+@given('<n_spiders> spiders prefetching next pages crawled in the same process', target_fixture='crawl_results')
+def spiders_prefetching_in_the_same_process(n_spiders):
+    return _crawl(n_spiders, 'prefetch')
+
+
+@given('<n_spiders> spiders prefetching next pages without the middleware', target_fixture='crawl_results')
+def spiders_prefetching_without_the_middleware(n_spiders):
+    return _crawl(n_spiders, 'prefetch', 'no-middleware')
+
+
+@then('every spider requests the next page while its items are in the range')
+def every_spider_paginates(crawl_results, n_spiders):
+    assert len(crawl_results) == n_spiders
+    for index, result in crawl_results.items():
+        last_page = 2 + int(index) % 3
+        assert result['pages'] == list(range(1, last_page + 1))
+        assert result['items'] == (last_page - 1) * ITEMS_PER_PAGE
+        # Each spider only hears the idle signal of its own crawler
+        assert result['foreign_idles'] == 0
+        assert result['global_idle_receivers'] == 0
+
+
+@when('I enable prefetch with a mocked crawler')
+def enable_prefetch(mocker, mixin_instance):
+    _mock_prefetch_crawler(mocker, mixin_instance, {
+        'DOWNLOADER_MIDDLEWARES': {'scrapy_mosquitera.middlewares.PrefetchMiddleware': 50},
+    })
+
+
+@when('I enable prefetch with a mocked crawler without its middleware')
+def enable_prefetch_without_middleware(mocker, mixin_instance):
+    _mock_prefetch_crawler(mocker, mixin_instance, {})
+
+
+def _mock_prefetch_crawler(mocker, mixin_instance, settings):
+    mixin_instance.pagination_prefetch = True
+    mocker.patch.object(mixin_instance, 'crawler', create=True)
+    crawler = get_crawler(Spider, settings)
+    mixin_instance.crawler.stats = crawler.stats
+    mixin_instance.crawler.settings = crawler.settings
+
+
+def _prefetch_requests(mixin_instance):
+    return [call[0][0] for call in mixin_instance.crawler.engine.crawl.call_args_list]
+
+
+def _prefetch_stat(mixin_instance, key):
+    return mixin_instance.crawler.stats.get_value('mosquitera/prefetch/' + key)
+
+
+@when('every prefetch is downloaded')
+def every_prefetch_is_downloaded(mixin_instance):
+    for request in _prefetch_requests(mixin_instance):
+        mixin_instance._hold_prefetched_response(given_response(url=request.url, body='page', meta=request.meta))
+
+
+@when('the next pages are parsed without being served')
+def next_pages_are_parsed_without_being_served(mixin_instance):
+    mixin_instance.parse = lambda response: []
+    with pytest.raises(DontCloseSpider):
+        mixin_instance.dequeue_next_page_requests(mixin_instance)
+
+    npr = mixin_instance.crawler.engine.crawl.call_args[0][0]
+    response = given_response(url=npr.url, meta=npr.meta)
+    remaining_nprs = list(mixin_instance.call_next_page_requests(response))
+    assert len(mixin_instance._prefetched) == len(remaining_nprs)
+
+    for request in remaining_nprs:
+        assert request.callback == mixin_instance.call_prefetched_next_page_request
+        list(request.callback(given_response(url=request.url, meta=request.meta)))
+
+
+@when('the listings are discarded')
+def the_listings_are_discarded(mixin_instance):
+    mixin_instance._set_attributes_to_initial_state()
+
+
+@then('<n_requests> next page requests are prefetched at low priority')
+def next_page_requests_are_prefetched(mixin_instance, n_requests):
+    requests = _prefetch_requests(mixin_instance)
+    assert len(requests) == n_requests
+    for request in requests:
+        assert request.priority < 0
+        assert request.callback == mixin_instance._hold_prefetched_response
+    assert _prefetch_stat(mixin_instance, 'requests') == n_requests
+
+
+@then('the downloaded prefetched response is served to its next page request')
+def prefetched_response_is_served(mixin_instance):
+    prefetch = _prefetch_requests(mixin_instance)[0]
+    response = given_response(url=prefetch.url, meta=prefetch.meta)
+    mixin_instance._hold_prefetched_response(response)
+
+    npr = mixin_instance._request_registry[RESPONSE_ID].nprs[0]
+    middleware = PrefetchMiddleware()
+    assert middleware.process_request(prefetch, mixin_instance) is None
+    served = middleware.process_request(npr, mixin_instance)
+    assert served.url == response.url
+    assert served.request is npr
+    assert _prefetch_stat(mixin_instance, 'hits') == 1
+
+
+@then('a next page request is downloaded again if its prefetch is in flight')
+def next_page_request_is_downloaded_again(mixin_instance, n_requests):
+    npr = mixin_instance._request_registry[RESPONSE_ID].nprs[1]
+    assert PrefetchMiddleware().process_request(npr, mixin_instance) is None
+    assert _prefetch_stat(mixin_instance, 'misses') == 1
+
+    prefetch = _prefetch_requests(mixin_instance)[1]
+    mixin_instance._hold_prefetched_response(given_response(url=prefetch.url, body='late', meta=prefetch.meta))
+    assert _prefetch_stat(mixin_instance, 'discarded') == 1
+    assert _prefetch_stat(mixin_instance, 'hit_rate') == 1.0 / n_requests
+
+
+@then('<n_requests> prefetched responses are wasted')
+def prefetched_responses_are_wasted(mixin_instance, n_requests):
+    assert _prefetch_stat(mixin_instance, 'discarded') == n_requests
+    assert _prefetch_stat(mixin_instance, 'wasted_bytes') == n_requests * len('page')
+    assert not mixin_instance._prefetched
+
+
+@then('no next page request is prefetched')
+def no_next_page_request_is_prefetched(mixin_instance):
+    assert not mixin_instance.pagination_prefetch
+    assert not _prefetch_requests(mixin_instance)
+    assert not mixin_instance._prefetched
+
+
+@then('every next page requested is prefetched')
+def every_next_page_is_prefetched(crawl_results):
+    for index, result in crawl_results.items():
+        last_page = 2 + int(index) % 3
+        prefetch = result['prefetch']
+        assert prefetch['requests'] == last_page
+        assert prefetch['hits'] == last_page - 1
+        # The page after the last one is never requested
+        assert prefetch['discarded'] == 1
+        assert prefetch['wasted_bytes'] > 0
+        assert result['prefetched_left'] == 0
+
+
+@then('no next page is prefetched')
+def no_next_page_is_prefetched(crawl_results):
+    for result in crawl_results.values():
+        assert result['prefetch'] == {}
+        assert result['prefetched_left'] == 0
+
+
+@when('every streamed item page yields an item before the listing is exhausted')
+def streamed_item_pages_yield(mixin_instance):
+    listing = mixin_instance.response_for_pagination_mixin
+    rid = mixin_instance._get_response_id(listing)
+    mixin_instance._request_registry[rid].hold(Request(url='http://domain.tld/page2'))
+
+    @mixin_instance.deregister_response
+    def generate_item(self):
+        return {'test': 'yes'}
+
+    for request in mixin_instance._result:
+        mixin_instance.response_for_pagination_mixin = given_response(url=request.url, meta=request.meta)
+        generate_item(mixin_instance)
+        # The listing is still open, so it isn't dispatched yet
+        assert not mixin_instance.crawler.engine.crawl.called
+        mixin_instance.response_for_pagination_mixin = listing
+
+
+@then('the next page is scheduled once the listing is exhausted')
+def next_page_scheduled_once_exhausted(mixin_instance):
+    request = mixin_instance.crawler.engine.crawl.call_args[0][0]
+    assert request.url == 'http://domain.tld/page2'
+    assert mixin_instance.crawler.engine.crawl.call_count == 1
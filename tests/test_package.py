@@ -0,0 +1,49 @@
+import sys
+import subprocess
+
+import pytest
+
+from pytest_bdd import then, given, scenarios, parsers
+
+scenarios('./package.feature')
+
+TEMPLATE = '{statement}; import sys; print(",".join(sys.modules))'
+
+
+def _imported_modules(statement):
+    output = subprocess.check_output([sys.executable, '-c', TEMPLATE.format(statement=statement)])
+    return set(output.decode('ascii').strip().split(','))
+
+
+@given('a new interpreter running <statement>')
+def new_interpreter(statement):
+    return _imported_modules(statement)
+
+
+@given(parsers.parse('a new interpreter running {statement}'), target_fixture='new_interpreter')
+def new_interpreter_running(statement):
+    return _imported_modules(statement)
+
+
+@given('the package')
+def package():
+    import scrapy_mosquitera
+    return scrapy_mosquitera
+
+
+@then("the modules <modules> aren't imported")
+def the_modules_arent_imported(new_interpreter, modules):
+    for module in modules.split(','):
+        assert module.strip() not in new_interpreter
+
+
+@then(parsers.parse('the modules {modules} are imported'))
+def the_modules_are_imported(new_interpreter, modules):
+    for module in modules.split(','):
+        assert module.strip() in new_interpreter
+
+
+@then('getting an unknown name raises attribute error')
+def getting_an_unknown_name_raises_attribute_error(package):
+    with pytest.raises(AttributeError):
+        package.UnknownName
@@ -0,0 +1,108 @@
+from pytest_bdd import when, then, given, scenarios
+from scrapy.http import Request
+
+from scrapy_mosquitera.registry import ListingRecord, ListingRegistry
+
+converters = dict(
+    n_listings=int,
+    next_id=int,
+    pending=int,
+    answered=int,
+    n_nprs=int
+)
+scenarios('./registry.feature', example_converters=converters)
+
+
+@given('a listing registry')
+def registry():
+    return ListingRegistry()
+
+
+@when('I create <n_listings> listings and clear the registry')
+def create_listings(registry, n_listings):
+    for _ in range(n_listings):
+        registry[registry.new_id()].counter += 1
+    assert len(registry) == n_listings
+    registry.clear()
+    assert len(registry) == 0
+
+
+@when('a listing has <pending> pending item requests and holds a next page request')
+def listing_with_pending(registry, pending):
+    record = registry[registry.new_id()]
+    record.counter = pending
+    record.hold(Request('http://domain.tld/page2'))
+    assert isinstance(record, ListingRecord)
+    assert not hasattr(record, '__dict__')
+
+
+@when('<n_listings> listings have <pending> pending item requests')
+def listings_with_pending(registry, n_listings, pending):
+    for _ in range(n_listings):
+        listing_id = registry.new_id()
+        for _ in range(pending):
+            registry.increment(listing_id)
+        registry[listing_id].hold(Request('http://domain.tld/page2'))
+
+    # Listings are checked once, so no scan is needed at the next idle
+    assert registry.pop_completed_nprs() == []
+
+
+@when('the first listing answers <answered> item requests')
+def first_listing_answers(registry, answered):
+    for _ in range(answered):
+        registry.decrement(1)
+
+
+@when('unknown listings and the first listing answer <answered> item requests')
+def unknown_listings_answer(registry, answered):
+    for _ in range(answered):
+        registry.decrement(1)
+        registry.decrement(1000)
+    assert 1000 not in registry
+    assert registry[1].counter == 0
+
+
+@when('an open listing holds a next page request')
+def open_listing(registry):
+    record = registry[registry.new_id()]
+    record.open = True
+    record.hold(Request('http://domain.tld/page2'))
+
+
+@then('the next listing ID is <next_id>')
+def next_listing_id(registry, next_id):
+    assert registry.new_id() == next_id
+
+
+@then('the completed next page requests are <n_nprs>')
+def completed_nprs(registry, n_nprs):
+    assert len(registry.pop_completed_nprs()) == n_nprs
+
+
+@then('the completed listings are removed')
+def completed_listings_removed(registry, n_nprs):
+    assert len(registry) == 1 - n_nprs
+
+
+@then('only the first listing was removed')
+def only_the_first_listing_was_removed(registry, n_listings):
+    assert 1 not in registry
+    assert len(registry) == n_listings - 1
+
+
+@then('the ready queue is empty')
+def ready_queue_empty(registry):
+    assert not registry._ready
+
+
+@then("the open listing isn't completed")
+def open_listing_not_completed(registry):
+    assert registry.pop_completed_nprs() == []
+
+
+@then("the listing is completed when it's closed")
+def completed_when_closed(registry):
+    registry.close(1)
+    assert len(registry.pop_completed_nprs()) == 1
+    assert 1 not in registry
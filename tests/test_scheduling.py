@@ -0,0 +1,50 @@
+from pytest_bdd import when, then, given, scenarios
+from scrapy import Spider
+from scrapy.http import Request
+
+from scrapy_mosquitera.scheduling import schedule_request
+
+scenarios('./scheduling.feature')
+
+
+class Engine(object):
+
+    def __init__(self):
+        self.crawled = []
+
+    def crawl(self, request):
+        self.crawled.append((request,))
+
+
+class LegacyEngine(Engine):
+
+    def crawl(self, request, spider):
+        self.crawled.append((request, spider))
+
+
+@given('an engine whose crawl takes the request')
+def engine():
+    return Engine()
+
+
+@given('an engine whose crawl also takes the spider', target_fixture='engine')
+def legacy_engine():
+    return LegacyEngine()
+
+
+@when('I schedule a request')
+def scheduled(engine):
+    schedule_request(engine, Request('http://example.com'), Spider('example'))
+
+
+@then('the engine crawls the request')
+def engine_crawls_request(engine):
+    assert len(engine.crawled) == 1
+    assert engine.crawled[0][0].url == 'http://example.com'
+
+
+@then('the engine crawls the request with the spider')
+def engine_crawls_request_with_spider(engine):
+    request, spider = engine.crawled[0]
+    assert request.url == 'http://example.com'
+    assert spider.name == 'example'
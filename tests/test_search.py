@@ -0,0 +1,115 @@
+import datetime
+
+from collections import Counter
+
+from pytest_bdd import when, then, given, scenarios, parsers
+from scrapy import Spider
+from scrapy.http import Request
+
+from scrapy_mosquitera import PageSearchMixin
+from tests.utils import given_response
+
+converters = dict(
+    n_pages=int,
+    per_page=int,
+    max_probes=int,
+    dates=lambda v: [] if v == 'none' else [d.strip() for d in v.split(',')],
+)
+scenarios('./search.feature', example_converters=converters)
+
+NEWEST_POST = datetime.date(2016, 4, 15)
+URL = 'http://domain.tld/archive?page={}'
+
+
+class ArchiveSpider(PageSearchMixin, Spider):
+    name = 'archive'
+
+    def __init__(self, archive, window):
+        super(ArchiveSpider, self).__init__()
+        self.archive = archive
+        self.page_search_window = window
+        self.parsed = Counter()
+
+    def get_page_url(self, page):
+        return URL.format(page)
+
+    def get_page_dates(self, response):
+        return response.css('time::text').extract()
+
+    def parse(self, response):
+        self.parsed[int(response.url.rsplit('=', 1)[1])] += 1
+        return []
+
+
+def _archive(n_pages, per_page):
+    """ Return the dates of every page, one post a day, newest first. """
+    return dict(
+        (page, [
+            NEWEST_POST - datetime.timedelta(days=(page - 1) * per_page + i) for i in range(per_page)
+        ])
+        for page in range(1, n_pages + 1)
+    )
+
+
+def _fetch(archive, request):
+    page = int(request.url.rsplit('=', 1)[1])
+    body = ''.join('<time>{}</time>'.format(d.isoformat()) for d in archive.get(page, []))
+    return given_response(url=request.url, body=body, meta=request.meta)
+
+
+def _crawl(spider, request):
+    """ Run the requests one after the other, returning the probed pages. """
+    probes = []
+    pending = [request]
+    while pending:
+        request = pending.pop(0)
+        if 'page_search_page' in request.meta:
+            probes.append(request.meta['page_search_page'])
+
+        for result in request.callback(_fetch(spider.archive, request)) or ():
+            if isinstance(result, Request):
+                pending.append(result)
+    return probes
+
+
+@given('an archive of <n_pages> pages with <per_page> posts')
+def archive(n_pages, per_page):
+    return _archive(n_pages, per_page)
+
+
+@given(parsers.parse('a page search after {after} and before {before}'), target_fixture='spider')
+def page_search(after, before):
+    spider = ArchiveSpider({}, {'after': after, 'before': before})
+    spider.start_page_search()
+    return spider
+
+
+@given('a page search over the archive after <after> and before <before>', target_fixture='spider')
+def page_search_over_archive(archive, after, before):
+    return ArchiveSpider(archive, {'after': after, 'before': before})
+
+
+@when('I run the search')
+def run_search(spider):
+    spider.probes = _crawl(spider, spider.start_page_search())
+
+
+@then('only the pages with posts in the range are parsed, once')
+def pages_parsed_once(spider):
+    matcher = spider._page_search['matcher']
+    expected = set(
+        page for page, dates in spider.archive.items() if any(matcher.matches(d) for d in dates)
+    )
+    assert set(spider.parsed) == expected
+    assert all(count == 1 for count in spider.parsed.values())
+
+
+@then('at most <max_probes> pages are probed')
+def pages_probed(spider, max_probes):
+    assert len(spider.probes) <= max_probes
+    assert len(set(spider.probes)) == len(spider.probes)
+
+
+@then('a page with <dates> is <kind>')
+def page_is(spider, dates, kind):
+    assert spider.classify_page(dates) == kind
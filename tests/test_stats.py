@@ -0,0 +1,192 @@
+import pytest
+
+from pytest_bdd import when, then, given, scenarios
+from scrapy import Spider, signals
+from scrapy.utils.test import get_crawler
+
+from scrapy_mosquitera import stats as stats_module
+from scrapy_mosquitera.matchers import DateMatcher, Predicate, compile_matcher
+from scrapy_mosquitera.stats import MatcherStats
+
+converters = dict(
+    calls=int,
+    accepted=int,
+    ratio=float,
+    sample_every=int,
+    n_dates=int,
+    n_samples=int,
+)
+scenarios('./stats.feature', example_converters=converters)
+
+
+class DummyStats(object):
+    def __init__(self):
+        self.values = {}
+
+    def set_value(self, key, value):
+        self.values[key] = value
+
+
+@pytest.fixture(autouse=True)
+def uninstall_recorder():
+    yield
+    stats_module.uninstall()
+
+
+@pytest.fixture
+def matcher():
+    return DateMatcher(after='2016-04-10')
+
+
+@given('a stats recorder', target_fixture='recorder')
+def recorder():
+    return MatcherStats(DummyStats())
+
+
+@given('a stats recorder timing one call every <sample_every>', target_fixture='recorder')
+def sampling_recorder(sample_every):
+    return MatcherStats(DummyStats(), sample_every=sample_every)
+
+
+@when('I match the dates <dates>')
+def match_dates(recorder, matcher, dates):
+    matcher.stats = recorder
+    for date in dates.split(','):
+        matcher.matches(date.strip())
+
+
+@when("I match a value which isn't a date")
+def match_invalid(recorder, matcher):
+    matcher.stats = recorder
+    with pytest.raises(TypeError):
+        matcher.matches('not a date')
+
+
+@when('I match <n_dates> dates')
+def match_n_dates(recorder, matcher, n_dates):
+    matcher.stats = recorder
+    for day in range(n_dates):
+        matcher.matches('2016-05-{:02d}'.format(day + 1))
+
+
+@when('I evaluate a compiled matcher named recent')
+def evaluate_compiled(recorder):
+    evaluator = compile_matcher(Predicate(lambda value: value > 5), name='recent', stats=recorder)
+    for value in range(10):
+        evaluator(value)
+
+
+@then('the date calls are <calls> and the accepted are <accepted>')
+def date_calls(recorder, calls, accepted):
+    assert recorder.counters['date', 'calls'] == calls
+    assert recorder.counters['date', 'accepted'] == accepted
+    assert recorder.counters['date', 'rejected'] == calls - accepted
+
+
+@then('the published accept ratio is <ratio>')
+def accept_ratio(recorder, ratio):
+    recorder.publish()
+    assert recorder.stats.values['mosquitera/date/accept_ratio'] == ratio
+
+
+@then('a parse failure is recorded')
+def parse_failure(recorder):
+    recorder.publish()
+    assert recorder.stats.values['mosquitera/date/parse_failures'] == 1
+    assert recorder.stats.values['mosquitera/date/calls'] == 1
+
+
+@then('<n_samples> latencies are sampled')
+def latencies_sampled(recorder, n_samples):
+    assert len(recorder.latencies) == n_samples
+
+
+@then('the latency percentiles are published')
+def latency_percentiles(recorder):
+    recorder.publish()
+    values = recorder.stats.values
+    assert values['mosquitera/parse_latency/p50_us'] <= values['mosquitera/parse_latency/p99_us']
+    assert values['mosquitera/parse_latency/total_us'] > 0
+    assert 'mosquitera/parse_cache/hit_rate' in values
+
+
+@then('the recent calls are recorded')
+def compiled_calls(recorder):
+    assert recorder.counters['recent', 'calls'] == 10
+    assert recorder.counters['recent', 'accepted'] == 4
+
+
+@given('a crawler with the stats extension')
+def crawler():
+    crawler = get_crawler(Spider)
+    crawler.extension = MatcherStats.from_crawler(crawler)
+    crawler.spider = Spider('test')
+    return crawler
+
+
+@when('the spider is opened and matches dates')
+def spider_opened(crawler):
+    crawler.signals.send_catch_log(signals.spider_opened, spider=crawler.spider)
+    matcher = DateMatcher(after='2016-04-10')
+    matcher.matches('2016-04-15')
+    matcher.matches('2016-04-01')
+    matcher.matches_many(['2016-04-15', '2016-04-16', ''])
+
+
+@when('the spider is closed')
+def spider_closed(crawler):
+    crawler.signals.send_catch_log(signals.spider_closed, spider=crawler.spider, reason='finished')
+
+
+@then('the crawler stats have the mosquitera stats')
+def crawler_stats(crawler):
+    assert crawler.stats.get_value('mosquitera/date/calls') == 5
+    assert crawler.stats.get_value('mosquitera/date/accepted') == 3
+    assert crawler.stats.get_value('mosquitera/parse_cache/hits') is not None
+
+
+@then('the recorder is uninstalled')
+def recorder_uninstalled():
+    assert stats_module.recorder is None
+
+
+@given('two crawlers with the stats extension', target_fixture='crawlers')
+def two_crawlers():
+    crawlers = []
+    for name in ('first', 'second'):
+        crawler = get_crawler(Spider, {'EXTENSIONS': {'scrapy_mosquitera.stats.MatcherStats': 500}})
+        crawler.spider = Spider(name)
+        crawlers.append(crawler)
+    return crawlers
+
+
+@when('both spiders are opened')
+def both_spiders_opened(crawlers):
+    for crawler in crawlers:
+        crawler.signals.send_catch_log(signals.spider_opened, spider=crawler.spider)
+
+
+@when('each spider matches its dates')
+def each_spider_matches(crawlers):
+    for n_dates, crawler in enumerate(crawlers, 1):
+        matcher = DateMatcher.from_crawler(crawler, after='2016-04-10')
+        for _ in range(n_dates):
+            matcher.matches('2016-04-15')
+
+
+@then('each crawler records only its own matchers')
+def each_crawler_records_its_own(crawlers):
+    for n_dates, crawler in enumerate(crawlers, 1):
+        recorder = stats_module.get_recorder(crawler)
+        assert crawler.spider.matcher_stats is recorder
+        assert recorder.counters['date', 'calls'] == n_dates
+
+
+@then("matchers without recorder aren't recorded")
+def matchers_without_recorder(crawlers):
+    assert stats_module.recorder is None
+    DateMatcher(after='2016-04-10').matches('2016-04-15')
+    each_crawler_records_its_own(crawlers)
+
+    crawlers[1].signals.send_catch_log(signals.spider_closed, spider=crawlers[1].spider, reason='finished')
+    assert stats_module.recorder is stats_module.get_recorder(crawlers[0])